@@ -0,0 +1,116 @@
+# SPDX-FileCopyrightText: 2024 CERN.
+# SPDX-License-Identifier: MIT
+
+"""Microbenchmark of the CSV row serialization of table generators.
+
+Compares the per-row introspection of the model fields with the compiled per-model
+serializers, and the creation and serialization of model instances with that of
+lightweight model rows. Run it with:
+
+.. code-block:: console
+
+    $ python benchmarks/table_serializers.py
+"""
+
+import timeit
+from dataclasses import fields
+from datetime import datetime
+from uuid import UUID, uuid4
+
+import orjson
+
+from invenio_rdm_migrator.load.postgresql.bulk.writers import (
+    as_csv_row,
+    row_serializer,
+)
+from invenio_rdm_migrator.streams.models.files import FilesObjectVersion
+from invenio_rdm_migrator.streams.models.pids import PersistentIdentifier
+from invenio_rdm_migrator.streams.models.records import RDMRecordMetadata
+
+
+def introspected_csv_row(dc):
+    """Serialize a row inspecting the dataclass fields on every call."""
+    row = []
+    for f in fields(dc):
+        val = getattr(dc, f.name)
+        if val:
+            if issubclass(f.type, (dict,)):
+                val = orjson.dumps(val).decode("utf-8")
+            elif issubclass(f.type, (datetime,)) and isinstance(val, (datetime,)):
+                val = val.isoformat()
+            elif issubclass(f.type, (UUID,)):
+                val = str(val)
+        row.append(val)
+    return row
+
+
+def rows(model_row=False):
+    """Sample rows, as model instances or as lightweight rows."""
+    now = datetime.utcnow()
+
+    def _new(model, **kwargs):
+        return model.row(**kwargs) if model_row else model(**kwargs)
+
+    return {
+        "PersistentIdentifier": _new(
+            PersistentIdentifier,
+            id=1_000_001,
+            pid_type="recid",
+            pid_value="123456",
+            status="R",
+            object_type="rec",
+            object_uuid=uuid4(),
+            created=now,
+            updated=now,
+        ),
+        "RDMRecordMetadata": _new(
+            RDMRecordMetadata,
+            id=uuid4(),
+            json={"id": "123456", "metadata": {"title": "A title"}, "files": {}},
+            created=now,
+            updated=now,
+            version_id=1,
+            index=1,
+            bucket_id=uuid4(),
+            parent_id=uuid4(),
+            deletion_status="P",
+        ),
+        "FilesObjectVersion": _new(
+            FilesObjectVersion,
+            version_id=uuid4(),
+            created=now,
+            updated=now,
+            key="data.csv",
+            bucket_id=uuid4(),
+            file_id=uuid4(),
+            _mimetype=None,
+            is_head=True,
+        ),
+    }
+
+
+def main(number=100_000):
+    """Run the benchmark."""
+    for name, row in rows().items():
+        assert introspected_csv_row(row) == row_serializer(type(row))(row)
+        introspected = timeit.timeit(lambda: introspected_csv_row(row), number=number)
+        serializer = row_serializer(type(row))
+        compiled = timeit.timeit(lambda: serializer(row), number=number)
+        print(
+            f"{name:<22} introspected: {introspected:.3f}s "
+            f"compiled: {compiled:.3f}s ({introspected / compiled:.1f}x) "
+            f"for {number} rows"
+        )
+
+    number = number // 10
+    for model_row in (False, True):
+        kind = "row" if model_row else "model"
+        duration = timeit.timeit(
+            lambda: [as_csv_row(row) for row in rows(model_row).values()],
+            number=number,
+        )
+        print(f"create and serialize ({kind}): {duration:.3f}s for {number} entries")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+# SPDX-FileCopyrightText: 2024 CERN.
+# SPDX-License-Identifier: MIT
+
+"""Benchmark of the statements executed by the transactions load.
+
+Loads operations shaped like those of the file uploads and publishes of drafts
+(``FileUploadAction`` and ``DraftPublishNewAction``) into stand-in tables, with
+the foreign keys of the files and records tables, and compares the
+number of statements and the duration of the default load with that of reordered
+operations and, on PostgreSQL, deferred constraints. Run it with:
+
+.. code-block:: console
+
+    $ python benchmarks/transaction_statements.py [postgresql+psycopg://...]
+"""
+
+import sys
+import time
+from dataclasses import dataclass
+from uuid import uuid4
+
+import sqlalchemy as sa
+from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column
+
+import invenio_rdm_migrator.transform  # noqa: F401, imported before the actions
+from invenio_rdm_migrator.actions import LoadAction, LoadData
+from invenio_rdm_migrator.load.postgresql.transactions import PostgreSQLTx
+from invenio_rdm_migrator.load.postgresql.transactions.operations import (
+    Operation,
+    OperationType,
+)
+
+
+class Base(DeclarativeBase):
+    """Base of the stand-in models, not part of the migrator models."""
+
+
+def _fk(column):
+    return sa.ForeignKey(column, deferrable=True)
+
+
+class Bucket(Base):
+    """Stand-in of ``files_bucket``."""
+
+    __tablename__ = "bench_bucket"
+
+    id: Mapped[str] = mapped_column(primary_key=True)
+    locked: Mapped[bool]
+
+
+class FileInstance(Base):
+    """Stand-in of ``files_files``."""
+
+    __tablename__ = "bench_files"
+
+    id: Mapped[str] = mapped_column(primary_key=True)
+    uri: Mapped[str]
+
+
+class ObjectVersion(Base):
+    """Stand-in of ``files_object``."""
+
+    __tablename__ = "bench_object"
+
+    version_id: Mapped[str] = mapped_column(primary_key=True)
+    bucket_id: Mapped[str] = mapped_column(_fk(Bucket.id))
+    file_id: Mapped[str] = mapped_column(_fk(FileInstance.id))
+    key: Mapped[str]
+
+
+class Record(Base):
+    """Stand-in of ``rdm_records_metadata`` and ``rdm_drafts_metadata``."""
+
+    __tablename__ = "bench_record"
+
+    id: Mapped[str] = mapped_column(primary_key=True)
+    bucket_id: Mapped[str] = mapped_column(_fk(Bucket.id))
+    published: Mapped[bool] = mapped_column(default=False)
+
+
+class RecordFile(Base):
+    """Stand-in of ``rdm_records_files`` and ``rdm_drafts_files``."""
+
+    __tablename__ = "bench_record_file"
+
+    id: Mapped[str] = mapped_column(primary_key=True)
+    record_id: Mapped[str] = mapped_column(_fk(Record.id))
+    object_version_id: Mapped[str] = mapped_column(_fk(ObjectVersion.version_id))
+    key: Mapped[str]
+
+
+@dataclass
+class BenchmarkData(LoadData):
+    """Benchmark action data."""
+
+    draft: dict
+
+
+class PublishAction(LoadAction):
+    """Operations of a ``DraftPublishNewAction`` of a draft with files."""
+
+    name = "bench-publish"
+    data_cls = BenchmarkData
+
+    def _generate_rows(self, session, **kwargs):
+        """Yield generated rows."""
+        draft = self.data.draft
+        bucket_id = str(uuid4())
+        record_id = str(uuid4())
+        yield Operation(OperationType.INSERT, Bucket, {"id": bucket_id, "locked": True})
+        yield Operation(
+            OperationType.UPDATE, Bucket, {"id": draft["bucket_id"], "locked": True}
+        )
+        yield Operation(
+            OperationType.INSERT,
+            Record,
+            {"id": record_id, "bucket_id": bucket_id, "published": True},
+        )
+        for idx, file_id in enumerate(draft["file_ids"]):
+            version_id = str(uuid4())
+            yield Operation(
+                OperationType.INSERT,
+                ObjectVersion,
+                {
+                    "version_id": version_id,
+                    "bucket_id": bucket_id,
+                    "file_id": file_id,
+                    "key": f"file-{idx}",
+                },
+            )
+            yield Operation(
+                OperationType.INSERT,
+                RecordFile,
+                {
+                    "id": str(uuid4()),
+                    "record_id": record_id,
+                    "object_version_id": version_id,
+                    "key": f"file-{idx}",
+                },
+            )
+        yield Operation(
+            OperationType.UPDATE, Record, {"id": draft["id"], "published": True}
+        )
+
+
+class FileUploadAction(LoadAction):
+    """Operations of a ``FileUploadAction`` of a new file."""
+
+    name = "bench-file-upload"
+    data_cls = BenchmarkData
+
+    def _generate_rows(self, session, **kwargs):
+        """Yield generated rows."""
+        draft = self.data.draft
+        file_id = str(uuid4())
+        version_id = str(uuid4())
+        draft["file_ids"].append(file_id)
+        yield Operation(
+            OperationType.UPDATE, Bucket, {"id": draft["bucket_id"], "locked": False}
+        )
+        yield Operation(OperationType.INSERT, FileInstance, {"id": file_id, "uri": "f"})
+        yield Operation(
+            OperationType.INSERT,
+            ObjectVersion,
+            {
+                "version_id": version_id,
+                "bucket_id": draft["bucket_id"],
+                "file_id": file_id,
+                "key": f"file-{len(draft['file_ids'])}",
+            },
+        )
+        yield Operation(
+            OperationType.INSERT,
+            RecordFile,
+            {
+                "id": str(uuid4()),
+                "record_id": draft["id"],
+                "object_version_id": version_id,
+                "key": f"file-{len(draft['file_ids'])}",
+            },
+        )
+
+
+def run(db_uri, drafts, files, **kwargs):
+    """Load the actions, returning the number of statements and the duration."""
+    engine = sa.create_engine(db_uri)
+    if engine.dialect.name == "sqlite":
+
+        @sa.event.listens_for(engine, "connect")
+        def _connect(dbapi_conn, _):
+            dbapi_conn.execute("PRAGMA foreign_keys = ON")
+
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    statements = []
+
+    @sa.event.listens_for(engine, "before_cursor_execute")
+    def _count(conn, cursor, statement, *args):
+        if statement.split()[0] in ("INSERT", "UPDATE", "DELETE"):
+            statements.append(statement)
+
+    with Session(bind=engine) as session:
+        actions = []
+        for _ in range(drafts):
+            draft = {"id": str(uuid4()), "bucket_id": str(uuid4()), "file_ids": []}
+            session.add(Bucket(id=draft["bucket_id"], locked=False))
+            session.flush()
+            session.add(Record(id=draft["id"], bucket_id=draft["bucket_id"]))
+            session.flush()
+            actions.extend(FileUploadAction({"draft": draft}) for _ in range(files))
+            actions.append(PublishAction({"draft": draft}))
+        session.commit()
+
+        load = PostgreSQLTx(
+            db_uri=None,
+            _session=session,
+            dry=False,
+            raise_on_db_error=True,
+            batch_size=1000,
+            **kwargs,
+        )
+        statements.clear()
+        start = time.monotonic()
+        load.run(actions)
+        session.commit()
+        duration = time.monotonic() - start
+
+    Base.metadata.drop_all(engine)
+    engine.dispose()
+    return len(statements), duration
+
+
+def main(db_uri="sqlite://", drafts=200, files=5):
+    """Run the benchmark."""
+    modes = {
+        "default": {},
+        "reorder_operations": {"reorder_operations": True},
+    }
+    if db_uri.startswith("postgresql"):
+        modes["defer_constraints"] = {"defer_constraints": True}
+    for name, kwargs in modes.items():
+        statements, duration = run(db_uri, drafts, files, **kwargs)
+        print(
+            f"{name:<20} {statements} statements, {duration:.3f}s for {drafts} "
+            f"drafts with {files} files"
+        )
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
@@ -79,6 +79,15 @@ class LoadAction(Action, ABC):
     def _generate_rows(self, session: orm.Session = None, **kwargs):
         """Yield generated rows."""
 
+    def conflict_keys(self):
+        """Entities touched by the action, e.g. ``{("bucket", "<id>")}``.
+
+        Actions with no common key can be loaded concurrently. None (the default)
+        means that the entities are unknown, such actions are loaded on their own
+        after all the previous ones.
+        """
+        return None
+
     def prepare(self, session: orm.Session, **kwargs):
         """Generate the SQL statements required to persist the action.
 
@@ -3,10 +3,14 @@
 
 """Identifiers generators module."""
 
+import threading
 from uuid import uuid4
 
 from ..state import STATE
 
+# generating a key reads and updates the state, actions can be loaded concurrently
+_lock = threading.Lock()
+
 
 def generate_uuid(data=None):
     """Generate a UUID."""
@@ -16,13 +20,14 @@ def generate_uuid(data=None):
 def pid_pk():
     """Generate an autoincrementing numeric primary key."""
     state = STATE.VALUES
-    state_value = state.get("max_pid_pk")
-    if not state_value:
-        value = 1_000_000
-        state.add("max_pid_pk", {"value": 1_000_000})
-    else:
-        value = state_value["value"] + 1
-        state.update("max_pid_pk", {"value": value})
+    with _lock:
+        state_value = state.get("max_pid_pk")
+        if not state_value:
+            value = 1_000_000
+            state.add("max_pid_pk", {"value": 1_000_000})
+        else:
+            value = state_value["value"] + 1
+            state.update("max_pid_pk", {"value": value})
 
     return value
 
@@ -42,13 +47,14 @@ def generate_pk_for(model_cls):
     def _pk_gen(_=None):
         state = STATE.VALUES
         key = f"max_{model_cls.__tablename__}_pk"
-        state_value = state.get(key)
-        if not state_value:
-            value = 1_000_000
-            state.add(key, {"value": 1_000_000})
-        else:
-            value = state_value["value"] + 1
-            state.update(key, {"value": value})
+        with _lock:
+            state_value = state.get(key)
+            if not state_value:
+                value = 1_000_000
+                state.add(key, {"value": 1_000_000})
+            else:
+                value = state_value["value"] + 1
+                state.update(key, {"value": value})
         return value
 
     return _pk_gen
@@ -0,0 +1,68 @@
+# SPDX-FileCopyrightText: 2024 CERN.
+# SPDX-License-Identifier: MIT
+
+"""Per table checkpoints of bulk loads."""
+
+
+class LoadCheckpoints:
+    """Tables completed by a bulk load, stored in the target database.
+
+    The checkpoint of a table is written in the same transaction as its data, so
+    either both are committed or none is. Checkpoints are bound to the loaded file,
+    re-running a load from the same files skips the tables that were completed.
+    """
+
+    table = "migrator_load_checkpoints"
+
+    def __init__(self, name):
+        """Constructor.
+
+        :param name: name of the load (e.g. its class name).
+        """
+        self.name = name
+        self.completed = {}
+
+    def fetch(self, conn):
+        """Create the checkpoints table if needed and read the completed tables."""
+        conn.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {self.table} (
+                load_name text NOT NULL,
+                table_name text NOT NULL,
+                source text NOT NULL,
+                row_count bigint,
+                completed timestamp with time zone NOT NULL DEFAULT now(),
+                PRIMARY KEY (load_name, table_name, source)
+            )
+            """
+        )
+        conn.commit()
+        results = conn.execute(
+            f"SELECT table_name, source, row_count FROM {self.table} "
+            "WHERE load_name = %s",
+            (self.name,),
+        ).fetchall()
+        self.completed = {(table, source): rows for table, source, rows in results}
+        return self.completed
+
+    def is_completed(self, table_name, source):
+        """Whether the table was already loaded from the source file."""
+        return (table_name, source) in self.completed
+
+    def add(self, conn, table_name, source, rows):
+        """Record the completion of a table, it does not commit the transaction."""
+        conn.execute(
+            f"""
+            INSERT INTO {self.table} (load_name, table_name, source, row_count)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (load_name, table_name, source)
+            DO UPDATE SET row_count = EXCLUDED.row_count, completed = now()
+            """,
+            (self.name, table_name, source, rows),
+        )
+        self.completed[(table_name, source)] = rows
+
+    def clear(self, conn):
+        """Delete the checkpoints of the load, it does not commit the transaction."""
+        conn.execute(f"DELETE FROM {self.table} WHERE load_name = %s", (self.name,))
+        self.completed = {}
@@ -3,9 +3,13 @@
 
 """PostgreSQL COPY load."""
 
-
 import contextlib
+import json
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import fields
+from functools import partial
 from pathlib import Path
 
 import psycopg
@@ -13,7 +17,20 @@ import psycopg
 from ....logging import Logger
 from ....utils import ts
 from ...base import Load
+from ..parallel import execute_in_parallel
 from ..sequences import AlterSequencesMixin
+from .checkpoints import LoadCheckpoints
+from .ddl import IndexesAndConstraints
+from .progress import CopyProgressMonitor
+from .recovery import BisectingCopy, BisectingMerge
+from .verification import checksum_sql
+from .writers import DEFAULT_BUFFER_SIZE, WRITERS
+
+FAST_LOAD_SETTINGS = {
+    "synchronous_commit": "off",
+    "maintenance_work_mem": "1GB",
+}
+"""Session settings applied by default when loading into a fresh target."""
 
 
 class PostgreSQLCopyLoad(Load, AlterSequencesMixin):
@@ -26,6 +43,23 @@ class PostgreSQLCopyLoad(Load, AlterSequencesMixin):
         tmp_dir=None,
         data_dir=None,
         existing_data=False,
+        drop_constraints=False,
+        workers=4,
+        fresh_target=False,
+        unlogged=False,
+        session_settings=None,
+        analyze=False,
+        vacuum=False,
+        writer="csv",
+        buffer_size=DEFAULT_BUFFER_SIZE,
+        checkpoint=False,
+        upsert=False,
+        concurrent_tables=False,
+        verify=False,
+        checksum=False,
+        validate=False,
+        recover=False,
+        progress_interval=10,
         **kwargs,
     ):
         """Constructor.
@@ -33,9 +67,75 @@ class PostgreSQLCopyLoad(Load, AlterSequencesMixin):
         :param data_dir: if existing data is true this is the directory from which to
         load the existing csv file, if it is false is the directory where to dump the
         newly created csv files.
+        :param drop_constraints: drop the indexes and foreign keys of the loaded tables
+        before COPY and restore them afterwards.
+        :param workers: number of parallel connections used e.g. to restore indexes.
+        :param fresh_target: truncate and load each (empty) table in the same
+        transaction using COPY FREEZE, which avoids most of the WAL and vacuum work.
+        Tables referenced by foreign keys of other tables cannot be truncated, they
+        are loaded with a plain COPY (unless ``drop_constraints`` drops the keys).
+        :param unlogged: switch the tables to UNLOGGED while loading them.
+        :param session_settings: dictionary of settings (GUCs) applied to every
+        connection, defaults to ``FAST_LOAD_SETTINGS`` on a fresh target.
+        :param analyze: run ANALYZE on the loaded tables after loading.
+        :param vacuum: run VACUUM (FREEZE, ANALYZE) on the loaded tables instead.
+        :param writer: name of the table file writer, ``csv`` (text mode, standard
+        library) or ``binary`` (large buffer, faster).
+        :param buffer_size: size in bytes of the buffers used to write the table
+        files (binary writer) and to stream them to COPY.
+        :param checkpoint: COPY each table into a staging table, merge it and record
+        its completion in the same transaction. Re-running the load from the same
+        files (e.g. with existing data) skips the completed tables.
+        :param upsert: COPY each table into a staging table and merge it with
+        ``INSERT ... ON CONFLICT (pk) DO UPDATE``, so the load can run on tables that
+        already contain (some of) the rows.
+        :param concurrent_tables: load up to ``workers`` tables at the same time, each
+        on its own connection. The tables must not reference each other, unless their
+        foreign keys are dropped.
+        :param verify: compare the number of rows written to each file with the
+        number of rows copied, and save a ``verification.json`` report.
+        :param checksum: also compare the checksum of the primary keys of the
+        written and the copied rows, when the latter can be isolated (i.e. staging
+        tables or empty target tables).
+        :param validate: validate the rows against the model columns (types and
+        nullability) while preparing, invalid rows are written to a
+        ``<table>.rejects.jsonl`` file instead of the table file. The nullability of
+        the columns is read from the database, not from the models.
+        :param recover: when the COPY of a file fails, copy it again isolating the
+        failing records, which are written to ``<table>.rejects.jsonl``. With a
+        staging table (``checkpoint`` or ``upsert``), its merge is also bisected, as
+        constraint violations only happen there.
+        :param progress_interval: seconds between two COPY progress reports, no
+        progress is reported if it is zero or None.
         """
         self.db_uri = db_uri
         self.table_generators = table_generators
+        self.drop_constraints = drop_constraints
+        self.workers = workers
+        self.fresh_target = fresh_target
+        self.unlogged = unlogged
+        if session_settings is None and fresh_target:
+            session_settings = FAST_LOAD_SETTINGS
+        self.session_settings = session_settings or {}
+        self.analyze = analyze
+        self.vacuum = vacuum
+        if writer not in WRITERS:
+            raise ValueError(f"Unknown table writer {writer}, use {list(WRITERS)}.")
+        self.writer = writer
+        self.buffer_size = buffer_size
+        self.checkpoint = checkpoint
+        self.upsert = upsert
+        self.concurrent_tables = concurrent_tables
+        self.verify = verify or checksum
+        self.checksum = checksum
+        self.validate = validate
+        self.recover = recover
+        self.progress_interval = progress_interval
+        self._progress = None
+        self._loaded_tables = []
+        self._written = {}
+        self._rejected = {}
+        self._verification = {}
         # when loading existing data the tmp folder would be the root
         # it is assumed that the csv files of a previous run have been placed there
         self.existing_data = existing_data
@@ -57,21 +157,71 @@ class PostgreSQLCopyLoad(Load, AlterSequencesMixin):
         for table in self.table_generators:
             table.cleanup(db=db)
 
+    def _not_null_columns(self):
+        """Non-nullable columns of the loaded tables, as defined in the database.
+
+        :returns: frozensets of column names by table name.
+        """
+        names = [
+            table.__tablename__ for tg in self.table_generators for table in tg.tables
+        ]
+        with psycopg.connect(self.db_uri) as conn:
+            rows = conn.execute(
+                """
+                SELECT table_name, column_name FROM information_schema.columns
+                WHERE
+                    table_schema = current_schema()
+                    AND table_name = ANY(%s)
+                    AND is_nullable = 'NO';
+                """,
+                (names,),
+            ).fetchall()
+        # tables missing in the database are validated with the default
+        not_null = defaultdict(set)
+        for table_name, column_name in rows:
+            not_null[table_name].add(column_name)
+        return {name: frozenset(columns) for name, columns in not_null.items()}
+
+    def _writer_cls(self):
+        """Factory of the table file writers."""
+        kwargs = {"checksum": self.checksum, "validate": self.validate}
+        if self.validate:
+            kwargs["not_null"] = self._not_null_columns()
+        if self.writer == "binary":
+            kwargs["buffer_size"] = self.buffer_size
+        return partial(WRITERS[self.writer], **kwargs)
+
     def _save_to_csv(self, entries):
         """Save the entries to a csv file."""
         self.tmp_dir.mkdir(parents=True, exist_ok=True)
+        writer_cls = self._writer_cls()
         # use this context manager to close all opened files at once
         with contextlib.ExitStack() as stack:
             output_files = {}
             for entry in entries:
                 for tg in self.table_generators:
-                    tg.prepare(self.tmp_dir, entry, stack, output_files)
+                    tg.prepare(
+                        self.tmp_dir, entry, stack, output_files, writer_cls=writer_cls
+                    )
 
             for tg in self.table_generators:
                 tg.post_prepare(
-                    tmp_dir=self.tmp_dir, stack=stack, output_files=output_files
+                    tmp_dir=self.tmp_dir,
+                    stack=stack,
+                    output_files=output_files,
+                    writer_cls=writer_cls,
                 )
 
+        self._written = {
+            name: (writer.rows, writer.checksum)
+            for name, writer in output_files.items()
+        }
+        self._rejected = {
+            name: writer.rejected
+            for name, writer in output_files.items()
+            if writer.rejected
+        }
+
     def _prepare(self, entries):
         """Dump entries in csv files for COPY command."""
         # global overwrite for existing data, e.g. when running a previously run stream
@@ -90,58 +240,420 @@ class PostgreSQLCopyLoad(Load, AlterSequencesMixin):
 
         return iter(prepared_tables)  # yield at the end vs yield per table
 
+    def _connect(self, autocommit=False):
+        """Open a new connection to the database.
+
+        Settings are applied at session level, they are reverted when the connection
+        is closed, also when the load fails.
+        """
+        conn = psycopg.connect(self.db_uri, autocommit=autocommit)
+        for name, value in self.session_settings.items():
+            conn.execute("SELECT set_config(%s, %s, false)", (name, str(value)))
+        if not autocommit:
+            conn.commit()
+        return conn
+
+    def _set_logged(self, conn, tables, logged=True):
+        """Switch tables between LOGGED and UNLOGGED.
+
+        :returns: the names of the tables that were switched.
+        """
+        logger = Logger.get_logger()
+        persistence = "LOGGED" if logged else "UNLOGGED"
+        switched = []
+        for name in tables:
+            try:
+                conn.execute(f"ALTER TABLE {name} SET {persistence}")
+                conn.commit()
+                switched.append(name)
+            except psycopg.Error:
+                # e.g. referenced by a foreign key of a table that is not being loaded
+                conn.rollback()
+                logger.exception(f"{name}: could not set {persistence}.", exc_info=1)
+        return switched
+
+    def _copy_file(self, conn, name, cols, options, fpath):
+        """Stream a CSV file into a table using COPY.
+
+        :returns: the number of copied rows.
+        """
+        logger = Logger.get_logger()
+        # total file size for progress and throughput logging
+        file_size = fpath.stat().st_size
+
+        logger.info(f"COPY FROM {fpath}.")
+        start = time.perf_counter()
+        progress = self._progress
+        pid = conn.info.backend_pid
+        if progress:
+            progress.track(pid, name, file_size)
+        try:
+            with conn.cursor() as cur:
+                with contextlib.ExitStack() as stack:
+                    copy = stack.enter_context(
+                        cur.copy(f"COPY {name} ({cols}) FROM STDIN ({options})")
+                    )
+                    # binary mode and a reused buffer, COPY parses the data anyway
+                    fp = stack.enter_context(open(fpath, "rb", buffering=0))
+                    buffer = bytearray(self.buffer_size)
+                    view = memoryview(buffer)
+
+                    sent = 0
+                    size = fp.readinto(buffer)
+                    while size:
+                        copy.write(view[:size])
+                        sent += size
+                        if progress:
+                            progress.sent(pid, sent)
+                        size = fp.readinto(buffer)
+                # the COPY is finished once its context is exited
+                rows = cur.rowcount
+        finally:
+            if progress:
+                progress.untrack(pid)
+
+        elapsed = max(time.perf_counter() - start, 1e-6)
+        mib = file_size / 2**20
+        logger.info(
+            f"{name}: {rows} rows, {mib:.1f} MiB in {elapsed:.2f} seconds "
+            f"({rows / elapsed:.0f} rows/s, {mib / elapsed:.1f} MiB/s)."
+        )
+        return rows
+
+    def _copy_file_recovering(self, conn, name, cols, options, fpath):
+        """Copy a CSV file rejecting the records that fail, see ``BisectingCopy``.
+
+        :returns: the number of copied rows.
+        """
+        return BisectingCopy(
+            conn,
+            f"COPY {name} ({cols}) FROM STDIN ({options})",
+            fpath,
+            rejects_path=fpath.with_suffix(".rejects.jsonl"),
+        ).run()
+
+    def _merge_sql(self, table, staging_name, ranged=False):
+        """SQL statement merging a staging table into its table.
+
+        :param ranged: merge only a range of rows, see ``BisectingMerge``.
+        """
+        name = table.__tablename__
+        cols = [f.name for f in fields(table)]
+        sql = (
+            f"INSERT INTO {name} ({', '.join(cols)}) "
+            f"SELECT {', '.join(cols)} FROM {staging_name}"
+        )
+        if ranged:
+            sql += f" WHERE {BisectingMerge.ROW_COLUMN} BETWEEN %(lo)s AND %(hi)s"
+        if not self.upsert:
+            return sql
+
+        pks = [col.name for col in table.__table__.primary_key.columns]
+        updates = [f"{col} = EXCLUDED.{col}" for col in cols if col not in pks]
+        sql += f" ON CONFLICT ({', '.join(pks)}) "
+        sql += f"DO UPDATE SET {', '.join(updates)}" if updates else "DO NOTHING"
+        return sql
+
+    def _merge_recovering(self, conn, table, staging_name, fpath):
+        """Merge a staging table rejecting the rows that fail, see ``BisectingMerge``.
+
+        :returns: the number of merged rows and the number of rejected ones.
+        """
+        merge = BisectingMerge(
+            conn,
+            self._merge_sql(table, staging_name, ranged=True),
+            staging_name,
+            [f.name for f in fields(table)],
+            table.__tablename__,
+            rejects_path=fpath.with_suffix(".rejects.jsonl"),
+        )
+        merged = merge.run()
+        return merged, merge.rejected
+
+    def _verify_table(self, conn, table, fpath, copied, checksum_table=None):
+        """Compare the rows written to a table file with the copied ones.
+
+        :param copied: number of rows copied.
+        :param checksum_table: name of the table holding only the copied rows.
+        """
+        if not self.verify:
+            return
+
+        logger = Logger.get_logger()
+        name = table.__tablename__
+        result = {"file": str(fpath), "written": None, "copied": copied}
+        status = "unverified"  # e.g. existing data, not written by this load
+        if name in self._written:
+            written, checksum = self._written[name]
+            result["written"] = written
+            if name in self._rejected:
+                result["rejected"] = self._rejected[name]
+            status = "ok" if written == copied else "mismatch"
+            if checksum is not None and checksum_table:
+                sql = checksum_sql(table, checksum_table)
+                loaded = int(conn.execute(sql).fetchone()[0])
+                result["checksum"] = {"written": checksum, "copied": loaded}
+                if loaded != checksum:
+                    status = "mismatch"
+
+        result["status"] = status
+        if status == "mismatch":
+            logger.error(f"{name}: verification failed {result}.")
+        self._verification[name] = result
+
+    def _save_verification_report(self):
+        """Save the verification results of the loaded tables."""
+        report_dir = self.tmp_dir or self.data_dir
+        report_dir.mkdir(parents=True, exist_ok=True)
+        fpath = report_dir / "verification.json"
+        fpath.write_text(json.dumps(self._verification, indent=2))
+
+        logger = Logger.get_logger()
+        failed = [n for n, r in self._verification.items() if r["status"] != "ok"]
+        logger.info(f"Verification report saved to {fpath}, not ok: {failed}.")
+
+    def _is_referenced(self, conn, name):
+        """Whether foreign keys of other tables reference a table.
+
+        Foreign keys dropped by ``drop_constraints`` are no longer in the catalog.
+        """
+        return conn.execute(
+            """
+            SELECT EXISTS (
+                SELECT 1 FROM pg_constraint
+                WHERE
+                    contype = 'f'
+                    AND confrelid = %s::regclass
+                    AND conrelid <> confrelid
+            );
+            """,
+            (name,),
+        ).fetchone()[0]
+
+    def _copy_table(
+        self, conn, table, fpath, source, checkpoints=None, recovering=False
+    ):
+        """Copy a table file into its table and commit.
+
+        :param recovering: copy the file isolating and rejecting the failing records.
+        """
+        logger = Logger.get_logger()
+        name = table.__tablename__
+        cols = ", ".join([f.name for f in fields(table)])
+        copy_file = self._copy_file_recovering if recovering else self._copy_file
+
+        options = "FORMAT csv"
+        # FREEZE cannot be used in the savepoints of a recovery
+        if self.fresh_target and not recovering:
+            # FREEZE requires the table to be created or truncated in the same
+            # transaction, never truncate a table loaded by a previous stream
+            is_empty = not conn.execute(
+                f"SELECT EXISTS (SELECT 1 FROM {name})"
+            ).fetchone()[0]
+            if not is_empty:
+                logger.warning(f"{name}: table is not empty, loading without FREEZE.")
+            elif self._is_referenced(conn, name):
+                # TRUNCATE fails even on an empty table, as long as it is referenced
+                logger.warning(
+                    f"{name}: table is referenced by foreign keys, loading without "
+                    "FREEZE."
+                )
+            else:
+                conn.execute(f"TRUNCATE {name}")
+                options += ", FREEZE"
+
+        # a frozen COPY into an empty table is atomic, cheaper and cannot conflict
+        staging = (checkpoints is not None or self.upsert) and "FREEZE" not in options
+        if staging:
+            # a failed COPY leaves the target table untouched (no dead rows or WAL)
+            staging_name = f"{name}_staging"
+            conn.execute(
+                f"CREATE TEMPORARY TABLE {staging_name} (LIKE {name}) ON COMMIT DROP"
+            )
+            if recovering:
+                # numbers the copied rows, to merge them in ranges
+                conn.execute(
+                    f"ALTER TABLE {staging_name} "
+                    f"ADD COLUMN {BisectingMerge.ROW_COLUMN} bigserial"
+                )
+            rows = copy_file(conn, staging_name, cols, options, fpath)
+            if recovering:
+                merged, rejected = self._merge_recovering(
+                    conn, table, staging_name, fpath
+                )
+                rows -= rejected  # and deleted from the staging table
+            else:
+                merged = conn.execute(self._merge_sql(table, staging_name)).rowcount
+            self._verify_table(conn, table, fpath, rows, staging_name)
+            if self.upsert:
+                logger.info(f"{name}: {merged} rows inserted or updated.")
+        else:
+            rows = copy_file(conn, name, cols, options, fpath)
+            # the table only holds the copied rows if it was empty
+            frozen = "FREEZE" in options
+            self._verify_table(conn, table, fpath, rows, name if frozen else None)
+
+        if checkpoints:
+            checkpoints.add(conn, name, source, rows)
+        conn.commit()
+
+    def _load_table(self, conn, existing_data, table, checkpoints=None):
+        """Bulk load one CSV table file.
+
+        :param checkpoints: ``LoadCheckpoints`` of the load, if checkpointing.
+        """
+        logger = Logger.get_logger()
+
+        name = table.__tablename__
+        # local overwrite for existing data
+        # e.g. when a table does not need transformation and is already in csv
+        fpath = self.data_dir if existing_data else self.tmp_dir
+        fpath = fpath / f"{name}.csv"
+
+        if not fpath.exists():
+            logger.warning(f"{name}: no data to load.")
+            conn.commit()
+            return
+
+        source = str(fpath.resolve())
+        if checkpoints and checkpoints.is_completed(name, source):
+            logger.info(f"{name}: already loaded from {fpath}, skipping.")
+            return
+
+        try:
+            self._copy_table(conn, table, fpath, source, checkpoints)
+        except psycopg.Error:
+            if not self.recover:
+                raise
+            logger.exception(
+                f"{name}: COPY failed, isolating the failing records.", exc_info=1
+            )
+            conn.rollback()
+            self._copy_table(conn, table, fpath, source, checkpoints, recovering=True)
+
     def _load(self, table_entries):
         """Bulk load CSV table files.
 
         Loads the tables in the order given by the generator.
         """
-        logger = Logger.get_logger()
+        table_entries = list(table_entries)
+        tables = [table.__tablename__ for _, table in table_entries]
 
-        with psycopg.connect(self.db_uri) as conn:
-            for existing_data, table in table_entries:
-                name = table.__tablename__
-                cols = ", ".join([f.name for f in fields(table)])
-                # local overwrite for existing data
-                # e.g. when a table does not need transformation and is already in csv
-                fpath = self.data_dir if existing_data else self.tmp_dir
-                fpath = fpath / f"{name}.csv"
-
-                if fpath.exists():
-                    # total file size for progress logging
-                    file_size = fpath.stat().st_size
-
-                    logger.info(f"COPY FROM {fpath}.")
-                    with contextlib.ExitStack() as stack:
-                        cur = stack.enter_context(conn.cursor())
-                        copy = stack.enter_context(
-                            cur.copy(f"COPY {name} ({cols}) FROM STDIN (FORMAT csv)")
-                        )
-                        fp = stack.enter_context(open(fpath, "r"))
-
-                        block_size = 8192
-
-                        def _data_blocks(block_size=8192):
-                            data = fp.read(block_size)
-                            while data:
-                                yield data
-                                data = fp.read(block_size)
-
-                        for idx, block in enumerate(_data_blocks(block_size)):
-                            if idx % 100:
-                                cur_bytes = idx * block_size
-                                percentage = (cur_bytes / file_size) * 100
-                                progress = (
-                                    f"{cur_bytes}/{file_size} ({percentage:.2f}%)"
-                                )
-                                logger.info(f"{name}: {progress}")
-                            copy.write(block)
+        ddl = None
+        if self.drop_constraints:
+            ddl = IndexesAndConstraints(
+                tables=tables, ddl_dir=self.tmp_dir or self.data_dir
+            )
+            with self._connect() as conn:
+                ddl.save(conn)
+                ddl.drop(conn)
+
+        unlogged_tables = []
+        load_error = None
+        try:
+            with contextlib.ExitStack() as stack:
+                if self.progress_interval:
+                    self._progress = stack.enter_context(
+                        CopyProgressMonitor(self._connect, self.progress_interval)
+                    )
+                conn = stack.enter_context(self._connect())
+                checkpoints = None
+                if self.checkpoint:
+                    checkpoints = LoadCheckpoints(type(self).__name__)
+                    checkpoints.fetch(conn)
+                if self.unlogged:
+                    unlogged_tables = self._set_logged(conn, tables, logged=False)
+                if self.concurrent_tables:
+                    self._load_concurrently(table_entries, checkpoints)
                 else:
-                    logger.warning(f"{name}: no data to load.")
-                conn.commit()
+                    for existing_data, table in table_entries:
+                        self._load_table(conn, existing_data, table, checkpoints)
+                        self._loaded_tables.append(table.__tablename__)
+        except BaseException as exc:
+            load_error = exc
+            raise
+        finally:
+            self._progress = None
+            # restore even on failure, so the schema is left as it was
+            if unlogged_tables:
+                with self._connect() as conn:
+                    self._set_logged(conn, unlogged_tables, logged=True)
+            if ddl:
+                self._restore_ddl(ddl, load_error)
+            if self.verify:
+                self._save_verification_report()
+
+    def _restore_ddl(self, ddl, load_error=None):
+        """Restore the dropped indexes and foreign keys.
+
+        :param load_error: exception of the load, if it failed. It is not hidden by a
+        failure of the restore, which is logged instead.
+        """
+        try:
+            ddl.restore(self._connect, workers=self.workers)
+        except Exception:
+            logger = Logger.get_logger()
+            logger.exception(
+                "Could not restore the indexes and foreign keys, run the statements "
+                f"of {ddl.ddl_dir / 'restore-ddl.sql'} manually.",
+                exc_info=1,
+            )
+            if load_error is None:
+                raise
+
+    def _load_concurrently(self, table_entries, checkpoints=None):
+        """Load the tables using up to ``workers`` connections at the same time."""
+        logger = Logger.get_logger()
+
+        def _load_one(existing_data, table):
+            with self._connect() as conn:
+                self._load_table(conn, existing_data, table, checkpoints)
+
+        with ThreadPoolExecutor(max_workers=max(1, self.workers)) as executor:
+            futures = {
+                executor.submit(_load_one, existing_data, table): table
+                for existing_data, table in table_entries
+            }
+
+        errors = []
+        # tables are independent, all of them are tried before failing
+        for future, table in futures.items():
+            try:
+                future.result()
+                self._loaded_tables.append(table.__tablename__)
+            except Exception as exc:
+                logger.exception(f"{table.__tablename__}: load failed.", exc_info=1)
+                errors.append(exc)
+        if errors:
+            raise errors[0]
+
+    def _update_statistics(self):
+        """Analyze (and vacuum) the loaded tables using parallel connections.
+
+        :returns: a dictionary with the duration in seconds per table.
+        """
+        if self.vacuum:
+            command = "VACUUM (FREEZE, ANALYZE)"
+        elif self.analyze:
+            command = "ANALYZE"
+        else:
+            return {}
+
+        logger = Logger.get_logger()
+        tables = list(dict.fromkeys(self._loaded_tables))  # unique, keeps order
+        logger.info(f"Running {command} on {len(tables)} tables.")
+        # vacuum cannot run inside a transaction block
+        return execute_in_parallel(
+            self._connect,
+            ((name, f"{command} {name}") for name in tables),
+            workers=self.workers,
+            autocommit=True,
+        )
 
     def _post_load(self):
         """Post load processing."""
         self.alter_sequences()
+        self._update_statistics()
 
     def run(self, entries, cleanup=False):
         """Load entries."""
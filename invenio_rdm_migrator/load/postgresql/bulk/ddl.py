@@ -0,0 +1,127 @@
+# SPDX-FileCopyrightText: 2024 CERN.
+# SPDX-License-Identifier: MIT
+
+"""Indexes and foreign keys handling around bulk loads."""
+
+from ....logging import Logger
+from ..parallel import execute_in_parallel
+
+
+class IndexesAndConstraints:
+    """Drop and restore the indexes and foreign keys of a set of tables.
+
+    The definitions are introspected from the database catalog, therefore they do not
+    drift from the actual schema. Primary keys, unique constraints, unique indexes and
+    any index backing a constraint are kept, since they are needed for correctness
+    (uniqueness is enforced during the load).
+    """
+
+    def __init__(self, tables, ddl_dir=None):
+        """Constructor.
+
+        :param tables: names of the tables whose indexes and foreign keys are dropped.
+        :param ddl_dir: directory where to save the restore statements, so they can
+        be run manually if the migration process dies before restoring them.
+        """
+        self.tables = list(tables)
+        self.ddl_dir = ddl_dir
+        self.indexes = []  # (table, name, definition)
+        self.foreign_keys = []  # (table, name, definition)
+
+    def save(self, conn):
+        """Introspect the definitions of the indexes and foreign keys."""
+        self.foreign_keys = conn.execute(
+            """
+            SELECT
+                c.conrelid::regclass::text,
+                quote_ident(c.conname),
+                pg_get_constraintdef(c.oid)
+            FROM pg_constraint AS c
+            WHERE
+                c.contype = 'f'
+                AND c.conrelid::regclass::text = ANY(%s)
+            ORDER BY 1, 2;
+            """,
+            (self.tables,),
+        ).fetchall()
+
+        self.indexes = conn.execute(
+            """
+            SELECT
+                i.indrelid::regclass::text,
+                i.indexrelid::regclass::text,
+                pg_get_indexdef(i.indexrelid)
+            FROM pg_index AS i
+            WHERE
+                i.indrelid::regclass::text = ANY(%s)
+                AND NOT i.indisprimary
+                AND NOT i.indisunique
+                AND NOT EXISTS (
+                    SELECT 1 FROM pg_constraint AS c WHERE c.conindid = i.indexrelid
+                )
+            ORDER BY 1, 2;
+            """,
+            (self.tables,),
+        ).fetchall()
+
+        if self.ddl_dir:
+            self.ddl_dir.mkdir(parents=True, exist_ok=True)
+            with open(self.ddl_dir / "restore-ddl.sql", "w") as fp:
+                for _, sql in self.restore_statements():
+                    fp.write(f"{sql};\n")
+
+    def drop_statements(self):
+        """Statements to drop foreign keys first and then indexes."""
+        for table, name, _ in self.foreign_keys:
+            yield f"ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {name}"
+        for _, name, _ in self.indexes:
+            yield f"DROP INDEX IF EXISTS {name}"
+
+    def restore_statements(self):
+        """Statements to restore the indexes first and then foreign keys."""
+        for table, name, definition in self.indexes:
+            yield f"{table}.{name}", definition
+        for table, name, definition in self.foreign_keys:
+            sql = f"ALTER TABLE {table} ADD CONSTRAINT {name} {definition}"
+            yield f"{table}.{name}", sql
+
+    def drop(self, conn):
+        """Drop the saved foreign keys and indexes in one transaction."""
+        logger = Logger.get_logger()
+        logger.info(
+            f"Dropping {len(self.foreign_keys)} foreign keys and "
+            f"{len(self.indexes)} indexes."
+        )
+        for sql in self.drop_statements():
+            conn.execute(sql)
+        conn.commit()
+
+    def restore(self, connect, workers=4):
+        """Recreate indexes and then foreign keys using parallel connections.
+
+        Foreign keys are restored last, so their validation can use the indexes.
+
+        :returns: a dictionary with the duration in seconds per index/constraint.
+        """
+        logger = Logger.get_logger()
+        statements = list(self.restore_statements())
+        n_indexes = len(self.indexes)
+        batches = (
+            ("indexes", statements[:n_indexes]),
+            ("foreign keys", statements[n_indexes:]),
+        )
+
+        durations = {}
+        errors = []
+        for kind, batch in batches:
+            logger.info(f"Restoring {len(batch)} {kind}.")
+            try:
+                durations.update(execute_in_parallel(connect, batch, workers=workers))
+            except Exception as exc:
+                # keep going, a failed index should not leave the foreign keys dropped
+                errors.append(exc)
+
+        if errors:
+            raise errors[0]
+
+        return durations
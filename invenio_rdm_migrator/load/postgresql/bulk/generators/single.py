@@ -18,4 +18,4 @@ class SingleTableGenerator(TableGenerator):
     def _generate_rows(self, data, **kwargs):
         """Yield generated rows."""
         table = self.tables[0]
-        yield table(**data)
+        yield table.row(**data)
@@ -3,30 +3,8 @@
 
 """Base table generator."""
 
-import csv
-from dataclasses import fields
-from datetime import datetime
-from uuid import UUID
-
-import orjson
-
 from ...generators import PostgreSQLGenerator
-
-
-def as_csv_row(dc):
-    """Serialize a dataclass instance as a CSV-writable row."""
-    row = []
-    for f in fields(dc):
-        val = getattr(dc, f.name)
-        if val:
-            if issubclass(f.type, (dict,)):
-                val = orjson.dumps(val).decode("utf-8")
-            elif issubclass(f.type, (datetime,)) and isinstance(val, (datetime,)):
-                val = val.isoformat()
-            elif issubclass(f.type, (UUID,)):
-                val = str(val)
-        row.append(val)
-    return row
+from ..writers import CSVTableWriter
 
 
 class TableGenerator(PostgreSQLGenerator):
@@ -38,8 +16,20 @@ class TableGenerator(PostgreSQLGenerator):
         self.tables = tables
         self.existing_data = existing_data
 
-    def prepare(self, tmp_dir, entry, stack, output_files, create=False, **kwargs):
-        """Compute rows."""
+    def prepare(
+        self,
+        tmp_dir,
+        entry,
+        stack,
+        output_files,
+        create=False,
+        writer_cls=CSVTableWriter,
+        **kwargs,
+    ):
+        """Compute rows.
+
+        :param writer_cls: factory of the table writers, called with the file path.
+        """
         if not self.existing_data:
             # is_db_empty would come in play and make _generate_pks optional
             self._generate_pks(entry, create)
@@ -47,10 +37,9 @@ class TableGenerator(PostgreSQLGenerator):
             self._resolve_references(entry)
 
             for entry in self._generate_rows(entry):
-                if entry.__tablename__ not in output_files:
+                writer = output_files.get(entry.__tablename__)
+                if writer is None:
                     fpath = tmp_dir / f"{entry.__tablename__}.csv"
-                    output_files[entry.__tablename__] = csv.writer(
-                        stack.enter_context(open(fpath, "w+"))
-                    )
-                writer = output_files[entry.__tablename__]
-                writer.writerow(as_csv_row(entry))
+                    writer = stack.enter_context(writer_cls(fpath))
+                    output_files[entry.__tablename__] = writer
+                writer.writerow(entry)
@@ -0,0 +1,133 @@
+# SPDX-FileCopyrightText: 2024 CERN.
+# SPDX-License-Identifier: MIT
+
+"""Progress monitoring of COPY commands."""
+
+import threading
+import time
+
+from ....logging import Logger
+
+
+class CopyProgressMonitor:
+    """Background thread logging the progress of the running COPY commands.
+
+    Progress is read from ``pg_stat_progress_copy`` on a side connection (i.e. the
+    rows and bytes processed by the server). On PostgreSQL versions older than 14,
+    which do not have that view, the bytes sent by the client are reported instead.
+    """
+
+    def __init__(self, connect, interval=10):
+        """Constructor.
+
+        :param connect: callable returning a new psycopg connection.
+        :param interval: seconds between two progress reports.
+        """
+        self.connect = connect
+        self.interval = interval
+        self._copies = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def track(self, pid, name, total_bytes):
+        """Start tracking the COPY running on a backend.
+
+        :param pid: process id of the backend running the COPY.
+        :param name: name of the table being loaded.
+        :param total_bytes: size of the file being loaded.
+        """
+        with self._lock:
+            self._copies[pid] = {
+                "name": name,
+                "total": total_bytes,
+                "start": time.monotonic(),
+                "sent": 0,
+            }
+
+    def sent(self, pid, sent_bytes):
+        """Update the number of bytes sent by the client."""
+        copy = self._copies.get(pid)
+        if copy:
+            copy["sent"] = sent_bytes
+
+    def untrack(self, pid):
+        """Stop tracking the COPY running on a backend."""
+        with self._lock:
+            self._copies.pop(pid, None)
+
+    def _server_progress(self, conn, pids):
+        """Rows and bytes processed by the server, by backend pid."""
+        results = conn.execute(
+            "SELECT pid, tuples_processed, bytes_processed "
+            "FROM pg_stat_progress_copy WHERE pid = ANY(%s)",
+            (pids,),
+        ).fetchall()
+        return {pid: (rows, size) for pid, rows, size in results}
+
+    def report(self, conn=None):
+        """Log the progress of the tracked COPY commands.
+
+        :param conn: side connection, if None the bytes sent by the client are used.
+        """
+        logger = Logger.get_logger()
+        with self._lock:
+            copies = dict(self._copies)
+        if not copies:
+            return
+
+        progress = {}
+        if conn is not None:
+            progress = self._server_progress(conn, list(copies))
+
+        now = time.monotonic()
+        for pid, copy in copies.items():
+            rows, processed = progress.get(pid, (None, copy["sent"]))
+            elapsed = max(now - copy["start"], 1e-6)
+            speed = processed / elapsed
+            message = f"{copy['name']}: "
+            if rows is not None:
+                message += f"{rows} rows ({rows / elapsed:.0f} rows/s), "
+            message += f"{processed}/{copy['total']} bytes"
+            if copy["total"]:
+                message += f" ({processed / copy['total'] * 100:.2f}%)"
+            message += f", {speed / 2**20:.1f} MiB/s"
+            if speed and copy["total"] > processed:
+                message += f", ETA {(copy['total'] - processed) / speed:.0f} seconds"
+            logger.info(message + ".")
+
+    def _run(self):
+        """Report the progress every interval until stopped."""
+        logger = Logger.get_logger()
+        conn = None
+        try:
+            conn = self.connect(autocommit=True)
+            if conn.info.server_version < 140000:
+                logger.info("pg_stat_progress_copy is not available.")
+                conn.close()
+                conn = None
+        except Exception:
+            logger.exception("Could not open the progress connection.", exc_info=1)
+
+        try:
+            while not self._stop.wait(self.interval):
+                try:
+                    self.report(conn)
+                except Exception:
+                    # progress reporting must never fail the load
+                    logger.exception("Could not report the COPY progress.", exc_info=1)
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def __enter__(self):
+        """Start the monitoring thread."""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        """Stop the monitoring thread."""
+        self._stop.set()
+        self._thread.join()
@@ -0,0 +1,247 @@
+# SPDX-FileCopyrightText: 2024 CERN.
+# SPDX-License-Identifier: MIT
+
+"""Recovery of failed COPY commands.
+
+The csv file is copied again in chunks of records, each in its own savepoint. A
+failing chunk is split in halves until the failing records are isolated, those are
+rejected and the rest of the file is loaded. When the file is copied into a staging
+table, constraint violations only happen when merging it, which is bisected the same
+way over the rows of the staging table.
+
+All the rejects (including the invalid rows of the table writers) are written with
+the same schema, see ``reject_line``.
+"""
+
+from abc import ABC, abstractmethod
+from array import array
+
+import orjson
+import psycopg
+
+from ....logging import Logger
+
+
+def reject_line(table, stage, errors, record=None, row=None, data=None):
+    """Line of a ``<table>.rejects.jsonl`` file.
+
+    :param table: name of the table.
+    :param stage: stage in which the row was rejected, ``validate`` (table writer),
+    ``copy`` or ``merge`` (of a staging table).
+    :param errors: list of ``(column, error)``, the column is None if unknown.
+    :param record: number of the record in the table file, if it was written.
+    :param row: values of the row by column name, if known.
+    :param data: csv record, if the row was not parsed.
+    """
+    reject = {
+        "table": table,
+        "stage": stage,
+        "record": record,
+        "row": row,
+        "data": data,
+        "errors": [{"column": col, "error": error} for col, error in errors],
+    }
+    return orjson.dumps(reject, default=str) + b"\n"
+
+
+def _errors(exc):
+    """Errors of a database exception, see ``reject_line``."""
+    return [(exc.diag.column_name, str(exc).strip())]
+
+
+def record_offsets(fpath):
+    """Byte offsets of the csv records of a file.
+
+    Quoted values can contain new lines, a record only ends on a new line when the
+    number of quotes seen so far is even.
+
+    :returns: the offset of the start of each record, plus the end of the file, as
+    an array of 64 bits integers (a list would take several times the memory).
+    """
+    offsets = array("q", [0])
+    position = 0
+    quotes = 0
+    with open(fpath, "rb") as fp:
+        for line in fp:
+            position += len(line)
+            quotes += line.count(b'"')
+            if quotes % 2 == 0:
+                offsets.append(position)
+                quotes = 0
+    if offsets[-1] != position:  # unterminated last record
+        offsets.append(position)
+    return offsets
+
+
+class Bisection(ABC):
+    """Apply ranges of records, each in a savepoint, rejecting the ones that fail."""
+
+    stage = None
+
+    def __init__(self, conn, table, rejects_path, chunk_size=10_000):
+        """Constructor.
+
+        :param conn: connection, in the transaction of the table load.
+        :param table: name of the table, for the rejects.
+        :param rejects_path: file to which the rejected records are appended.
+        :param chunk_size: number of records applied at once before bisecting.
+        """
+        self.conn = conn
+        self.table = table
+        self.rejects_path = rejects_path
+        self.chunk_size = chunk_size
+        self.rejected = 0
+        self._rejects_fp = None
+
+    @abstractmethod
+    def _apply(self, lo, hi):  # pragma: no cover
+        """Apply the records from lo (included) to hi (excluded).
+
+        :returns: the number of affected rows.
+        """
+        pass
+
+    @abstractmethod
+    def _reject(self, idx, exc):  # pragma: no cover
+        """Append a failing record and its error to the rejects file."""
+        pass
+
+    def _bisect(self, lo, hi):
+        """Apply the records in a savepoint, split them in halves on failure."""
+        self.conn.execute("SAVEPOINT bisection")
+        try:
+            rows = self._apply(lo, hi)
+        except psycopg.Error as exc:
+            self.conn.execute("ROLLBACK TO SAVEPOINT bisection")
+            self.conn.execute("RELEASE SAVEPOINT bisection")
+            if hi - lo == 1:
+                self._reject(lo, exc)
+                self.rejected += 1
+                return 0
+            mid = (lo + hi) // 2
+            return self._bisect(lo, mid) + self._bisect(mid, hi)
+
+        self.conn.execute("RELEASE SAVEPOINT bisection")
+        return rows
+
+    def _run(self, records):
+        """Apply all the records.
+
+        :returns: the number of affected rows.
+        """
+        rows = 0
+        with open(self.rejects_path, "ab") as self._rejects_fp:
+            for lo in range(0, records, self.chunk_size):
+                rows += self._bisect(lo, min(lo + self.chunk_size, records))
+
+        logger = Logger.get_logger()
+        logger.warning(
+            f"{self.table}: {rows} rows loaded ({self.stage}), {self.rejected} "
+            f"rejected records written to {self.rejects_path}."
+        )
+        return rows
+
+
+class BisectingCopy(Bisection):
+    """COPY a csv file isolating (and rejecting) the records that fail."""
+
+    stage = "copy"
+
+    def __init__(self, conn, sql, fpath, rejects_path, chunk_size=10_000):
+        """Constructor.
+
+        :param sql: ``COPY ... FROM STDIN`` statement.
+        :param fpath: table file, named after its table.
+        """
+        super().__init__(conn, fpath.stem, rejects_path, chunk_size=chunk_size)
+        self.sql = sql
+        self.fpath = fpath
+        self._fp = None
+        self._offsets = None
+
+    def _read(self, lo, hi):
+        """Data of the records from lo (included) to hi (excluded)."""
+        start, end = self._offsets[lo], self._offsets[hi]
+        self._fp.seek(start)
+        return self._fp.read(end - start)
+
+    def _apply(self, lo, hi):
+        """Copy the records from lo (included) to hi (excluded)."""
+        data = self._read(lo, hi)
+        with self.conn.cursor() as cur:
+            with cur.copy(self.sql) as copy:
+                copy.write(data)
+            return cur.rowcount
+
+    def _reject(self, idx, exc):
+        """Append a failing record and its error to the rejects file."""
+        data = self._read(idx, idx + 1).decode("utf-8", errors="replace")
+        self._rejects_fp.write(
+            reject_line(self.table, self.stage, _errors(exc), record=idx + 1, data=data)
+        )
+
+    def run(self):
+        """Copy the file.
+
+        :returns: the number of copied rows.
+        """
+        self._offsets = record_offsets(self.fpath)
+        with open(self.fpath, "rb") as self._fp:
+            return self._run(len(self._offsets) - 1)
+
+
+class BisectingMerge(Bisection):
+    """Merge a staging table isolating (and rejecting) the rows that fail.
+
+    The rows of the staging table are identified by a ``ROW_COLUMN`` column, which
+    has to be added (e.g. as ``bigserial``) before copying into it. The rejected rows
+    are deleted from the staging table, so that it only holds the merged rows.
+    """
+
+    stage = "merge"
+    ROW_COLUMN = "_bisection_row"
+
+    def __init__(self, conn, sql, staging_name, cols, table, rejects_path, **kwargs):
+        """Constructor.
+
+        :param sql: merge statement, restricted to the rows whose ``ROW_COLUMN`` is
+        between the ``%(lo)s`` and ``%(hi)s`` parameters.
+        :param staging_name: name of the staging table.
+        :param cols: names of the columns of the table.
+        """
+        super().__init__(conn, table, rejects_path, **kwargs)
+        self.sql = sql
+        self.staging_name = staging_name
+        self.cols = cols
+        self._rows = None
+
+    def _apply(self, lo, hi):
+        """Merge the rows from lo (included) to hi (excluded)."""
+        params = {"lo": self._rows[lo], "hi": self._rows[hi - 1]}
+        return self.conn.execute(self.sql, params).rowcount
+
+    def _reject(self, idx, exc):
+        """Append a failing row and its error to the rejects file."""
+        values = self.conn.execute(
+            f"DELETE FROM {self.staging_name} WHERE {self.ROW_COLUMN} = %s "
+            f"RETURNING {', '.join(self.cols)}",
+            (self._rows[idx],),
+        ).fetchone()
+        row = dict(zip(self.cols, values))
+        self._rejects_fp.write(
+            reject_line(self.table, self.stage, _errors(exc), row=row)
+        )
+
+    def run(self):
+        """Merge the staging table.
+
+        :returns: the number of inserted (or updated) rows.
+        """
+        # server side cursor, the row numbers are fetched in batches
+        with self.conn.cursor(name="bisection_rows") as cur:
+            cur.execute(
+                f"SELECT {self.ROW_COLUMN} FROM {self.staging_name} "
+                f"ORDER BY {self.ROW_COLUMN}"
+            )
+            self._rows = array("q", (row for row, in cur))
+        return self._run(len(self._rows))
@@ -0,0 +1,140 @@
+# SPDX-FileCopyrightText: 2024 CERN.
+# SPDX-License-Identifier: MIT
+
+"""Validation of the rows before writing them to the table files.
+
+The checks are compiled once per model from its column metadata and are meant to be
+cheap, they catch the most common errors that would make the COPY of the whole
+table fail (e.g. nulls in non-nullable columns or malformed UUIDs).
+"""
+
+import re
+from dataclasses import fields
+from datetime import datetime
+from functools import lru_cache
+from uuid import UUID
+
+import sqlalchemy as sa
+
+from ..models import Row
+
+_DATE_PREFIX = re.compile(r"\d{4}-\d{2}-\d{2}")
+# whitespace ignored around integers and booleans by PostgreSQL
+_SPACE = " \t\n\r\v\f"
+# decimal integers, as accepted by all PostgreSQL versions (i.e. without the
+# underscores and non-decimal prefixes of PostgreSQL 16)
+_INTEGER = re.compile(rf"[{_SPACE}]*[+-]?[0-9]+[{_SPACE}]*")
+# any prefix of the boolean words, unless ambiguous ("o"), or 1 and 0
+_BOOLEANS = (
+    {
+        word[:idx]
+        for word in ("true", "false", "yes", "no", "on", "off")
+        for idx in range(1, len(word) + 1)
+    }
+    - {"o"}
+) | {"1", "0"}
+
+
+def _check_uuid(val):
+    if not isinstance(val, UUID):
+        UUID(str(val))  # raises ValueError
+
+
+def _int_checker(bits):
+    low, high = -(2 ** (bits - 1)), 2 ** (bits - 1) - 1
+
+    def _check_int(val):
+        if isinstance(val, bool):  # written as True/False
+            raise ValueError(f"{val!r} is not an integer")
+        if not isinstance(val, int):
+            text = str(val)
+            if not _INTEGER.fullmatch(text):
+                raise ValueError(f"{val!r} is not an integer")
+            val = int(text)
+        if not low <= val <= high:
+            raise ValueError(f"{val!r} out of range for a {bits} bits integer")
+
+    return _check_int
+
+
+def _check_bool(val):
+    if not isinstance(val, bool) and str(val).strip(_SPACE).lower() not in _BOOLEANS:
+        raise ValueError(f"{val!r} is not a boolean")
+
+
+def _check_datetime(val):
+    # strings are already serialized, their format is left to the database
+    if not isinstance(val, datetime) and not (
+        isinstance(val, str) and _DATE_PREFIX.match(val)
+    ):
+        raise ValueError(f"{val!r} is not a datetime")
+
+
+def _string_checker(length):
+    def _check_string(val):
+        val = val if isinstance(val, str) else str(val)
+        if "\x00" in val:
+            raise ValueError("string contains NUL characters")
+        if length and len(val) > length:
+            raise ValueError(f"string longer than {length} characters")
+
+    return _check_string
+
+
+def _type_checker(type_, column):
+    """Check function of a column type, None if no check is done."""
+    if issubclass(type_, bool):
+        return _check_bool
+    if issubclass(type_, int):
+        if isinstance(column.type, sa.BigInteger):
+            return _int_checker(64)
+        if isinstance(column.type, sa.SmallInteger):
+            return _int_checker(16)
+        return _int_checker(32)
+    if issubclass(type_, UUID):
+        return _check_uuid
+    if issubclass(type_, datetime):
+        return _check_datetime
+    if issubclass(type_, str):
+        return _string_checker(getattr(column.type, "length", None))
+    return None
+
+
+@lru_cache(maxsize=None)
+def row_validator(model, not_null=None):
+    """Compile the validation function of a model (or of its rows).
+
+    :param not_null: names of the non-nullable columns, e.g. introspected from the
+    database. Only the primary key columns by default, as the nullability of the
+    other columns of the models does not always match the database schema.
+    :returns: a function returning the list of errors of a row, as
+    ``(column, message)`` tuples.
+    """
+    dc = model.__model__ if issubclass(model, Row) else model
+    columns = dc.__table__.columns
+    if not_null is None:
+        not_null = {col.name for col in dc.__table__.primary_key.columns}
+    checks = []
+    for f in fields(dc):
+        column = columns[f.name]
+        nullable = f.name not in not_null
+        checks.append((f.name, nullable, _type_checker(f.type, column)))
+
+    is_row = issubclass(model, Row)
+
+    def _validate(row):
+        errors = []
+        # rows already hold the values in column order
+        values = row if is_row else [getattr(row, c[0]) for c in checks]
+        for (name, nullable, check), val in zip(checks, values):
+            if val is None:
+                if not nullable:
+                    errors.append((name, "null value in non-nullable column"))
+            elif check:
+                try:
+                    check(val)
+                except (TypeError, ValueError) as exc:
+                    errors.append((name, str(exc) or f"invalid value {val!r}"))
+        return errors
+
+    return _validate
@@ -0,0 +1,54 @@
+# SPDX-FileCopyrightText: 2024 CERN.
+# SPDX-License-Identifier: MIT
+
+"""Verification of the bulk loaded rows.
+
+The checksum of a table is the sum of a 64 bits hash of the primary key of each
+row. It does not depend on the order of the rows, so it can be computed while
+writing the csv files and compared with the one computed by the database.
+"""
+
+from dataclasses import fields
+from functools import lru_cache
+from hashlib import md5
+from operator import attrgetter, itemgetter
+
+from ..models import Row
+
+
+def _pk_names(model):
+    """Primary key column names of a model."""
+    return [col.name for col in model.__table__.primary_key.columns]
+
+
+def pk_hash(values):
+    """64 bits (signed) hash of the primary key values of a row."""
+    text = ",".join(str(val) for val in values)
+    return int.from_bytes(md5(text.encode("utf-8")).digest()[:8], "big", signed=True)
+
+
+@lru_cache(maxsize=None)
+def row_pk_hash(model):
+    """Compile the primary key hash function of a model (or of its rows)."""
+    if issubclass(model, Row):
+        names = [f.name for f in fields(model.__model__)]
+        pks = _pk_names(model.__model__)
+        getter = itemgetter(*[names.index(pk) for pk in pks])
+    else:
+        pks = _pk_names(model)
+        getter = attrgetter(*pks)
+
+    if len(pks) == 1:
+        return lambda row: pk_hash((getter(row),))
+    return lambda row: pk_hash(getter(row))
+
+
+def checksum_sql(model, name=None):
+    """SQL query computing the checksum of a table, see ``pk_hash``.
+
+    :param name: name of the table to query, defaults to the model's table.
+    """
+    name = name or model.__tablename__
+    pks = ", ".join(f"{pk}::text" for pk in _pk_names(model))
+    row_hash = f"('x' || substr(md5(concat_ws(',', {pks})), 1, 16))::bit(64)::bigint"
+    return f"SELECT coalesce(sum({row_hash}), 0) FROM {name}"
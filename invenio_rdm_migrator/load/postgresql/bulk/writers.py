@@ -0,0 +1,268 @@
+# SPDX-FileCopyrightText: 2024 CERN.
+# SPDX-License-Identifier: MIT
+
+"""Table file writers used to stage rows before COPY."""
+
+import csv
+import re
+from abc import ABC, abstractmethod
+from dataclasses import fields
+from datetime import datetime
+from functools import lru_cache
+from operator import attrgetter, itemgetter
+from uuid import UUID
+
+import orjson
+
+from ....logging import Logger
+from ..models import Row
+from .recovery import reject_line
+from .validation import row_validator
+from .verification import row_pk_hash
+
+
+def _dump_json(val):
+    return orjson.dumps(val).decode("utf-8")
+
+
+def _dump_datetime(val):
+    # datetime columns can also receive already serialized (str) values
+    return val.isoformat() if isinstance(val, datetime) else val
+
+
+def _column_converter(type_):
+    """Converter function for a column type, None if no conversion is needed."""
+    if issubclass(type_, (dict,)):
+        return _dump_json
+    elif issubclass(type_, (datetime,)):
+        return _dump_datetime
+    elif issubclass(type_, (UUID,)):
+        return str
+    return None
+
+
+def _tuple_getter(getter_cls, names):
+    """Item/attribute getter that always returns a tuple."""
+    if len(names) == 1:
+        getter = getter_cls(names[0])
+        return lambda obj: (getter(obj),)
+    return getter_cls(*names)
+
+
+@lru_cache(maxsize=None)
+def row_serializer(model):
+    """Compile the CSV row serializer of a model (or of its lightweight rows).
+
+    The column order and the converter of each column are computed only once per
+    model, instead of once per row.
+    """
+    if issubclass(model, Row):
+        converters = [_column_converter(f.type) for f in fields(model.__model__)]
+
+        def _serialize_row(row):
+            # rows already hold the values in column order
+            return [
+                conv(val) if conv and val else val for conv, val in zip(converters, row)
+            ]
+
+        return _serialize_row
+
+    names = [f.name for f in fields(model)]
+    converters = [_column_converter(f.type) for f in fields(model)]
+    # reading the instance dict skips the (slow) instrumented attributes
+    dict_getter = _tuple_getter(itemgetter, names)
+    attr_getter = _tuple_getter(attrgetter, names)
+
+    def _serialize(dc):
+        try:
+            values = dict_getter(dc.__dict__)
+        except (AttributeError, KeyError):  # e.g. expired attributes
+            values = attr_getter(dc)
+        return [
+            conv(val) if conv and val else val for conv, val in zip(converters, values)
+        ]
+
+    return _serialize
+
+
+def as_csv_row(dc):
+    """Serialize a dataclass instance or model row as a CSV-writable row."""
+    return row_serializer(type(dc))(dc)
+
+
+DEFAULT_BUFFER_SIZE = 1024 * 1024
+"""Default buffer size (in bytes) of the binary writer and of the COPY reader."""
+
+# PostgreSQL CSV: fields with a delimiter, quote or newline must be quoted, the
+# empty string must be quoted to differ from NULL and so must the end-of-data marker
+_NEEDS_QUOTING = re.compile(r'[",\r\n]|^$|^\\\.$')
+
+
+def _quote(text):
+    return '"' + text.replace('"', '""') + '"'
+
+
+def _encode_text(val):
+    if isinstance(val, str):
+        return _quote(val) if _NEEDS_QUOTING.search(val) else val
+    if isinstance(val, datetime):
+        return val.isoformat()
+    # int, bool, UUID, etc. never contain characters that need quoting
+    return str(val)
+
+
+def _encode_json(val):
+    # same serialization as the csv writer, strings are JSON strings too
+    return _quote(_dump_json(val))
+
+
+@lru_cache(maxsize=None)
+def row_encoder(model):
+    """Compile the CSV line encoder of a model (or of its lightweight rows).
+
+    :returns: a function returning the CSV line (without line terminator) of a row.
+    """
+    dc = model.__model__ if issubclass(model, Row) else model
+    encoders = [
+        _encode_json if issubclass(f.type, dict) else _encode_text for f in fields(dc)
+    ]
+    is_row = issubclass(model, Row)
+    names = [f.name for f in fields(dc)]
+    dict_getter = _tuple_getter(itemgetter, names)
+    attr_getter = _tuple_getter(attrgetter, names)
+
+    def _encode(row):
+        if is_row:  # rows already hold the values in column order
+            values = row
+        else:
+            try:
+                values = dict_getter(row.__dict__)
+            except (AttributeError, KeyError):  # e.g. expired attributes
+                values = attr_getter(row)
+        return ",".join(
+            "" if val is None else enc(val) for enc, val in zip(encoders, values)
+        )
+
+    return _encode
+
+
+class TableWriter(ABC):
+    """Base table file writer.
+
+    Writers are context managers, the file is opened on enter and closed on exit.
+    """
+
+    def __init__(self, fpath, checksum=False, validate=False, not_null=None):
+        """Constructor.
+
+        :param fpath: path of the table file to write.
+        :param checksum: compute the primary key checksum of the written rows.
+        :param validate: validate the rows, invalid rows are not written to the
+        table file but to a ``<table>.rejects.jsonl`` file next to it.
+        :param not_null: non-nullable columns by table name, see ``row_validator``.
+        """
+        self.fpath = fpath
+        self.rows = 0
+        self.rejected = 0
+        self.checksum = 0 if checksum else None
+        self.validate = validate
+        self.not_null = not_null or {}
+        self._fp = None
+        self._rejects_fp = None
+
+    def _reject(self, row, errors):
+        """Write an invalid row and its errors to the rejects file."""
+        if self._rejects_fp is None:
+            rejects_path = self.fpath.with_suffix(".rejects.jsonl")
+            self._rejects_fp = open(rejects_path, "wb")
+        names = [f.name for f in fields(row.__model__ if isinstance(row, Row) else row)]
+        values = row if isinstance(row, Row) else [getattr(row, n) for n in names]
+        row = dict(zip(names, values))
+        self._rejects_fp.write(
+            reject_line(self.fpath.stem, "validate", errors, row=row)
+        )
+        self.rejected += 1
+
+    @abstractmethod
+    def _open(self):  # pragma: no cover
+        """Open the table file."""
+        pass
+
+    @abstractmethod
+    def _write(self, row):  # pragma: no cover
+        """Write one row to the table file."""
+        pass
+
+    def writerow(self, row):
+        """Write one model instance or row."""
+        if self.validate:
+            not_null = self.not_null.get(type(row).__tablename__)
+            errors = row_validator(type(row), not_null)(row)
+            if errors:
+                self._reject(row, errors)
+                return
+        self._write(row)
+        self.rows += 1
+        if self.checksum is not None:
+            self.checksum += row_pk_hash(type(row))(row)
+
+    def __enter__(self):
+        """Open the file."""
+        self._fp = self._open()
+        return self
+
+    def __exit__(self, *args):
+        """Close the file."""
+        self._fp.close()
+        if self._rejects_fp is not None:
+            self._rejects_fp.close()
+            Logger.get_logger().warning(
+                f"{self.fpath.stem}: {self.rejected} invalid rows written to "
+                f"{self._rejects_fp.name}."
+            )
+
+
+class CSVTableWriter(TableWriter):
+    """Text mode writer using the standard library CSV module."""
+
+    def _open(self):
+        """Open the table file."""
+        fp = open(self.fpath, "w+")
+        self._csv_writer = csv.writer(fp)
+        return fp
+
+    def _write(self, row):
+        """Write one row to the table file."""
+        self._csv_writer.writerow(row_serializer(type(row))(row))
+
+
+class BinaryTableWriter(TableWriter):
+    """Binary mode writer with a large buffer and its own CSV encoding.
+
+    Unlike the standard library writer, it quotes empty strings so that they are
+    not loaded as NULL.
+    """
+
+    def __init__(self, fpath, buffer_size=DEFAULT_BUFFER_SIZE, **kwargs):
+        """Constructor.
+
+        :param buffer_size: size in bytes of the write buffer.
+        """
+        super().__init__(fpath, **kwargs)
+        self.buffer_size = buffer_size
+
+    def _open(self):
+        """Open the table file."""
+        return open(self.fpath, "wb", buffering=self.buffer_size)
+
+    def _write(self, row):
+        """Write one row to the table file."""
+        line = row_encoder(type(row))(row) + "\n"
+        self._fp.write(line.encode("utf-8"))
+
+
+WRITERS = {
+    "csv": CSVTableWriter,
+    "binary": BinaryTableWriter,
+}
+"""Table writers by name."""
@@ -3,6 +3,10 @@
 
 """Invenio RDM migration PostgreSQL models module."""
 
+from dataclasses import MISSING, fields
+from functools import lru_cache
+from operator import attrgetter, itemgetter
+
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import DeclarativeBase, MappedAsDataclass
 
@@ -13,3 +17,77 @@ class Model(MappedAsDataclass, DeclarativeBase):
     type_annotation_map = {
         dict: JSONB,
     }
+
+    @classmethod
+    def row(cls, *args, **kwargs):
+        """Create a lightweight row of this model, see ``row_class``."""
+        return row_class(cls)(*args, **kwargs)
+
+
+class Row(tuple):
+    """Base class of the lightweight model rows."""
+
+    __slots__ = ()
+    __model__ = None
+    __tablename__ = None
+
+
+@lru_cache(maxsize=None)
+def row_class(model):
+    """Compact row class bound to the column layout of a model.
+
+    Rows are tuples holding the column values in order, with attribute access by
+    column name. They are much cheaper to create and to serialize than instances of
+    the (instrumented) SQLAlchemy model, which is then only a schema definition.
+    Rows compare equal to model instances with the same values.
+    """
+    model_fields = fields(model)
+    names = tuple(f.name for f in model_fields)
+    defaults = {f.name: f.default for f in model_fields if f.default is not MISSING}
+    model_values = attrgetter(*names)
+
+    def __new__(cls, *args, **kwargs):
+        if len(args) > len(names):
+            raise TypeError(f"{cls.__name__}() takes {len(names)} arguments")
+        values = list(args)
+        for name in names[len(args) :]:
+            if name in kwargs:
+                values.append(kwargs.pop(name))
+            elif name in defaults:
+                values.append(defaults[name])
+            else:
+                raise TypeError(f"{cls.__name__}() missing argument: '{name}'")
+        if kwargs:
+            raise TypeError(f"{cls.__name__}() got unexpected arguments: {kwargs}")
+        return tuple.__new__(cls, values)
+
+    def __eq__(self, other):
+        if isinstance(other, model):
+            return tuple(self) == model_values(other)
+        if isinstance(other, Row) and other.__model__ is not model:
+            return False
+        return tuple.__eq__(self, other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        values = ", ".join(f"{n}={v!r}" for n, v in zip(names, self))
+        return f"{type(self).__name__}({values})"
+
+    attrs = {name: property(itemgetter(idx)) for idx, name in enumerate(names)}
+    return type(
+        f"{model.__name__}Row",
+        (Row,),
+        {
+            "__slots__": (),
+            "__model__": model,
+            "__tablename__": model.__tablename__,
+            "__new__": __new__,
+            "__eq__": __eq__,
+            "__ne__": __ne__,
+            "__hash__": tuple.__hash__,
+            "__repr__": __repr__,
+            **attrs,
+        },
+    )
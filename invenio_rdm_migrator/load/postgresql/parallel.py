@@ -0,0 +1,77 @@
+# SPDX-FileCopyrightText: 2024 CERN.
+# SPDX-License-Identifier: MIT
+
+"""Parallel execution of SQL statements."""
+
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ...logging import Logger
+
+
+def execute_in_parallel(
+    connect, statements, workers=4, autocommit=False, on_executed=None
+):
+    """Execute independent statements concurrently.
+
+    Each worker opens one connection (using ``connect``) and keeps pulling statements
+    from a shared queue until it is empty, so long and short statements balance out
+    between the workers.
+
+    :param connect: callable returning a new psycopg connection.
+    :param statements: iterable of ``(name, sql)`` tuples.
+    :param workers: maximum number of concurrent connections.
+    :param autocommit: run each statement outside of a transaction block (e.g. VACUUM).
+    :param on_executed: callable run with the connection, the name and the row count
+    of each statement after executing it, in its transaction (e.g. to record a
+    checkpoint).
+    :returns: a dictionary with the duration in seconds of each statement by name.
+    """
+    logger = Logger.get_logger()
+    pending = queue.SimpleQueue()
+    total = 0
+    for statement in statements:
+        pending.put(statement)
+        total += 1
+
+    durations = {}
+    errors = []
+
+    def _worker():
+        with connect(autocommit=autocommit) as conn:
+            while True:
+                try:
+                    name, sql = pending.get_nowait()
+                except queue.Empty:
+                    return
+                start = time.perf_counter()
+                try:
+                    rowcount = conn.execute(sql).rowcount
+                    if on_executed:
+                        on_executed(conn, name, rowcount)
+                    if not autocommit:
+                        conn.commit()
+                except Exception as exc:
+                    logger.exception(f"{name}: failed to execute {sql}", exc_info=1)
+                    errors.append(exc)
+                    if not autocommit:
+                        conn.rollback()
+                    continue
+                durations[name] = time.perf_counter() - start
+                rows = f"{rowcount} rows, " if rowcount >= 0 else ""
+                logger.info(
+                    f"{name}: {rows}took {durations[name]:.2f} seconds "
+                    f"({len(durations)}/{total})."
+                )
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = [executor.submit(_worker) for _ in range(max(1, workers))]
+        for future in futures:
+            future.result()  # propagate connection errors
+
+    if errors:
+        # statements are independent, all of them are tried before failing
+        raise errors[0]
+
+    return durations
@@ -3,27 +3,63 @@
 
 """PostgreSQL sequence handling."""
 
-
 import psycopg
 
+from ...state import STATE
+
+
+def max_pk_state_key(table_name):
+    """Global state key holding the maximum generated primary key of a table."""
+    # pids have their own key since they were the first generated pks
+    if table_name == "pidstore_pid":
+        return "max_pid_pk"
+    return f"max_{table_name}_pk"
+
 
 class AlterSequencesMixin:
     """Mixin to update sequences to the latest value."""
 
+    def _known_max_pks(self):
+        """Maximum primary key per table, for tables whose pks were all generated."""
+        known = {}
+        if STATE.VALUES is None:  # state not initialized
+            return known
+
+        for tg in self.table_generators:
+            # existing data rows did not go through the pk generation
+            existing_data = getattr(tg, "existing_data", False) or self.existing_data
+            for table in tg.tables:
+                name = table.__tablename__
+                state_value = STATE.VALUES.get(max_pk_state_key(name))
+                if existing_data or not state_value:
+                    known[name] = None
+                else:
+                    known.setdefault(name, state_value["value"])
+        return known
+
     def alter_sequences(self):
-        """Query all sequences and update those that were modified."""
+        """Query the sequences of the loaded tables and update them in one go.
+
+        The maximum value of the tables whose primary keys were generated by the
+        migration is taken from the global state, the rest are computed with MAX().
+        Sequences are never moved below the MAX() of their column, e.g. when the
+        table holds rows with higher ids than the generated ones.
+        """
         tables = set()
         for tg in self.table_generators:
             tables = tables.union(set(tg.tables))
             tg.post_load(db_uri=self.db_uri)
 
+        known_max_pks = self._known_max_pks()
+        table_names = [table.__tablename__ for table in tables]
+
         with psycopg.connect(self.db_uri) as conn:
             sequences = conn.execute(
                 """
                 SELECT
-                    t.oid::regclass AS table_name,
-                    a.attname AS column_name,
-                    s.relname AS sequence_name
+                    t.oid::regclass::text AS table_name,
+                    quote_ident(a.attname) AS column_name,
+                    s.oid::regclass::text AS sequence_name
                 FROM pg_class AS t
                     JOIN pg_attribute AS a ON a.attrelid = t.oid
                     JOIN pg_depend AS d ON d.refobjid = t.oid AND d.refobjsubid = a.attnum
@@ -33,17 +69,29 @@ class AlterSequencesMixin:
                     AND d.refclassid = 'pg_catalog.pg_class'::regclass
                     AND d.deptype IN ('i', 'a')
                     AND t.relkind IN ('r', 'P')
-                    AND s.relkind = 'S';
-                """
-            )
-
-            for seq in sequences:
-                table_name, column, seq_name = seq
-                if table_name in tables:
-                    max_val = conn.execute(f"SELECT MAX({column}) FROM {table_name}")
-                    max_val = list(max_val)[0][0]  # get actual value from iterator
-                    if max_val:  # if no updates it returns None
-                        conn.execute(
-                            f"ALTER SEQUENCE {seq_name} RESTART WITH {max_val}"
-                        )
-                        # does not require commit as it is a ddl op
+                    AND s.relkind = 'S'
+                    AND t.oid::regclass::text = ANY(%s);
+                """,
+                (table_names,),
+            ).fetchall()
+            if not sequences:
+                return
+
+            selects = []
+            params = []
+            for table_name, column, seq_name in sequences:
+                max_val = known_max_pks.get(table_name)
+                max_query = f"SELECT MAX({column}) FROM {table_name}"
+                if max_val:
+                    # GREATEST ignores NULL, i.e. the MAX() of empty tables
+                    selects.append(
+                        f"SELECT setval(%s::regclass, GREATEST(%s, ({max_query})))"
+                    )
+                    params.extend([seq_name, max_val])
+                else:
+                    # setval is strict, on empty tables MAX() is NULL and it is a no-op
+                    selects.append(f"SELECT setval(%s::regclass, ({max_query}))")
+                    params.append(seq_name)
+
+            # next value will be max + 1
+            conn.execute(" UNION ALL ".join(selects), params)
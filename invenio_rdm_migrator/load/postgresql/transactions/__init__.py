@@ -3,6 +3,10 @@
 
 """Invenio RDM migration PostgreSQL bulk load module."""
 
+from .aio import AsyncPostgreSQLTx
 from .execute import PostgreSQLTx
 
-__all__ = ("PostgreSQLTx",)
+__all__ = (
+    "AsyncPostgreSQLTx",
+    "PostgreSQLTx",
+)
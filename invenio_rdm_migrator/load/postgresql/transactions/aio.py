@@ -0,0 +1,158 @@
+# SPDX-FileCopyrightText: 2024 CERN.
+# SPDX-License-Identifier: MIT
+
+"""PostgreSQL transactions load on an asyncio event loop."""
+
+import asyncio
+import math
+import time
+from collections import Counter, defaultdict
+
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from ....logging import FailedTxLogger, Logger
+from .batch import OperationBuffer
+from .execute import PostgreSQLTx
+from .scheduler import AsyncConflictScheduler
+
+
+class LatencyHistogram:
+    """Latencies of the loaded actions by action name, in power of two buckets."""
+
+    def __init__(self):
+        """Constructor."""
+        self.buckets = defaultdict(Counter)
+        self.totals = defaultdict(float)
+
+    def add(self, name, seconds):
+        """Record the latency of an action.
+
+        :param seconds: latency, counted in the bucket of the next power of two
+        milliseconds.
+        """
+        millis = seconds * 1000
+        bucket = 2 ** math.ceil(math.log2(millis)) if millis > 1 else 1
+        self.buckets[name][bucket] += 1
+        self.totals[name] += seconds
+
+    def log(self):
+        """Log the histogram of each action name."""
+        logger = Logger.get_logger()
+        for name, buckets in sorted(self.buckets.items()):
+            count = sum(buckets.values())
+            histogram = ", ".join(
+                f"<= {bucket} ms: {buckets[bucket]}" for bucket in sorted(buckets)
+            )
+            logger.info(
+                f"{name}: {count} actions, "
+                f"{self.totals[name] / count * 1000:.1f} ms mean latency ({histogram})."
+            )
+
+
+class AsyncPostgreSQLTx(PostgreSQLTx):
+    """PostgreSQL transactions load on an asyncio event loop.
+
+    Up to ``window`` actions are loaded at once, each on its own connection. While
+    an action waits on the database (i.e. its lookups and operations), the event
+    loop prepares the next ones. Actions touching the same entities are loaded in
+    order, see ``AsyncConflictScheduler``. The actions run on ``AsyncSession.run_sync``
+    so that they keep using the (sync) session API, which requires greenlet
+    (``asyncio`` extra).
+    """
+
+    def __init__(self, db_uri, window=10, pipeline=False, **kwargs):
+        """Constructor.
+
+        :param db_uri: database URI, with an asyncio driver (e.g. ``psycopg``).
+        :param window: maximum number of actions being loaded at once.
+        :param pipeline: not supported, the connections of the async sessions do not
+        expose psycopg's pipeline mode.
+        """
+        if pipeline:
+            raise ValueError("AsyncPostgreSQLTx does not support the pipeline mode.")
+        super().__init__(db_uri, window=window, **kwargs)
+        self.latencies = LatencyHistogram()
+        self._references = {}
+
+    def _load_action(self, session, action):
+        """Load an action, run in the greenlet of an async session."""
+        buffer = OperationBuffer(
+            session,
+            max_size=self.batch_size,
+            exec_kwargs=dict(execution_options={"synchronize_session": False}),
+            reorder=self.reorder_operations,
+            deferred=self.defer_constraints,
+            coalesce=self.coalesce_operations,
+            references=self._references,
+        )
+        with buffer, session.no_autoflush:
+            self._load_group([(action, None)], buffer)
+        return buffer
+
+    async def _load_async(self, transactions):
+        """Load the actions as tasks of the event loop."""
+        logger = Logger.get_logger()
+        engine = create_async_engine(
+            self.db_uri, pool_size=self.window, **self._engine_kwargs()
+        )
+        sessions = asyncio.Queue()
+        for _ in range(self.window):
+            sessions.put_nowait(AsyncSession(engine))
+        stats = Counter()
+
+        async def _load(action):
+            session = await sessions.get()
+            start = time.monotonic()
+            try:
+                buffer = await session.run_sync(self._load_action, action)
+                # conflicting actions on other connections must see the changes
+                await session.commit()
+            except Exception:
+                await session.rollback()
+                raise
+            finally:
+                sessions.put_nowait(session)
+            self.latencies.add(action.name, time.monotonic() - start)
+            stats["operations"] += buffer.operations
+            stats["round_trips"] += buffer.round_trips
+            stats["coalesced"] += buffer.coalesced
+
+        scheduler = AsyncConflictScheduler(window=self.window)
+        try:
+            for action in transactions:
+                await scheduler.submit(self._conflict_keys(action), _load, action)
+            await scheduler.drain()
+        except Exception:
+            await scheduler.cancel()
+            raise
+        finally:
+            logger.info(
+                f"{scheduler.submitted} actions loaded, {scheduler.waiting} waited "
+                f"for conflicting actions ({scheduler.barriers} for all the "
+                f"previous ones)."
+            )
+            logger.info(
+                f"{stats['operations']} operations executed in "
+                f"{stats['round_trips']} statements, {stats['coalesced']} writes "
+                f"saved by coalescing."
+            )
+            self.latencies.log()
+            while not sessions.empty():
+                await sessions.get_nowait().close()
+            await engine.dispose()
+
+    def _load(self, transactions):
+        """Load the actions."""
+        logger = Logger.get_logger()
+        if self.dry:
+            # the changes of a dry run are not visible to the other connections
+            logger.warning("Dry runs are loaded sequentially.")
+            return super()._load(transactions)
+
+        try:
+            asyncio.run(self._load_async(transactions))
+        except Exception:
+            logger.exception("Transactions load failed", exc_info=True)
+            FailedTxLogger.get_logger().exception("Failed transaction", exc_info=True)
+            if self.raise_on_db_error:
+                raise
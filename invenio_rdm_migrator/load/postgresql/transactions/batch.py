@@ -0,0 +1,371 @@
+# SPDX-FileCopyrightText: 2024 CERN.
+# SPDX-License-Identifier: MIT
+
+"""Batching of consecutive transaction operations."""
+
+import itertools
+from contextlib import ExitStack
+from functools import lru_cache
+
+import psycopg
+import sqlalchemy as sa
+from sqlalchemy.sql.util import find_tables
+
+from ....logging import Logger
+from .operations import OperationType, model_metadata
+
+
+@lru_cache(maxsize=None)
+def operation_statement(op_type, model, core=False):
+    """Statement of an operation type on a model, built only once.
+
+    Inserts and updates (by primary key) take the columns from the parameters,
+    SQLAlchemy caches their compiled form per set of columns. Deletes take the
+    primary keys as a single expanding parameter (``pks``).
+
+    :param op_type: value of the ``OperationType``.
+    :param core: build a Core statement on the table of the model. Unlike ORM bulk
+    updates, it does not check the number of matched rows. Updates then match the
+    primary keys with ``pk_<column>`` parameters.
+    """
+    target = model.__table__ if core else model
+    if op_type == OperationType.INSERT:
+        return sa.insert(target)
+    elif op_type == OperationType.UPDATE:
+        if not core:
+            return sa.update(model)
+        return sa.update(target).where(
+            *[col == sa.bindparam(f"pk_{col.name}") for col in target.primary_key]
+        )
+    elif op_type == OperationType.DELETE:
+        pks = list(model.__mapper__.primary_key)
+        pk = pks[0] if len(pks) == 1 else sa.tuple_(*pks)
+        return sa.delete(target).where(pk.in_(sa.bindparam("pks", expanding=True)))
+    raise ValueError(f"Unknown operation type {op_type}.")
+
+
+class OperationBuffer:
+    """Buffer executing consecutive operations of the same kind as one statement.
+
+    Operations are grouped while they have the same type, model and columns, any
+    other operation flushes the buffer first, so the execution order (and thus
+    foreign key safety) is preserved. The buffer is also flushed before any other
+    statement is executed in the session (e.g. lookups done by the actions), so
+    these always see the rows of the previous operations.
+
+    When reordering, an operation is instead added to the last group of its kind
+    (i.e. executed earlier) if it can be moved before all the groups that follow it:
+    these are on other tables, and the foreign keys between the tables, introspected
+    from the database, do not require the original order. This allows executing all
+    the operations of an action on the same table at once, e.g. the file object
+    versions and the file records of a publish as two statements instead of two per
+    file. With deferred constraints, deferrable foreign keys are ignored.
+
+    When coalescing (which implies reordering), operations on a row with a pending
+    operation are merged into it: successive updates become one update, an update
+    of an inserted row is part of the insert, a delete of an updated row replaces
+    the update, and an insert followed by a delete is dropped. The buffer is then
+    only flushed before statements reading the tables of the pending operations, so
+    that operations are coalesced across actions (see ``PostgreSQLTx.group_size``).
+
+    In pipeline mode, the statements are sent using psycopg's pipeline mode, without
+    waiting for their results. The pipeline is synchronized (i.e. the results are
+    waited for, and errors raised) before any other statement of the session and
+    on ``sync``.
+    """
+
+    def __init__(
+        self,
+        session,
+        max_size=1000,
+        exec_kwargs=None,
+        cache=None,
+        pipeline=False,
+        reorder=False,
+        deferred=False,
+        coalesce=False,
+        references=None,
+    ):
+        """Constructor.
+
+        :param session: session in which the operations are executed.
+        :param max_size: maximum number of operations in one statement, 1 disables
+        the batching.
+        :param exec_kwargs: keyword arguments passed to ``session.execute``.
+        :param cache: lookup cache invalidated by the operations, see ``LookupCache``.
+        :param pipeline: use psycopg's pipeline mode.
+        :param reorder: group the operations of different kinds when the foreign
+        keys allow it, flushing them only on ``flush`` or before other statements.
+        :param deferred: the deferrable constraints are deferred (i.e. with ``SET
+        CONSTRAINTS ALL DEFERRED``), so their foreign keys do not restrict reordering.
+        :param coalesce: merge the operations on the same row.
+        :param references: cache of the introspected foreign keys by table, shared
+        by the buffers of a load so that they are introspected only once.
+        """
+        self.session = session
+        self.max_size = max_size
+        self.exec_kwargs = exec_kwargs or {}
+        self.cache = cache
+        self.pipeline = pipeline
+        self.reorder = reorder or coalesce
+        self.deferred = deferred
+        self.coalesce = coalesce
+        self.operations = 0
+        self.round_trips = 0
+        self.coalesced = 0
+        self._groups = []  # (key, rows) in execution order
+        self._pending = {}  # (model, pk values): (group, row) of the last operation
+        self._flushing = False
+        self._pipeline = None
+        self._references = {} if references is None else references
+
+    def _foreign_keys(self, table):
+        """(Non deferred) foreign keys of a table.
+
+        :returns: list of ``(referred table, columns, referred columns)``.
+        """
+        references = self._references.get(table)
+        if references is None:
+            # introspection results are not available in pipeline mode
+            self.sync()
+            inspector = sa.inspect(self.session.connection())
+            references = self._references[table] = [
+                (
+                    fk["referred_table"],
+                    frozenset(fk["constrained_columns"]),
+                    frozenset(fk["referred_columns"]),
+                )
+                for fk in inspector.get_foreign_keys(table)
+                if not (self.deferred and fk.get("options", {}).get("deferrable"))
+            ]
+        return references
+
+    @staticmethod
+    def _writes(key, columns):
+        """Whether the operations of a group write to any of the columns."""
+        op_type, model, row_columns = key
+        if op_type != OperationType.UPDATE:
+            return True
+        pks = {name for name, _ in model_metadata(model).pks}
+        return not columns.isdisjoint(row_columns - pks)
+
+    def _can_move_before(self, key, other_key):
+        """Whether operations can be executed before the ones of another group."""
+        table, other_table = key[1].__tablename__, other_key[1].__tablename__
+        if table == other_table:
+            return False
+        for referred, columns, referred_columns in self._foreign_keys(table):
+            if (
+                referred == other_table
+                and self._writes(key, columns)
+                and self._writes(other_key, referred_columns)
+            ):
+                return False
+        if key[0] != OperationType.INSERT:
+            # rows referenced by the other table must not be updated or deleted earlier
+            for referred, columns, referred_columns in self._foreign_keys(other_table):
+                if (
+                    referred == table
+                    and self._writes(key, referred_columns)
+                    and self._writes(other_key, columns)
+                ):
+                    return False
+        return True
+
+    def _group(self, key):
+        """Buffered group of operations that an operation can be added to."""
+        if not self._groups:
+            return None
+        if not self.reorder:
+            group = self._groups[-1]
+            return group if group[0] == key else None
+        for group in reversed(self._groups):
+            if group[0] == key:
+                return group
+            if not self._can_move_before(key, group[0]):
+                return None
+        return None
+
+    def _remove(self, group, row):
+        """Remove a pending operation, if the following ones do not depend on it."""
+        idx = next(idx for idx, other in enumerate(self._groups) if other is group)
+        if not all(
+            self._can_move_before(other[0], group[0])
+            for other in self._groups[idx + 1 :]
+        ):
+            return False
+        rows = group[1]
+        del rows[next(idx for idx, other in enumerate(rows) if other is row)]
+        if not rows:
+            del self._groups[idx]
+        return True
+
+    def _coalesce(self, op_type, model, row):
+        """Merge an operation with the pending one on the same row.
+
+        :returns: the type and row of the operation to add, None if it was dropped.
+        """
+        pks = [name for name, _ in model_metadata(model).pks]
+        if any(row.get(name) is None for name in pks):
+            return op_type, row
+        pending_key = (model, tuple(row[name] for name in pks))
+        pending = self._pending.pop(pending_key, None)
+        if pending is None:
+            return op_type, row
+        group, pending_row = pending
+        pending_type = group[0][0]
+        if op_type == OperationType.INSERT or pending_type == OperationType.DELETE:
+            return op_type, row
+        if any(
+            isinstance(value, sa.ClauseElement)
+            for value in itertools.chain(row.values(), pending_row.values())
+        ):
+            return op_type, row  # SQL expressions could depend on the pending values
+        if not self._remove(group, pending_row):
+            return op_type, row
+
+        if op_type == OperationType.DELETE:
+            if pending_type == OperationType.INSERT:
+                self.coalesced += 2
+                return None
+            self.coalesced += 1
+            return op_type, row
+        self.coalesced += 1
+        return pending_type, {**pending_row, **row}
+
+    def _begin_pipeline(self):
+        """Enter the pipeline mode of the connection, if not in it yet."""
+        if self._pipeline is not None:
+            return True
+        dbapi_conn = self.session.connection().connection.dbapi_connection
+        if not hasattr(dbapi_conn, "pipeline"):
+            logger = Logger.get_logger()
+            logger.warning("The database driver does not support the pipeline mode.")
+            self.pipeline = False
+            return False
+        self._pipeline = ExitStack()
+        self._pipeline.enter_context(dbapi_conn.pipeline())
+        return True
+
+    def _execute(self, op_type, model, rows):
+        """Execute the statement of a group of operations."""
+        core = self.pipeline and self._begin_pipeline()
+        statement = operation_statement(op_type.value, model, core=core)
+        pks = [name for name, _ in model_metadata(model).pks]
+        if op_type == OperationType.DELETE:
+            if len(pks) == 1:
+                values = [row[pks[0]] for row in rows]
+            else:
+                values = [tuple(row[name] for name in pks) for row in rows]
+            self.session.execute(statement, {"pks": values}, **self.exec_kwargs)
+        elif op_type == OperationType.UPDATE and core:
+            rows = [{**row, **{f"pk_{pk}": row[pk] for pk in pks}} for row in rows]
+            self.session.execute(statement, rows, **self.exec_kwargs)
+        else:
+            self.session.execute(statement, rows, **self.exec_kwargs)
+
+    def add(self, op):
+        """Add an operation, flushing the buffered ones if they differ in kind."""
+        logger = Logger.get_logger()
+        if op.type == OperationType.DELETE:
+            row = op.pk_dict
+            logger.info(f"DELETE {op.model}: {op.data}")
+        else:
+            row = op.as_row_dict()
+            logger.info(f"{op.type.name} {op.model}: {row}")
+        if self.cache is not None:
+            self.cache.invalidate(op.model.__tablename__)
+
+        self.operations += 1
+        op_type = op.type
+        if self.coalesce:
+            coalesced = self._coalesce(op_type, op.model, row)
+            if coalesced is None:
+                return
+            op_type, row = coalesced
+
+        key = (op_type, op.model, frozenset(row))
+        group = self._group(key)
+        if group is None:
+            if not self.reorder:
+                self.flush()
+            group = (key, [])
+            self._groups.append(group)
+        group[1].append(row)
+        if self.coalesce:
+            pks = [name for name, _ in model_metadata(op.model).pks]
+            if all(row.get(name) is not None for name in pks):
+                pk = tuple(row[name] for name in pks)
+                self._pending[(op.model, pk)] = (group, row)
+        if len(group[1]) >= self.max_size:
+            self.flush()
+
+    def flush(self):
+        """Execute the buffered operations."""
+        if not self._groups or self._flushing:
+            return
+        groups, self._groups = self._groups, []
+        self._pending = {}
+        self._flushing = True
+        try:
+            for (op_type, model, _), rows in groups:
+                self._execute(op_type, model, rows)
+                if self._pipeline is None:
+                    self.round_trips += 1
+            self.session.flush()
+        finally:
+            self._flushing = False
+
+    def sync(self):
+        """Wait for the results of the operations sent in pipeline mode.
+
+        :raises psycopg.Error: if any of the operations failed.
+        """
+        pipeline, self._pipeline = self._pipeline, None
+        if pipeline is not None:
+            self.round_trips += 1
+            pipeline.close()
+
+    def clear(self):
+        """Discard the buffered operations, e.g. when the action is rolled back."""
+        self._groups = []
+        self._pending = {}
+        pipeline, self._pipeline = self._pipeline, None
+        if pipeline is not None:
+            try:
+                pipeline.close()
+            except psycopg.Error:
+                pass  # errors of the discarded operations
+
+    def _reads_pending(self, statement):
+        """Whether a statement could read the tables of the buffered operations."""
+        tables = set()
+        for table in find_tables(statement, check_columns=True, include_aliases=True):
+            table = getattr(table, "element", table)  # aliases
+            if isinstance(table, sa.Table):
+                tables.add(table.name)
+        if not tables:
+            return True  # e.g. textual statements
+        return any(group[0][1].__tablename__ in tables for group in self._groups)
+
+    def _before_execute(self, orm_execute_state):
+        """Flush the buffer before any other statement of the session."""
+        if self._flushing:
+            return  # statements of the buffered operations
+        if not (
+            self.coalesce
+            and orm_execute_state.is_select
+            and not self._reads_pending(orm_execute_state.statement)
+        ):
+            self.flush()
+        # lookups need the results, which are not available in pipeline mode
+        self.sync()
+
+    def __enter__(self):
+        """Flush the buffer before the statements executed in the session."""
+        sa.event.listen(self.session, "do_orm_execute", self._before_execute)
+        return self
+
+    def __exit__(self, *args):
+        """Stop listening to the session statements."""
+        sa.event.remove(self.session, "do_orm_execute", self._before_execute)
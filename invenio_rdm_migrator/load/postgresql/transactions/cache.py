@@ -0,0 +1,79 @@
+# SPDX-FileCopyrightText: 2024 CERN.
+# SPDX-License-Identifier: MIT
+
+"""Lookup cache of the transaction load."""
+
+from collections import defaultdict
+
+from ....logging import Logger
+
+SESSION_INFO_KEY = "lookup_cache"
+
+
+class LookupCache:
+    """Read-through cache of the lookups done by the load actions.
+
+    Each entry depends on the tables it was read from. Entries are invalidated when
+    the load writes to any of those tables, and all of them are dropped when the
+    session is rolled back (e.g. a failed action), since the cached results could
+    come from the rolled back changes.
+    """
+
+    def __init__(self):
+        """Constructor."""
+        self._entries = {}
+        self._keys_by_table = defaultdict(set)
+        self.hits = defaultdict(int)
+        self.misses = defaultdict(int)
+
+    def get(self, tables, key, fetch):
+        """Get a lookup result, fetching it on a miss.
+
+        :param tables: names of the tables the result is read from.
+        :param key: hashable key of the lookup, its first item names the lookup.
+        :param fetch: callable doing the lookup.
+        """
+        try:
+            value = self._entries[key]
+        except KeyError:
+            self.misses[key[0]] += 1
+            value = self._entries[key] = fetch()
+            for table in tables:
+                self._keys_by_table[table].add(key)
+        else:
+            self.hits[key[0]] += 1
+        return value
+
+    def invalidate(self, table):
+        """Drop the entries read from a table."""
+        for key in self._keys_by_table.pop(table, ()):
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Drop all the entries."""
+        self._entries.clear()
+        self._keys_by_table.clear()
+
+    def log_stats(self):
+        """Log the hit rate of each lookup."""
+        logger = Logger.get_logger()
+        for name in sorted(set(self.hits) | set(self.misses)):
+            hits, misses = self.hits[name], self.misses[name]
+            logger.info(
+                f"Lookup {name}: {hits} hits, {misses} misses "
+                f"({hits / (hits + misses) * 100:.1f}% hit rate)."
+            )
+
+
+def cached_lookup(session, models, key, fetch):
+    """Do a lookup through the cache of the session, if any.
+
+    :param session: load session.
+    :param models: models the result is read from.
+    :param key: hashable key of the lookup, its first item names the lookup.
+    :param fetch: callable doing the lookup.
+    """
+    cache = session.info.get(SESSION_INFO_KEY)
+    if cache is None:
+        return fetch()
+    return cache.get([model.__tablename__ for model in models], key, fetch)
@@ -3,32 +3,117 @@
 
 """PostgreSQL Execute load."""
 
-import sqlalchemy as sa
-from sqlalchemy import create_engine
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from copy import deepcopy
+
+from sqlalchemy import create_engine, text
 from sqlalchemy.orm import Session
 
 from ....logging import FailedTxLogger, Logger
+from ....state import STATE
 from ...base import Load
-from .operations import OperationType
+from .batch import OperationBuffer
+from .cache import SESSION_INFO_KEY, LookupCache
+from .scheduler import ConflictScheduler
 
 
 class PostgreSQLTx(Load):
     """PostgreSQL COPY load."""
 
     def __init__(
-        self, db_uri, _session=None, dry=True, raise_on_db_error=False, **kwargs
+        self,
+        db_uri,
+        _session=None,
+        dry=True,
+        raise_on_db_error=False,
+        batch_size=1,
+        group_size=1,
+        prepare_threshold=None,
+        lookup_cache=True,
+        workers=1,
+        window=100,
+        pipeline=False,
+        reorder_operations=False,
+        defer_constraints=False,
+        coalesce_operations=False,
+        **kwargs,
     ):
-        """Constructor."""
+        """Constructor.
+
+        :param batch_size: maximum number of consecutive operations of the same type,
+        model and columns executed as a single statement, see ``OperationBuffer``.
+        :param group_size: number of actions loaded in a single savepoint. On failure
+        the group is bisected to isolate (and skip) the failing actions, the changes
+        of the actions to the state are rolled back with the savepoint.
+        :param prepare_threshold: number of executions after which psycopg prepares a
+        statement server side, None keeps the driver default.
+        :param lookup_cache: cache the lookups of the actions during the load, see
+        ``LookupCache``. It is not used when loading concurrently.
+        :param workers: number of actions loaded concurrently, each worker has its own
+        session and commits after each action. Actions touching the same entities
+        are loaded in order, see ``LoadAction.conflict_keys``. Actions read and write
+        the state while preparing their operations, which requires the state cache
+        (``state_cache``) to be shared by the workers. Dry runs, and loads with an
+        uncached state, are always loaded sequentially.
+        :param window: maximum number of actions being loaded concurrently.
+        :param pipeline: send the operations of each action using psycopg's pipeline
+        mode, waiting for their results only before a lookup and at the end of the
+        action (or group). Ignored by drivers without pipeline support.
+        :param reorder_operations: execute the operations of an action on the same
+        table together when the foreign keys allow it, see ``OperationBuffer``.
+        :param defer_constraints: load each action (or group) with ``SET CONSTRAINTS
+        ALL DEFERRED``, so that deferrable foreign keys do not restrict reordering
+        (implies ``reorder_operations``). The constraints are checked at the end of
+        the action, so that failures are handled as usual.
+        :param coalesce_operations: merge the operations on the same row (e.g.
+        successive updates of a draft) within each group of actions, see
+        ``OperationBuffer`` (implies ``reorder_operations``).
+
+        Reordering, deferring and coalescing require a ``batch_size`` above 1,
+        otherwise each operation is executed as soon as it is added, i.e. never
+        pending nor moved.
+        """
+        for name, enabled in (
+            ("reorder_operations", reorder_operations),
+            ("defer_constraints", defer_constraints),
+            ("coalesce_operations", coalesce_operations),
+        ):
+            if enabled and batch_size <= 1:
+                raise ValueError(f"{name} requires a batch_size above 1.")
         self.db_uri = db_uri
         self.dry = dry
         self.raise_on_db_error = raise_on_db_error
+        self.batch_size = batch_size
+        self.group_size = group_size
+        self.prepare_threshold = prepare_threshold
+        self.lookup_cache = lookup_cache
+        self.workers = workers
+        self.window = window
+        self.pipeline = pipeline
+        self.reorder_operations = (
+            reorder_operations or defer_constraints or coalesce_operations
+        )
+        self.defer_constraints = defer_constraints
+        self.coalesce_operations = coalesce_operations
         self._session = _session
 
+    def _engine_kwargs(self):
+        """Keyword arguments of the engine creation."""
+        engine_kwargs = {}
+        if self.prepare_threshold is not None:
+            engine_kwargs["connect_args"] = {
+                "prepare_threshold": self.prepare_threshold
+            }
+        return engine_kwargs
+
     @property
     def session(self):
         """DB session."""
         if self._session is None:
-            session_kwargs = dict(bind=create_engine(self.db_uri))
+            engine = create_engine(self.db_uri, **self._engine_kwargs())
+            session_kwargs = dict(bind=engine)
             if self.dry:
                 session_kwargs["join_transaction_mode"] = "create_savepoint"
             self._session = Session(**session_kwargs)
@@ -40,58 +125,179 @@ class PostgreSQLTx(Load):
         logger.debug("PostgreSQLExecute does not implement _cleanup()")
         pass
 
+    def _groups(self, transactions):
+        """Split the actions in groups of ``group_size``.
+
+        :returns: lists of ``(action, snapshot)``, where the snapshot is a copy of
+        the action data used to retry it, None if it is never retried.
+        """
+        actions = iter(transactions)
+        while True:
+            group = list(itertools.islice(actions, self.group_size))
+            if not group:
+                return
+            if len(group) == 1:
+                yield [(group[0], None)]
+            else:
+                # preparing an action modifies its data (e.g. resolved references)
+                yield [(action, deepcopy(action.data)) for action in group]
+
+    def _load_group(self, group, buffer):
+        """Load a group of actions in a single savepoint.
+
+        If any of the actions fails, the group is rolled back and its halves are
+        retried (each in its own savepoint) until the failing action is isolated.
+        The changes of the actions to the state are rolled back too.
+        """
+        logger = Logger.get_logger()
+        failed_tx_logger = FailedTxLogger.get_logger()
+
+        session = buffer.session
+        retried = len(group) > 1
+        if retried:
+            STATE.begin()
+        nested_trans = session.begin_nested()
+        try:
+            if self.defer_constraints:
+                session.execute(text("SET CONSTRAINTS ALL DEFERRED"))
+            for action, _ in group:
+                for op in action.prepare(session=session):
+                    buffer.add(op)
+                if not buffer.coalesce:
+                    buffer.flush()
+            buffer.flush()
+            if self.defer_constraints:
+                # checked now, instead of when committing the outer transaction
+                session.execute(text("SET CONSTRAINTS ALL IMMEDIATE"))
+            buffer.sync()
+            nested_trans.commit()
+            if retried:
+                STATE.commit()
+            return
+        except Exception:
+            buffer.clear()
+            nested_trans.rollback()
+            if retried:
+                STATE.rollback()
+            if buffer.cache is not None:
+                # lookups could have seen rows of the rolled back operations
+                buffer.cache.clear()
+            if len(group) == 1:
+                action = group[0][0]
+                logger.exception(
+                    f"Could not load {action.data} ({action.name})",
+                    exc_info=True,
+                )
+                failed_tx_logger.exception(
+                    "Failed processing transaction",
+                    extra={"tx": action.data},
+                    exc_info=True,
+                )
+                if self.raise_on_db_error:
+                    raise
+                return
+
+        logger.info(f"Group of {len(group)} actions failed, bisecting it.")
+        for action, snapshot in group:
+            action.data = deepcopy(snapshot)
+        mid = len(group) // 2
+        self._load_group(group[:mid], buffer)
+        self._load_group(group[mid:], buffer)
+
+    @staticmethod
+    def _conflict_keys(action):
+        """Conflict keys of an action, None if they cannot be computed."""
+        try:
+            return action.conflict_keys()
+        except (AttributeError, KeyError, TypeError):
+            return None
+
+    def _load_concurrently(self, transactions, buffers, exec_kwargs):
+        """Load the actions on concurrent workers, see ``ConflictScheduler``."""
+        logger = Logger.get_logger()
+        engine = self.session.get_bind()
+        local = threading.local()
+        lock = threading.Lock()
+
+        def _load_action(action):
+            buffer = getattr(local, "buffer", None)
+            if buffer is None:
+                buffer = local.buffer = OperationBuffer(
+                    Session(bind=engine),
+                    max_size=self.batch_size,
+                    exec_kwargs=exec_kwargs,
+                    pipeline=self.pipeline,
+                    reorder=self.reorder_operations,
+                    deferred=self.defer_constraints,
+                    coalesce=self.coalesce_operations,
+                )
+                with lock:
+                    buffers.append(buffer)
+            with buffer, buffer.session.no_autoflush:
+                self._load_group([(action, None)], buffer)
+            # conflicting actions on other workers must see the changes
+            buffer.session.commit()
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                scheduler = ConflictScheduler(executor, window=self.window)
+                try:
+                    for action in transactions:
+                        keys = self._conflict_keys(action)
+                        scheduler.submit(keys, _load_action, action)
+                    scheduler.drain()
+                except Exception:
+                    scheduler.cancel()
+                    raise
+                finally:
+                    logger.info(
+                        f"{scheduler.submitted} actions loaded by {self.workers} "
+                        f"workers, {scheduler.waiting} waited for conflicting "
+                        f"actions ({scheduler.barriers} for all the previous ones)."
+                    )
+        finally:
+            for buffer in buffers:
+                buffer.session.close()
+
     def _load(self, transactions):
         """Performs the operations of a group transaction."""
         logger = Logger.get_logger()
         failed_tx_logger = FailedTxLogger.get_logger()
         exec_kwargs = dict(execution_options={"synchronize_session": False})
 
+        concurrent = self.workers > 1
+        if concurrent and self.dry:
+            logger.warning("Dry runs are loaded sequentially.")
+            concurrent = False
+        if concurrent and not STATE.is_shared_across_threads():
+            logger.warning("Loading sequentially, concurrent workers need state_cache.")
+            concurrent = False
+
         outer_trans = None
         if self.dry:
             outer_trans = self.session.begin()
+        cache = None
+        if self.lookup_cache and not concurrent:
+            cache = self.session.info[SESSION_INFO_KEY] = LookupCache()
+        buffers = []
         try:
-            for action in transactions:
-                with self.session.no_autoflush:
-                    nested_trans = self.session.begin_nested()
-                    try:
-                        for op in action.prepare(session=self.session):
-                            if op.type == OperationType.INSERT:
-                                row = op.as_row_dict()
-                                logger.info(f"INSERT {op.model}: {row}")
-                                self.session.execute(
-                                    sa.insert(op.model),
-                                    [row],
-                                    **exec_kwargs,
-                                )
-                            elif op.type == OperationType.DELETE:
-                                logger.info(f"DELETE {op.model}: {op.data}")
-                                self.session.execute(
-                                    sa.delete(op.model).where(*op.pk_clauses),
-                                    **exec_kwargs,
-                                )
-                            elif op.type == OperationType.UPDATE:
-                                row = op.as_row_dict()
-                                logger.info(f"UDPATE {op.model}: {op.data}")
-                                self.session.execute(
-                                    sa.update(op.model),
-                                    [row],
-                                    **exec_kwargs,
-                                )
-                            self.session.flush()
-                        nested_trans.commit()
-                    except Exception:
-                        logger.exception(
-                            f"Could not load {action.data} ({action.name})",
-                            exc_info=True,
-                        )
-                        failed_tx_logger.exception(
-                            "Failed processing transaction",
-                            extra={"tx": action.data},
-                            exc_info=True,
-                        )
-                        nested_trans.rollback()
-                        if self.raise_on_db_error:
-                            raise
+            if concurrent:
+                self._load_concurrently(transactions, buffers, exec_kwargs)
+            else:
+                buffer = OperationBuffer(
+                    self.session,
+                    max_size=self.batch_size,
+                    exec_kwargs=exec_kwargs,
+                    cache=cache,
+                    pipeline=self.pipeline,
+                    reorder=self.reorder_operations,
+                    deferred=self.defer_constraints,
+                    coalesce=self.coalesce_operations,
+                )
+                buffers.append(buffer)
+                with buffer, self.session.no_autoflush:
+                    for group in self._groups(transactions):
+                        self._load_group(group, buffer)
         except Exception:
             logger.exception("Transactions load failed", exc_info=True)
             failed_tx_logger.exception("Failed transaction", exc_info=True)
@@ -99,6 +305,15 @@ class PostgreSQLTx(Load):
                 # NOTE: the "finally" block below will run before this "raise"
                 raise
         finally:
+            logger.info(
+                f"{sum(buffer.operations for buffer in buffers)} operations executed "
+                f"in {sum(buffer.round_trips for buffer in buffers)} statements, "
+                f"{sum(buffer.coalesced for buffer in buffers)} writes saved by "
+                f"coalescing."
+            )
+            if cache is not None:
+                cache.log_stats()
+                self.session.info.pop(SESSION_INFO_KEY, None)
             if self.dry and outer_trans:
                 outer_trans.rollback()
 
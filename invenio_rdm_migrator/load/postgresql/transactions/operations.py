@@ -6,6 +6,7 @@
 from dataclasses import dataclass
 from datetime import datetime
 from enum import Enum
+from functools import lru_cache
 from typing import Type
 
 from ..models import Model
@@ -31,37 +32,82 @@ class OperationType(str, Enum):
         return f"{self.__class__.__name__}.{self.name}"
 
 
+def _timestamp_to_db(val):
+    """Convert a timestamp in microseconds to a datetime string."""
+    if isinstance(val, int):
+        return datetime.utcfromtimestamp(val / 1_000_000).isoformat()
+    return val
+
+
+def _python_type(col):
+    """Python type of a column, None if the column type does not define it."""
+    try:
+        return col.type.python_type
+    except NotImplementedError:
+        return None
+
+
 def to_db_type(col, val):
     """Convert value to the appropriate DB column type."""
-    if issubclass(col.type.python_type, (datetime,)) and isinstance(val, int):
-        return datetime.utcfromtimestamp(val / 1_000_000).isoformat()
+    python_type = _python_type(col)
+    if python_type and issubclass(python_type, (datetime,)):
+        return _timestamp_to_db(val)
     return val
 
 
+class ModelMetadata:
+    """Column metadata of a model, computed once and shared by its operations."""
+
+    __slots__ = ("columns", "pks")
+
+    def __init__(self, model):
+        """Constructor.
+
+        :param model: model class.
+        """
+        mapper = model.__mapper__
+        self.columns = []  # (name, converter or None)
+        for col in mapper.columns:
+            python_type = _python_type(col)
+            converter = None
+            if python_type and issubclass(python_type, (datetime,)):
+                converter = _timestamp_to_db
+            self.columns.append((col.name, converter))
+        self.pks = [(col.name, col) for col in mapper.primary_key]
+
+
+@lru_cache(maxsize=None)
+def model_metadata(model):
+    """Column metadata of a model."""
+    return ModelMetadata(model)
+
+
 @dataclass
 class Operation:
     """SQL operation."""
 
+    __slots__ = ("type", "model", "data")
+
     type: OperationType
     model: Type[Model]
     data: dict
 
     def as_row_dict(self):
         """Serialize a correctly typed DB row from data."""
+        data = self.data
         res = {}
-        for col in self.model.__mapper__.columns:
-            if col.name in self.data:
-                res[col.name] = to_db_type(col, self.data[col.name])
+        for name, converter in model_metadata(self.model).columns:
+            if name in data:
+                val = data[name]
+                res[name] = converter(val) if converter else val
         return res
 
     @property
     def pk_dict(self):
         """Primary keys dict."""
-        return {
-            col.name: self.data[col.name] for col in self.model.__mapper__.primary_key
-        }
+        return {name: self.data[name] for name, _ in model_metadata(self.model).pks}
 
     @property
     def pk_clauses(self):
         """Primary keys where clauses."""
-        return [col == self.data[col.name] for col in self.model.__mapper__.primary_key]
+        return [col == self.data[name] for name, col in model_metadata(self.model).pks]
@@ -0,0 +1,136 @@
+# SPDX-FileCopyrightText: 2024 CERN.
+# SPDX-License-Identifier: MIT
+
+"""Scheduling of the transaction actions on concurrent workers."""
+
+import asyncio
+from collections import deque
+from concurrent.futures import wait
+
+
+class ConflictScheduler:
+    """Run actions concurrently unless they touch the same entities.
+
+    An action waits for the previous actions it conflicts with (i.e. that share a
+    conflict key) to finish, so these are applied in order. Actions with unknown
+    keys (None) are barriers: they wait for all the previous actions, and all the
+    following ones wait for them.
+    """
+
+    def __init__(self, executor, window=100):
+        """Constructor.
+
+        :param executor: executor running the actions.
+        :param window: maximum number of actions submitted and not finished.
+        """
+        self.executor = executor
+        self.window = window
+        self.submitted = 0
+        self.barriers = 0
+        self.waiting = 0
+        self._in_flight = deque()
+        self._last = {}
+        self._barrier = None
+
+    @staticmethod
+    def _run(deps, fn, args):
+        """Run an action once the actions it depends on are finished."""
+        wait(deps)
+        for dep in deps:
+            dep.result()  # do not apply an action after a failed dependency
+        return fn(*args)
+
+    def _dependencies(self, keys):
+        """Actions that an action with the given keys must wait for."""
+        if keys is None:
+            deps = list(self._in_flight)
+            self.barriers += 1
+        else:
+            deps = {self._last[key] for key in keys if key in self._last}
+            if self._barrier is not None:
+                deps.add(self._barrier)
+        if any(not dep.done() for dep in deps):
+            self.waiting += 1
+        return deps
+
+    def _register(self, keys, future):
+        """Register a submitted action as dependency of the following ones."""
+        self.submitted += 1
+        if keys is None:
+            self._last.clear()
+            self._barrier = future
+        else:
+            for key in keys:
+                self._last[key] = future
+        self._in_flight.append(future)
+        if len(self._last) > 10 * self.window:
+            # forget the finished actions, they are no dependency anymore
+            self._last = {k: fut for k, fut in self._last.items() if not fut.done()}
+
+    def submit(self, keys, fn, *args):
+        """Submit an action.
+
+        :param keys: conflict keys of the action, None if unknown.
+        :param fn: function applying the action, called with ``args``.
+        """
+        deps = self._dependencies(keys)
+        future = self.executor.submit(self._run, deps, fn, args)
+        self._register(keys, future)
+        while len(self._in_flight) >= self.window:
+            self._in_flight.popleft().result()
+        return future
+
+    def drain(self):
+        """Wait for all the submitted actions, raising the first failure."""
+        while self._in_flight:
+            self._in_flight.popleft().result()
+
+    def cancel(self):
+        """Cancel the submitted actions that did not start yet."""
+        for future in self._in_flight:
+            future.cancel()
+        self._in_flight.clear()
+
+
+class AsyncConflictScheduler(ConflictScheduler):
+    """Conflict scheduler running the actions as tasks of the event loop."""
+
+    def __init__(self, window=100):
+        """Constructor.
+
+        :param window: maximum number of actions submitted and not finished.
+        """
+        super().__init__(executor=None, window=window)
+
+    @staticmethod
+    async def _run(deps, fn, args):
+        """Run an action once the actions it depends on are finished."""
+        if deps:
+            await asyncio.wait(deps)
+        for dep in deps:
+            dep.result()  # do not apply an action after a failed dependency
+        return await fn(*args)
+
+    async def submit(self, keys, fn, *args):
+        """Submit an action.
+
+        :param keys: conflict keys of the action, None if unknown.
+        :param fn: coroutine function applying the action, called with ``args``.
+        """
+        deps = self._dependencies(keys)
+        task = asyncio.ensure_future(self._run(deps, fn, args))
+        self._register(keys, task)
+        while len(self._in_flight) >= self.window:
+            await self._in_flight.popleft()
+        return task
+
+    async def drain(self):
+        """Wait for all the submitted actions, raising the first failure."""
+        while self._in_flight:
+            await self._in_flight.popleft()
+
+    async def cancel(self):
+        """Cancel the submitted actions, waiting for them to finish."""
+        tasks = list(self._in_flight)
+        super().cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -5,6 +5,7 @@
 
 import itertools
 from abc import ABC
+from copy import deepcopy
 from pathlib import Path
 from uuid import UUID
 
@@ -303,6 +304,7 @@ class StateEntity:
         self._search_cache = None
         if search_cache:
             self._search_cache = {}
+        self._journal = None
 
     def _init_cache(self):
         """Initialize the cache from state."""
@@ -368,9 +370,48 @@ class StateEntity:
             for row in self.state.all(self.table_name):
                 yield self._row_as_dict(row)
 
+    def _record(self, key):
+        """Record the current row of a key, to restore it on rollback."""
+        if self._journal is None:
+            return
+        if self._cache is not None:
+            previous = self._cache.get(key)
+        else:
+            previous = self.get(key) or None
+        self._journal.append((key, deepcopy(previous)))
+
+    def _restore(self, key, previous):
+        """Restore the row of a key, None if it did not exist."""
+        if self._cache is not None:
+            if previous is None:
+                self._cache.pop(key, None)
+            else:
+                self._cache[key] = previous
+        else:
+            self.state.delete(self.table_name, self.pk_attr, key)
+            if previous is not None:
+                self.state.add(self.table_name, previous)
+
+    def begin(self):
+        """Start recording the changes, so that they can be rolled back."""
+        self._journal = []
+
+    def commit(self):
+        """Keep the changes recorded since ``begin``."""
+        self._journal = None
+
+    def rollback(self):
+        """Undo the changes recorded since ``begin``."""
+        journal, self._journal = self._journal or [], None
+        for key, previous in reversed(journal):
+            self._restore(key, previous)
+        if journal and self._search_cache is not None:
+            self._search_cache.clear()
+
     def add(self, key, data):
         """Add data row."""
         self.state.validate(self.table_name, data)
+        self._record(key)
         if self._cache is not None:
             if key in self._cache:
                 raise ValueError("Key {key} already in state.")
@@ -381,6 +422,7 @@ class StateEntity:
     def update(self, key, data):
         """Add data row."""
         self.state.validate(self.table_name, data)
+        self._record(key)
         if self._cache is not None:
             self._cache[key].update(data)
         else:
@@ -390,6 +432,7 @@ class StateEntity:
 
     def delete(self, key):
         """Delete data row."""
+        self._record(key)
         if self._cache is not None:
             self._cache.pop(key, None)
         else:
@@ -435,9 +478,9 @@ class STATE:
         cls.VALUES = StateEntity(state_db, "global", "key", **state_kwargs)
 
     @classmethod
-    def flush_cache(cls):
-        """Flush state entity caches to state DB."""
-        for se in [
+    def _entities(cls):
+        """State entities."""
+        return [
             cls.PARENTS,
             cls.RECORDS,
             cls.BUCKETS,
@@ -445,5 +488,44 @@ class STATE:
             cls.COMMUNITIES,
             cls.PIDS,
             cls.VALUES,
-        ]:
+        ]
+
+    @classmethod
+    def flush_cache(cls):
+        """Flush state entity caches to state DB."""
+        for se in cls._entities():
             se._flush_cache()
+
+    @classmethod
+    def begin(cls):
+        """Start recording the changes to the state, see ``StateEntity.begin``.
+
+        Only meant for sequential loads, the changes of all threads are recorded.
+        """
+        for se in cls._entities():
+            if se is not None:
+                se.begin()
+
+    @classmethod
+    def commit(cls):
+        """Keep the changes to the state recorded since ``begin``."""
+        for se in cls._entities():
+            if se is not None:
+                se.commit()
+
+    @classmethod
+    def rollback(cls):
+        """Undo the changes to the state recorded since ``begin``."""
+        for se in cls._entities():
+            if se is not None:
+                se.rollback()
+
+    @classmethod
+    def is_shared_across_threads(cls):
+        """Whether the state can be used by threads other than the current one.
+
+        The state DB is an in-memory SQLite database, and each thread gets its own
+        connection (i.e. its own, empty, database). Only the cached entities are
+        shared.
+        """
+        return all(se is None or se._cache is not None for se in cls._entities())
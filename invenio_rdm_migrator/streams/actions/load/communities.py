@@ -43,6 +43,13 @@ class CommunityCreateAction(LoadAction):
     name = "community-create"
     data_cls = CommunityData
 
+    def conflict_keys(self):
+        """Entities touched by the action."""
+        return {
+            ("community", self.data.community["slug"]),
+            ("user", str(self.data.owner["user_id"])),
+        }
+
     def _generate_rows(self, **kwargs):
         """Generates rows for a new community."""
         community_id = self.data.community["id"]
@@ -11,6 +11,7 @@ from uuid import uuid4
 import sqlalchemy as sa
 
 from ....actions import LoadAction, LoadData
+from ....load.postgresql.transactions.cache import cached_lookup
 from ....load.postgresql.transactions.operations import Operation, OperationType
 from ...models.communities import Community, CommunityMember
 from ...models.files import FilesBucket, FilesObjectVersion
@@ -26,24 +27,38 @@ from ...models.records import (
 
 
 def _get_community_id(session, slug):
-    return session.execute(
-        sa.select(Community.id).where(Community.slug == slug)
-    ).one_or_none()
+    return cached_lookup(
+        session,
+        (Community,),
+        ("community_id", slug),
+        lambda: session.execute(
+            sa.select(Community.id).where(Community.slug == slug)
+        ).one_or_none(),
+    )
 
 
-def _set_permission_flags(session, parent, draft_or_record):
-    comm_ids = set(parent.get("communities", {}).get("ids", []))
-    if comm_ids:
-        permission_flags = {}
-        owner_id = parent["json"].get("access", {}).get("owned_by", {}).get("user")
-        owner_comm_ids = session.scalars(
+def _get_owned_community_ids(session, owner_id):
+    return cached_lookup(
+        session,
+        (Community, CommunityMember),
+        ("owned_community_ids", owner_id),
+        lambda: session.scalars(
             sa.select(Community.id)
             .join(CommunityMember, Community.id == CommunityMember.community_id)
             .where(
                 CommunityMember.role == "owner",
                 CommunityMember.user_id == owner_id,
             )
-        ).all()
+        ).all(),
+    )
+
+
+def _set_permission_flags(session, parent, draft_or_record):
+    comm_ids = set(parent.get("communities", {}).get("ids", []))
+    if comm_ids:
+        permission_flags = {}
+        owner_id = parent["json"].get("access", {}).get("owned_by", {}).get("user")
+        owner_comm_ids = _get_owned_community_ids(session, owner_id)
         has_only_managed_communities = comm_ids <= set(owner_comm_ids)
         if not has_only_managed_communities:
             permission_flags["can_community_manage_record"] = False
@@ -54,6 +69,20 @@ def _set_permission_flags(session, parent, draft_or_record):
             parent["json"]["permission_flags"] = permission_flags
 
 
+def _conflict_keys(parent, records=(), buckets=(), pids=()):
+    """Entities touched by a draft or record action."""
+    keys = {("recid", parent["json"]["id"])}
+    keys.update(("recid", record["json"]["id"]) for record in records)
+    keys.update(("bucket", str(bucket["id"])) for bucket in buckets if bucket)
+    keys.update(("pid", pid["pid_value"]) for pid in pids if pid)
+    owner_id = parent["json"].get("access", {}).get("owned_by", {}).get("user")
+    if owner_id is not None:
+        keys.add(("user", str(owner_id)))
+    communities = parent.get("communities", {})
+    keys.update(("community", slug) for slug in communities.get("ids", []))
+    return keys
+
+
 def resolve_communities(session, communities):
     default_slug = communities.get("default")
     if default_slug:
@@ -84,27 +113,37 @@ def format_pid_ref(pid):
 
 
 def get_published_record(session, recid) -> Optional[RDMRecordMetadata]:
-    return session.scalars(
-        sa.select(RDMRecordMetadata)
-        .join(
-            PersistentIdentifier,
-            RDMRecordMetadata.id == PersistentIdentifier.object_uuid,
-        )
-        .where(
-            PersistentIdentifier.pid_type == "recid",
-            PersistentIdentifier.object_type == "rec",
-            PersistentIdentifier.pid_value == recid,
-        )
-    ).one_or_none()
+    return cached_lookup(
+        session,
+        (RDMRecordMetadata, PersistentIdentifier),
+        ("published_record", recid),
+        lambda: session.scalars(
+            sa.select(RDMRecordMetadata)
+            .join(
+                PersistentIdentifier,
+                RDMRecordMetadata.id == PersistentIdentifier.object_uuid,
+            )
+            .where(
+                PersistentIdentifier.pid_type == "recid",
+                PersistentIdentifier.object_type == "rec",
+                PersistentIdentifier.pid_value == recid,
+            )
+        ).one_or_none(),
+    )
 
 
 def get_pid(session, pid_type, pid_value) -> Optional[PersistentIdentifier]:
-    return session.scalars(
-        sa.select(PersistentIdentifier).where(
-            PersistentIdentifier.pid_type == pid_type,
-            PersistentIdentifier.pid_value == pid_value,
-        )
-    ).one_or_none()
+    return cached_lookup(
+        session,
+        (PersistentIdentifier,),
+        ("pid", pid_type, pid_value),
+        lambda: session.scalars(
+            sa.select(PersistentIdentifier).where(
+                PersistentIdentifier.pid_type == pid_type,
+                PersistentIdentifier.pid_value == pid_value,
+            )
+        ).one_or_none(),
+    )
 
 
 def delete_ov(session, bucket_id, key):
@@ -279,6 +318,14 @@ class DraftCreateAction(LoadAction):
     data_cls = RDMDraftCreateData
     data: RDMDraftCreateData
 
+    def conflict_keys(self):
+        """Entities touched by the action."""
+        return _conflict_keys(
+            self.data.parent,
+            records=[self.data.draft],
+            buckets=[self.data.draft_bucket],
+        )
+
     def _generate_rows(self, session, **kwargs):
         """Generates rows for a new draft."""
         draft = self.data.draft
@@ -422,6 +469,12 @@ class DraftEditAction(LoadAction):
     data_cls = RDMDraftEditData
     data: RDMDraftEditData
 
+    def conflict_keys(self):
+        """Entities touched by the action."""
+        return _conflict_keys(
+            self.data.parent, records=[self.data.draft], buckets=[self.data.bucket]
+        )
+
     def _generate_rows(self, session, **kwargs):
         """Generates rows for a new draft."""
         draft = self.data.draft
@@ -511,6 +564,15 @@ class DraftPublishNewAction(LoadAction):
     data_cls = RDMDraftPublishNewData
     data: RDMDraftPublishNewData
 
+    def conflict_keys(self):
+        """Entities touched by the action."""
+        return _conflict_keys(
+            self.data.parent,
+            records=[self.data.draft, self.data.record],
+            buckets=[self.data.draft_bucket, self.data.record_bucket],
+            pids=[self.data.doi, self.data.oai_pid, self.data.parent_doi],
+        )
+
     def _generate_rows(self, session, **kwargs):
         """Generates rows for a new draft."""
         is_first_publish = self.data.parent_pid is not None
@@ -712,6 +774,15 @@ class DraftPublishEditAction(LoadAction):
     data_cls = RDMDraftPublishEditData
     data: RDMDraftPublishEditData
 
+    def conflict_keys(self):
+        """Entities touched by the action."""
+        return _conflict_keys(
+            self.data.parent,
+            records=[self.data.draft, self.data.record],
+            buckets=[self.data.draft_bucket, self.data.record_bucket],
+            pids=[self.data.old_external_doi, self.data.new_external_doi],
+        )
+
     def _generate_rows(self, session, **kwargs):
         """Generates rows for a new draft."""
         is_external_doi = self.data.old_external_doi or self.data.old_external_doi
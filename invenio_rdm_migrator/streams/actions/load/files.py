@@ -36,6 +36,10 @@ class FileUploadAction(LoadAction):
     data: FileUploadData
     pks = [("file_record", "id", generate_uuid)]
 
+    def conflict_keys(self):
+        """Entities touched by the action."""
+        return {("bucket", str(self.data.bucket["id"]))}
+
     def _generate_rows(self, session, **kwargs):
         """Generates rows for a new draft."""
         replaced_ov = self.data.replaced_object_version
@@ -97,6 +101,10 @@ class FileDeleteAction(LoadAction):
     data_cls = FileDeleteData
     data: FileDeleteData
 
+    def conflict_keys(self):
+        """Entities touched by the action."""
+        return {("bucket", str(self.data.bucket["id"]))}
+
     def _generate_rows(self, *, session, **kwargs):
         """Generates rows for deleting a draft file."""
         bucket = self.data.bucket
@@ -150,6 +158,10 @@ class MediaFileUploadAction(LoadAction):
     data: MediaFileUploadData
     pks = [("file_record", "id", generate_uuid)]
 
+    def conflict_keys(self):
+        """Entities touched by the action."""
+        return {("bucket", str(self.data.bucket["id"]))}
+
     def _generate_rows(self, **kwargs):
         """Generates rows for a new draft."""
         # if we were to use the state for consistency checks
@@ -186,6 +198,10 @@ class MediaFileDeleteAction(LoadAction):
     data_cls = MediaFileDeleteData
     data: MediaFileDeleteData
 
+    def conflict_keys(self):
+        """Entities touched by the action."""
+        return {("bucket", str(self.data.bucket["id"]))}
+
     def _generate_rows(self, **kwargs):
         """Generates rows for a new draft."""
         # if we were to use the state for consistency checks
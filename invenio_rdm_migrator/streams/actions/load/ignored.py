@@ -24,6 +24,10 @@ class IgnoredAction(LoadAction):
     name = "ignored"
     data_cls = AnyData
 
+    def conflict_keys(self):
+        """No entities are touched."""
+        return set()
+
     def _generate_rows(self, **kwargs):
         """Yields nothing."""
         yield from iter(())
@@ -30,6 +30,10 @@ class UserRegistrationAction(LoadAction):
     name = "register-user"
     data_cls = UserData
 
+    def conflict_keys(self):
+        """Entities touched by the action."""
+        return {("user", str(self.data.user["id"]))}
+
     def _generate_rows(self, **kwargs):
         """Generates rows for a new user."""
         yield Operation(OperationType.INSERT, User, self.data.user)
@@ -53,6 +57,10 @@ class UserEditAction(LoadAction):
     name = "edit-user"
     data_cls = UserData
 
+    def conflict_keys(self):
+        """Entities touched by the action."""
+        return {("user", str(self.data.user["id"]))}
+
     def _generate_rows(self, **kwargs):
         """Generates rows for a user edit."""
         yield Operation(OperationType.UPDATE, User, self.data.user)
@@ -84,6 +92,10 @@ class UserDeactivationAction(LoadAction):
     name = "deactivate-user"
     data_cls = UserData
 
+    def conflict_keys(self):
+        """Entities touched by the action."""
+        return {("user", str(self.data.user["id"]))}
+
     def _generate_rows(self, **kwargs):
         """Generates rows for a new draft."""
         assert not self.data.user["active"]
@@ -62,17 +62,17 @@ class CommunityTableGenerator(TableGenerator):
         bucket = community_files["bucket"]
 
         community["bucket_id"] = bucket["id"]
-        yield FilesBucket(**bucket)
-        yield Community(**community)
+        yield FilesBucket.row(**bucket)
+        yield Community.row(**community)
 
         community_oai_set["search_pattern"] = f"parent.communities.ids:{community_id}"
         community_oai_set["system_created"] = True
-        yield OAISet(**community_oai_set)
+        yield OAISet.row(**community_oai_set)
 
         community_members = data["community_members"]
         for member in community_members:
             member["community_id"] = community_id
-            yield CommunityMember(**member)
+            yield CommunityMember.row(**member)
         community_owner = next(
             (
                 m["user_id"]
@@ -85,7 +85,7 @@ class CommunityTableGenerator(TableGenerator):
         featured_community = data["featured_community"]
         if featured_community.get("id"):
             featured_community["community_id"] = community_id
-            yield FeaturedCommunity(**featured_community)
+            yield FeaturedCommunity.row(**featured_community)
 
         community_file = community_files.get("file")
         file_object = community_files.get("file_object")
@@ -93,11 +93,11 @@ class CommunityTableGenerator(TableGenerator):
         if community_file:
             file_object["bucket_id"] = bucket["id"]
             file_object["file_id"] = community_file["id"]
-            yield FilesObjectVersion(**file_object)
+            yield FilesObjectVersion.row(**file_object)
 
             community_file["record_id"] = community_id
             community_file["object_version_id"] = file_object["version_id"]
-            yield CommunityFile(**community_file)
+            yield CommunityFile.row(**community_file)
 
         if not STATE.COMMUNITIES.get(community_slug):
             STATE.COMMUNITIES.add(
@@ -0,0 +1,8 @@
+# SPDX-FileCopyrightText: 2024 CERN.
+# SPDX-License-Identifier: MIT
+
+"""Existing data stream."""
+
+from .load import ExistingDataLoad
+
+__all__ = ("ExistingDataLoad",)
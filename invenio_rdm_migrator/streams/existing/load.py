@@ -0,0 +1,48 @@
+# SPDX-FileCopyrightText: 2024 CERN.
+# SPDX-License-Identifier: MIT
+
+"""Combined existing data loader."""
+
+from ...load.postgresql.bulk import PostgreSQLCopyLoad
+from ...load.postgresql.bulk.generators import ExistingDataTableGenerator
+from ..models.affiliations import Affiliation
+from ..models.awards import Awards
+from ..models.funders import Funders
+from ..models.github import Repository, WebhookEvent
+from ..models.names import Name
+
+
+class ExistingDataLoad(PostgreSQLCopyLoad):
+    """Concurrent loading of the existing data (vocabularies, GitHub) csv files.
+
+    It replaces running one stream per table (e.g. ``ExistingAwardsLoad``), the
+    tables do not reference each other and are loaded at the same time.
+    """
+
+    TABLES = [Affiliation, Awards, Funders, Name, Repository, WebhookEvent]
+
+    def __init__(self, db_uri, data_dir, tables=None, workers=4, **kwargs):
+        """Constructor.
+
+        :param tables: names of the tables to load, defaults to all of ``TABLES``.
+        :param workers: maximum number of tables loaded at the same time.
+        """
+        models = self.TABLES
+        if tables is not None:
+            by_name = {model.__tablename__: model for model in self.TABLES}
+            unknown = set(tables) - set(by_name)
+            if unknown:
+                raise ValueError(f"Unknown existing data tables: {sorted(unknown)}.")
+            models = [by_name[name] for name in tables]
+
+        kwargs.pop("existing_data", None)
+        kwargs.pop("table_generators", None)
+        super().__init__(
+            db_uri=db_uri,
+            table_generators=[ExistingDataTableGenerator(tables=models, pks=[])],
+            data_dir=data_dir,
+            existing_data=True,
+            workers=workers,
+            concurrent_tables=True,
+            **kwargs,
+        )
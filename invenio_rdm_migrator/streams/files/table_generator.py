@@ -24,6 +24,6 @@ class FilesTableGenerator(TableGenerator):
         bucket = data["bucket"]
         object_version = data["object_version"]
         file = data["file"]
-        yield FilesInstance(**file)
-        yield FilesBucket(**bucket)
-        yield FilesObjectVersion(**object_version)
+        yield FilesInstance.row(**file)
+        yield FilesBucket.row(**bucket)
+        yield FilesObjectVersion.row(**object_version)
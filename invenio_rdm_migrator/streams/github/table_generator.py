@@ -21,4 +21,4 @@ class ReleaseTableGenerator(TableGenerator):
         if recid:
             record = STATE.RECORDS.get(str(recid))
             release["record_id"] = record["id"]
-        yield Release(**release)
+        yield Release.row(**release)
@@ -59,7 +59,7 @@ class RDMDeletedRecordTableGenerator(TableGenerator):
                     },
                 )
                 parent_pid = parent["json"]["pid"]
-                yield PersistentIdentifier(
+                yield PersistentIdentifier.row(
                     id=parent_pid["pk"],
                     pid_type=parent_pid["pid_type"],
                     pid_value=parent["json"]["id"],
@@ -71,7 +71,7 @@ class RDMDeletedRecordTableGenerator(TableGenerator):
                 )
             parent_doi = parent["json"].get("pids", {}).get("doi")
             if parent_doi and parent_doi["identifier"]:
-                yield PersistentIdentifier(
+                yield PersistentIdentifier.row(
                     id=pid_pk(),
                     pid_type="doi",
                     pid_value=parent_doi["identifier"],
@@ -83,7 +83,7 @@ class RDMDeletedRecordTableGenerator(TableGenerator):
                 )
 
             # parent record
-            yield RDMParentMetadata(
+            yield RDMParentMetadata.row(
                 id=parent["id"],
                 json=parent["json"],
                 created=parent["created"],
@@ -109,7 +109,7 @@ class RDMDeletedRecordTableGenerator(TableGenerator):
             # Something is very wrong, we bail out
             return
 
-        yield RDMRecordMetadata(
+        yield RDMRecordMetadata.row(
             id=record["id"],
             json=record["json"],
             created=record["created"],
@@ -123,7 +123,7 @@ class RDMDeletedRecordTableGenerator(TableGenerator):
         )
         # recid
         record_pid = record["json"]["pid"]
-        yield PersistentIdentifier(
+        yield PersistentIdentifier.row(
             id=record_pid["pk"],
             pid_type=record_pid["pid_type"],
             pid_value=record["json"]["id"],
@@ -135,7 +135,7 @@ class RDMDeletedRecordTableGenerator(TableGenerator):
         )
         # DOI
         if "doi" in record["json"].get("pids", {}):
-            yield PersistentIdentifier(
+            yield PersistentIdentifier.row(
                 id=pid_pk(),
                 pid_type="doi",
                 pid_value=record["json"]["pids"]["doi"]["identifier"],
@@ -98,7 +98,7 @@ class RDMDraftTableGenerator(
             draft["json"] = None
             draft["fork_version_id"] = None
 
-        yield RDMDraftMetadata(
+        yield RDMDraftMetadata.row(
             id=draft_id,
             json=draft["json"],
             created=draft["created"],
@@ -118,7 +118,7 @@ class RDMDraftTableGenerator(
         if not forked_published:
             # recid
             record_pid = draft["json"]["pid"]
-            yield PersistentIdentifier(
+            yield PersistentIdentifier.row(
                 id=record_pid["pk"],
                 pid_type=record_pid["pid_type"],  # in drafts are recid
                 pid_value=draft["json"]["id"],
@@ -17,7 +17,7 @@ def generate_parent_rows(parent):
     parent_pid = parent["json"]["pid"]
     # order is important when doing action/streaming migration
     # parent recid
-    yield PersistentIdentifier(
+    yield PersistentIdentifier.row(
         id=parent_pid["pk"],
         pid_type=parent_pid["pid_type"],
         pid_value=parent["json"]["id"],
@@ -30,7 +30,7 @@ def generate_parent_rows(parent):
     # parent DOI
     parent_doi = parent["json"].get("pids", {}).get("doi")
     if parent_doi and parent_doi["identifier"]:
-        yield PersistentIdentifier(
+        yield PersistentIdentifier.row(
             id=pid_pk(),
             pid_type="doi",
             pid_value=parent_doi["identifier"],
@@ -42,7 +42,7 @@ def generate_parent_rows(parent):
         )
 
     # parent record
-    yield RDMParentMetadata(
+    yield RDMParentMetadata.row(
         id=parent["id"],
         json=parent["json"],
         created=parent["created"],
@@ -101,7 +101,7 @@ class RDMRecordTableGenerator(TableGenerator, CommunitiesReferencesMixin):
             },
         )
 
-        yield RDMRecordMetadata(
+        yield RDMRecordMetadata.row(
             id=record["id"],
             json=record["json"],
             created=record["created"],
@@ -114,7 +114,7 @@ class RDMRecordTableGenerator(TableGenerator, CommunitiesReferencesMixin):
             deletion_status="P",
         )
         # recid
-        yield PersistentIdentifier(
+        yield PersistentIdentifier.row(
             id=record_pid["pk"],
             pid_type=record_pid["pid_type"],
             pid_value=record["json"]["id"],
@@ -126,7 +126,7 @@ class RDMRecordTableGenerator(TableGenerator, CommunitiesReferencesMixin):
         )
         # DOI
         if "doi" in record["json"]["pids"]:
-            yield PersistentIdentifier(
+            yield PersistentIdentifier.row(
                 id=pid_pk(),
                 pid_type="doi",
                 pid_value=record["json"]["pids"]["doi"]["identifier"],
@@ -138,7 +138,7 @@ class RDMRecordTableGenerator(TableGenerator, CommunitiesReferencesMixin):
             )
         # OAI
         if "oai" in record["json"]["pids"]:
-            yield PersistentIdentifier(
+            yield PersistentIdentifier.row(
                 id=pid_pk(),
                 pid_type="oai",
                 pid_value=record["json"]["pids"]["oai"]["identifier"],
@@ -3,40 +3,114 @@
 
 """Record table generator utilities."""
 
+from functools import partial
+from uuid import UUID
+
 import psycopg
 
+from ....load.postgresql.bulk.checkpoints import LoadCheckpoints
+from ....logging import Logger
+from ....load.postgresql.parallel import execute_in_parallel
 from ...models.files import FilesObjectVersion
 
 
+def uuid_ranges(chunks):
+    """Split the UUID space in ``chunks`` contiguous ``(lower, upper)`` ranges.
+
+    The upper bound of the last range is ``None`` (unbounded).
+    """
+    bounds = [UUID(int=(idx << 128) // chunks) for idx in range(chunks)]
+    return list(zip(bounds, bounds[1:] + [None]))
+
+
 class InsertRecordFiles:
-    """Table generator post-hook for inserting record files from object versions."""
+    """Table generator post-hook for inserting record files from object versions.
+
+    The records are processed in chunks of UUID ranges, each of them committed on its
+    own and spread over several connections. The completion of each chunk is recorded
+    in its transaction (see ``LoadCheckpoints``), therefore re-running the hook after
+    a failure skips the completed chunks. Within the other chunks, record files that
+    already exist are skipped. The checkpoints are deleted once all the chunks are
+    completed, so that the next loads process all of them again.
+    """
 
-    def __init__(self, record_model, file_model, bucket_fk="bucket_id"):
+    def __init__(
+        self, record_model, file_model, bucket_fk="bucket_id", chunks=64, workers=4
+    ):
         """Constructor."""
         self.record_model = record_model
         self.file_model = file_model
         self.bucket_fk = bucket_fk
+        self.chunks = chunks
+        self.workers = workers
+
+    def _name(self):
+        """Name of the hook, there is one per file table and bucket column."""
+        return f"{self.file_model.__tablename__} ({self.bucket_fk})"
+
+    def _checkpoints(self):
+        """Checkpoints of the completed chunks, bound to the number of chunks."""
+        return LoadCheckpoints(
+            f"{type(self).__name__} {self._name()} in {self.chunks} chunks"
+        )
+
+    def _statements(self):
+        """Yield one INSERT ... SELECT per chunk."""
+        # the query needs to be split in 3 parts because the empty jsonb dict
+        # would cause problems with the string formatting
+        insert = f"""
+            INSERT INTO {self.file_model.__tablename__} (
+                id, json, created, updated, version_id, key, record_id, object_version_id
+            )
+        """
+        select = "SELECT gen_random_uuid(), '{}'::jsonb, record.created, record.updated, 1, fo.key, record.id, fo.version_id"
+        from_and_join = f"""
+            FROM {self.record_model.__tablename__} AS record
+            INNER JOIN {FilesObjectVersion.__tablename__} AS fo
+            ON record.{self.bucket_fk} = fo.bucket_id AND fo.is_head = 'true'
+            WHERE record.{self.bucket_fk} IS NOT NULL
+            AND NOT EXISTS (
+                SELECT 1 FROM {self.file_model.__tablename__} AS rf
+                WHERE rf.record_id = record.id AND rf.key = fo.key
+            )
+        """
+        name = self._name()
+        for idx, (lower, upper) in enumerate(uuid_ranges(self.chunks)):
+            chunk = f"AND record.id >= '{lower}'::uuid"
+            if upper:
+                chunk += f" AND record.id < '{upper}'::uuid"
+            yield f"{name} chunk {idx}", insert + select + from_and_join + chunk
 
     def __call__(self, db_uri=None):
         """Inserts record files from buckets and object versions."""
         assert db_uri  # should have come from kwargs
 
+        logger = Logger.get_logger()
+        table_name = self.file_model.__tablename__
+        checkpoints = self._checkpoints()
+        with psycopg.connect(db_uri) as conn:
+            checkpoints.fetch(conn)
+        statements = [
+            (name, sql)
+            for name, sql in self._statements()
+            if not checkpoints.is_completed(table_name, name)
+        ]
+        skipped = self.chunks - len(statements)
+        if skipped:
+            logger.info(f"{self._name()}: {skipped} chunks already completed.")
+
+        def _checkpoint(conn, name, rows):
+            checkpoints.add(conn, table_name, name, rows)
+
+        # no return check, will raise if any of the sql statements fails
+        # id and json do not have defaults in DB even though if the programmatic
+        # models have them, so they need to be calculated
+        execute_in_parallel(
+            partial(psycopg.connect, db_uri),
+            statements,
+            workers=self.workers,
+            on_executed=_checkpoint,
+        )
+        # all the chunks completed, the next loads start over
         with psycopg.connect(db_uri) as conn:
-            # the query needs to be split in 3 parts because the empty jsonb dict
-            # would cause problems with the string formatting
-            insert = f"""
-                INSERT INTO {self.file_model.__tablename__} (
-                    id, json, created, updated, version_id, key, record_id, object_version_id
-                )
-            """
-            select = "SELECT gen_random_uuid(), '{}'::jsonb, record.created, record.updated, 1, fo.key, record.id, fo.version_id"
-            from_and_join = f"""
-                FROM {self.record_model.__tablename__} AS record
-                INNER JOIN {FilesObjectVersion.__tablename__} AS fo
-                ON record.{self.bucket_fk} = fo.bucket_id AND fo.is_head = 'true'
-                WHERE record.{self.bucket_fk} IS NOT NULL
-            """
-            # no return check, will raise if the sql statement fails
-            # id and json do not have defaults in DB even though if the programmatic
-            # models have them, so they need to be calculated
-            conn.execute(insert + select + from_and_join)
+            checkpoints.clear(conn)
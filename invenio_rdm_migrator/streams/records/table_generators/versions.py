@@ -28,7 +28,7 @@ class RDMVersionStateTableGenerator(TableGenerator):
 
     def _generate_rows(self, parent_entry, **kwargs):
         # Version state to be populated in the end from the final state
-        yield RDMVersionState(
+        yield RDMVersionState.row(
             latest_index=parent_entry.get("latest_index"),
             parent_id=parent_entry["id"],
             latest_id=parent_entry.get("latest_id"),
@@ -38,7 +38,7 @@ class RDMVersionStateTableGenerator(TableGenerator):
         communities = parent_entry.get("communities") or []
         for comm_id in communities:
             if _is_valid_uuid(comm_id):
-                yield RDMParentCommunityMetadata(
+                yield RDMParentCommunityMetadata.row(
                     record_id=parent_entry["id"],
                     community_id=comm_id,
                 )
@@ -23,7 +23,7 @@ class RequestTableGenerator(TableGenerator):
     def _generate_rows(self, data, **kwargs):
         """Yield requests metadata."""
         request = data
-        yield RequestMetadata(
+        yield RequestMetadata.row(
             id=request["id"],
             json=request["json"],
             created=request["created"],
@@ -24,15 +24,15 @@ class UserTableGenerator(TableGenerator):
     def _generate_rows(self, data, **kwargs):
         user = data["user"]
         login_info = user.pop("login_information", None)
-        yield User(**user)
+        yield User.row(**user)
         if login_info:
-            yield LoginInformation(
+            yield LoginInformation.row(
                 user_id=user["id"],
                 **login_info,
             )
         identities = data.get("identities", [])
         for identity in identities:
-            yield UserIdentity(
+            yield UserIdentity.row(
                 id_user=user["id"],
                 **identity,
             )
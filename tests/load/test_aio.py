@@ -0,0 +1,170 @@
+# SPDX-FileCopyrightText: 2024 CERN.
+# SPDX-License-Identifier: MIT
+
+"""Asyncio transaction load tests."""
+
+import asyncio
+from dataclasses import dataclass
+from unittest.mock import patch
+
+import pytest
+import sqlalchemy as sa
+from sqlalchemy.engine.reflection import Inspector
+from sqlalchemy.orm import Mapped, Session, mapped_column
+
+from invenio_rdm_migrator.actions import LoadAction, LoadData
+from invenio_rdm_migrator.load.postgresql.models import Model
+from invenio_rdm_migrator.load.postgresql.transactions import AsyncPostgreSQLTx
+from invenio_rdm_migrator.load.postgresql.transactions.aio import LatencyHistogram
+from invenio_rdm_migrator.load.postgresql.transactions.operations import (
+    Operation,
+    OperationType,
+)
+from invenio_rdm_migrator.load.postgresql.transactions.scheduler import (
+    AsyncConflictScheduler,
+)
+
+
+def test_async_conflicting_actions_run_in_order():
+    applied = []
+
+    async def _apply(name, delay):
+        await asyncio.sleep(delay)
+        applied.append(name)
+
+    async def _schedule():
+        scheduler = AsyncConflictScheduler(window=10)
+        await scheduler.submit({"a"}, _apply, "a1", 0.05)
+        await scheduler.submit({"b"}, _apply, "b1", 0)
+        await scheduler.submit({"a"}, _apply, "a2", 0)
+        await scheduler.submit(None, _apply, "barrier", 0)
+        await scheduler.submit({"b"}, _apply, "b2", 0)
+        await scheduler.drain()
+
+    asyncio.run(_schedule())
+    assert applied == ["b1", "a1", "a2", "barrier", "b2"]
+
+
+def test_latency_histogram():
+    histogram = LatencyHistogram()
+    histogram.add("create-draft", 0.0005)
+    histogram.add("create-draft", 0.003)
+    histogram.add("create-draft", 0.004)
+    histogram.add("file-upload", 0.1)
+
+    assert histogram.buckets == {
+        "create-draft": {1: 1, 4: 2},
+        "file-upload": {128: 1},
+    }
+    histogram.log()
+
+
+class AsyncTestModel(Model):
+    """Dataclass model of the asynchronously loaded rows."""
+
+    __tablename__ = "aio-test"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    value: Mapped[int]
+
+
+@dataclass
+class AsyncTestData(LoadData):
+    """Async test action data."""
+
+    id: int
+    value: int
+
+
+class AsyncTestAction(LoadAction):
+    """Sets a value to its next one, failing if the previous one is not set."""
+
+    name = "aio-test-action"
+    data_cls = AsyncTestData
+
+    def conflict_keys(self):
+        """Entities touched by the action."""
+        return {("aio-test", self.data.id)}
+
+    def _generate_rows(self, session, **kwargs):
+        """Yield generated rows."""
+        current = session.scalar(
+            sa.select(AsyncTestModel.value).where(AsyncTestModel.id == self.data.id)
+        )
+        assert (current or 0) == self.data.value - 1
+        yield Operation(
+            OperationType.UPDATE if current else OperationType.INSERT,
+            AsyncTestModel,
+            {"id": self.data.id, "value": self.data.value},
+        )
+
+
+@pytest.fixture(scope="module")
+def database(engine):
+    AsyncTestModel.__table__.create(bind=engine, checkfirst=True)
+    yield engine
+    AsyncTestModel.__table__.drop(engine)
+
+
+def test_async_load(database, db_uri):
+    load = AsyncPostgreSQLTx(db_uri, dry=False, raise_on_db_error=True, window=4)
+    actions = [
+        AsyncTestAction({"id": idx % 3, "value": idx // 3 + 1}) for idx in range(30)
+    ]
+    load.run(actions)
+
+    with database.connect() as conn:
+        rows = conn.execute(sa.select(AsyncTestModel.id, AsyncTestModel.value)).all()
+    assert sorted(rows) == [(0, 10), (1, 10), (2, 10)]
+    assert sum(load.latencies.buckets["aio-test-action"].values()) == 30
+
+
+class AsyncOtherModel(Model):
+    """Dataclass model of the rows loaded along the async test ones."""
+
+    __tablename__ = "aio-other-test"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+
+
+class AsyncReorderAction(AsyncTestAction):
+    """Inserts rows in two tables, which are reordered."""
+
+    name = "aio-reorder-action"
+
+    def _generate_rows(self, session, **kwargs):
+        """Yield generated rows."""
+        for model in (AsyncTestModel, AsyncOtherModel, AsyncTestModel):
+            yield Operation(
+                OperationType.INSERT,
+                model,
+                (
+                    {"id": self.data.id, "value": self.data.value}
+                    if model is AsyncTestModel
+                    else {"id": self.data.id}
+                ),
+            )
+            self.data.id += 1
+
+
+def test_async_load_references_are_shared():
+    engine = sa.create_engine("sqlite://")
+    AsyncTestModel.__table__.create(bind=engine)
+    AsyncOtherModel.__table__.create(bind=engine)
+    load = AsyncPostgreSQLTx(
+        "postgresql+psycopg://", dry=False, batch_size=10, reorder_operations=True
+    )
+
+    with Session(bind=engine) as session:
+        with patch.object(Inspector, "get_foreign_keys", return_value=[]) as m_fks:
+            for idx in range(3):
+                load._load_action(
+                    session, AsyncReorderAction({"id": idx * 10, "value": 1})
+                )
+    # once per table for the whole load, not per action
+    assert m_fks.call_count == 2
+
+
+def test_async_load_rejects_pipeline():
+    with pytest.raises(ValueError):
+        AsyncPostgreSQLTx("postgresql+psycopg://", pipeline=True)
@@ -0,0 +1,68 @@
+# SPDX-FileCopyrightText: 2024 CERN.
+# SPDX-License-Identifier: MIT
+
+"""Indexes and foreign keys handling tests."""
+
+from pathlib import Path
+from unittest.mock import MagicMock
+
+from invenio_rdm_migrator.load.postgresql.bulk.ddl import IndexesAndConstraints
+
+
+def mock_connection(foreign_keys, indexes):
+    """Connection mock returning the given catalog rows."""
+    conn = MagicMock()
+    conn.execute.return_value.fetchall.side_effect = [foreign_keys, indexes]
+    return conn
+
+
+def test_save_and_drop(tmp_dir):
+    ddl = IndexesAndConstraints(tables=["child"], ddl_dir=Path(tmp_dir.name))
+    conn = mock_connection(
+        foreign_keys=[
+            ("child", "fk_parent", "FOREIGN KEY (p_id) REFERENCES parent(id)")
+        ],
+        indexes=[("child", "ix_child_key", "CREATE INDEX ix_child_key ON child (key)")],
+    )
+    ddl.save(conn)
+
+    assert list(ddl.drop_statements()) == [
+        "ALTER TABLE child DROP CONSTRAINT IF EXISTS fk_parent",
+        "DROP INDEX IF EXISTS ix_child_key",
+    ]
+    # indexes are restored before foreign keys
+    restore = (Path(tmp_dir.name) / "restore-ddl.sql").read_text()
+    assert restore == (
+        "CREATE INDEX ix_child_key ON child (key);\n"
+        "ALTER TABLE child ADD CONSTRAINT fk_parent "
+        "FOREIGN KEY (p_id) REFERENCES parent(id);\n"
+    )
+
+    conn.reset_mock()
+    ddl.drop(conn)
+    assert conn.execute.call_count == 2
+    conn.commit.assert_called_once()
+
+
+def test_restore_in_parallel():
+    ddl = IndexesAndConstraints(tables=["child"])
+    ddl.foreign_keys = [("child", "fk_parent", "FOREIGN KEY (p_id) REFERENCES p(id)")]
+    ddl.indexes = [
+        ("child", "ix_one", "CREATE INDEX ix_one ON child (one)"),
+        ("child", "ix_two", "CREATE INDEX ix_two ON child (two)"),
+    ]
+
+    conns = []
+
+    def connect(autocommit=False):
+        conn = MagicMock()
+        conn.__enter__.return_value = conn
+        conn.execute.return_value.rowcount = -1
+        conns.append(conn)
+        return conn
+
+    durations = ddl.restore(connect, workers=2)
+
+    assert set(durations) == {"child.ix_one", "child.ix_two", "child.fk_parent"}
+    executed = [c.args[0] for conn in conns for c in conn.execute.call_args_list]
+    assert sorted(executed) == sorted(sql for _, sql in ddl.restore_statements())
@@ -5,12 +5,14 @@
 
 import tempfile
 from dataclasses import InitVar
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 
+import psycopg
 import pytest
 from sqlalchemy.orm import Mapped, mapped_column
 
 from invenio_rdm_migrator.load.postgresql.bulk import PostgreSQLCopyLoad
+from invenio_rdm_migrator.load.postgresql.bulk.checkpoints import LoadCheckpoints
 from invenio_rdm_migrator.load.postgresql.bulk.generators import (
     ExistingDataTableGenerator,
     SingleTableGenerator,
@@ -179,3 +181,326 @@ def test_load_without_existing_data(m_gen_rows, _, data_dir, tmp_dir, entries):
     m_gen_rows.call_count = 2
 
     # check the load would be done with all existing data is done via mock_load
+
+
+###
+# Fresh target
+###
+
+
+def mock_connection(rowcount=1):
+    """Mock connection whose COPY returns the given row count."""
+    conn = MagicMock()
+    conn.cursor.return_value.__enter__.return_value.rowcount = rowcount
+    return conn
+
+
+def test_fresh_target_session_settings(tmp_dir):
+    load = CopyLoadToo(db_uri=None, tmp_dir=tmp_dir.name, fresh_target=True)
+    assert load.session_settings["synchronous_commit"] == "off"
+
+    load = CopyLoadToo(
+        db_uri=None,
+        tmp_dir=tmp_dir.name,
+        fresh_target=True,
+        session_settings={"work_mem": "64MB"},
+    )
+    assert load.session_settings == {"work_mem": "64MB"}
+
+
+def test_fresh_target_copy_freeze(tmp_dir):
+    load = CopyLoadToo(db_uri=None, tmp_dir=tmp_dir.name, fresh_target=True)
+    load.tmp_dir.mkdir(parents=True)
+    (load.tmp_dir / "test_table.csv").write_text("some,value,10\n")
+
+    conn = mock_connection()
+    conn.execute.return_value.fetchone.return_value = (False,)  # empty table
+    load._load_table(conn, False, TestModel)
+
+    executed = [c.args[0] for c in conn.execute.call_args_list]
+    assert "TRUNCATE test_table" in executed
+    copy_sql = conn.cursor.return_value.__enter__.return_value.copy.call_args.args[0]
+    assert copy_sql.endswith("(FORMAT csv, FREEZE)")
+    conn.commit.assert_called_once()
+
+
+def test_fresh_target_non_empty_table(tmp_dir):
+    load = CopyLoadToo(db_uri=None, tmp_dir=tmp_dir.name, fresh_target=True)
+    load.tmp_dir.mkdir(parents=True)
+    (load.tmp_dir / "test_table.csv").write_text("some,value,10\n")
+
+    conn = mock_connection()
+    conn.execute.return_value.fetchone.return_value = (True,)  # has rows
+    load._load_table(conn, False, TestModel)
+
+    executed = [c.args[0] for c in conn.execute.call_args_list]
+    assert "TRUNCATE test_table" not in executed
+    copy_sql = conn.cursor.return_value.__enter__.return_value.copy.call_args.args[0]
+    assert copy_sql.endswith("(FORMAT csv)")
+
+
+def test_fresh_target_referenced_table(tmp_dir):
+    load = CopyLoadToo(db_uri=None, tmp_dir=tmp_dir.name, fresh_target=True)
+    load.tmp_dir.mkdir(parents=True)
+    (load.tmp_dir / "test_table.csv").write_text("some,value,10\n")
+
+    conn = mock_connection()
+    # empty table, referenced by a foreign key
+    conn.execute.return_value.fetchone.side_effect = [(False,), (True,)]
+    load._load_table(conn, False, TestModel)
+
+    executed = [c.args[0] for c in conn.execute.call_args_list]
+    assert "TRUNCATE test_table" not in executed
+    copy_sql = conn.cursor.return_value.__enter__.return_value.copy.call_args.args[0]
+    assert copy_sql.endswith("(FORMAT csv)")
+
+
+class ReferencedModel(Model):
+    """Dataclass model of a table referenced by a foreign key."""
+
+    __tablename__: InitVar[str] = "copy_referenced_test"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    name: Mapped[str]
+
+
+@pytest.fixture(scope="function")
+def referenced_table(engine):
+    ReferencedModel.__table__.create(bind=engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "CREATE TABLE copy_referencing_test "
+            "(id integer PRIMARY KEY REFERENCES copy_referenced_test (id))"
+        )
+    yield engine
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP TABLE copy_referencing_test")
+    ReferencedModel.__table__.drop(engine)
+
+
+def test_fresh_target_referenced_table_db(referenced_table, tmp_dir):
+    db_uri = referenced_table.url.set(drivername="postgresql")
+    load = CopyLoadToo(
+        db_uri=db_uri.render_as_string(hide_password=False),
+        tmp_dir=tmp_dir.name,
+        fresh_target=True,
+    )
+    load.tmp_dir.mkdir(parents=True)
+    (load.tmp_dir / "copy_referenced_test.csv").write_text("1,one\n2,two\n")
+
+    with psycopg.connect(load.db_uri) as conn:
+        load._load_table(conn, False, ReferencedModel)
+        count = conn.execute("SELECT count(*) FROM copy_referenced_test").fetchone()
+    assert count == (2,)
+
+
+@patch("invenio_rdm_migrator.load.postgresql.bulk.copy.IndexesAndConstraints")
+def test_restore_failure_keeps_load_error(m_ddl, tmp_dir):
+    load = CopyLoadToo(
+        db_uri=None, tmp_dir=tmp_dir.name, drop_constraints=True, progress_interval=0
+    )
+    m_ddl.return_value.restore.side_effect = psycopg.Error("restore failed")
+
+    with patch.object(load, "_connect", return_value=mock_connection()):
+        with patch.object(load, "_load_table", side_effect=ValueError("load failed")):
+            with pytest.raises(ValueError):
+                load._load([(False, TestModel)])
+        m_ddl.return_value.restore.assert_called_once()
+
+        # without a load error, the restore error is raised
+        with pytest.raises(psycopg.Error):
+            load._load([])
+
+
+###
+# Post load statistics
+###
+
+
+@patch("invenio_rdm_migrator.load.postgresql.bulk.copy.execute_in_parallel")
+def test_update_statistics(m_execute, tmp_dir):
+    load = CopyLoadToo(db_uri=None, tmp_dir=tmp_dir.name)
+    load._loaded_tables = ["test_table_too", "test_table", "test_table"]
+    assert load._update_statistics() == {}
+    m_execute.assert_not_called()
+
+    load.analyze = True
+    load._update_statistics()
+    statements = list(m_execute.call_args.args[1])
+    assert statements == [
+        ("test_table_too", "ANALYZE test_table_too"),
+        ("test_table", "ANALYZE test_table"),
+    ]
+
+    load.vacuum = True
+    load._update_statistics()
+    statements = list(m_execute.call_args.args[1])
+    assert statements[0] == (
+        "test_table_too",
+        "VACUUM (FREEZE, ANALYZE) test_table_too",
+    )
+    assert m_execute.call_args.kwargs["autocommit"]
+
+
+###
+# Checkpoints
+###
+
+
+def test_checkpoint_staging_table(tmp_dir):
+    load = CopyLoadToo(db_uri=None, tmp_dir=tmp_dir.name, checkpoint=True)
+    load.tmp_dir.mkdir(parents=True)
+    fpath = load.tmp_dir / "test_table.csv"
+    fpath.write_text("some,value,10\n")
+
+    conn = mock_connection()
+    checkpoints = LoadCheckpoints("CopyLoadToo")
+    load._load_table(conn, False, TestModel, checkpoints)
+
+    executed = [" ".join(c.args[0].split()) for c in conn.execute.call_args_list]
+    assert executed[0] == (
+        "CREATE TEMPORARY TABLE test_table_staging (LIKE test_table) ON COMMIT DROP"
+    )
+    copy_sql = conn.cursor.return_value.__enter__.return_value.copy.call_args.args[0]
+    assert copy_sql.startswith("COPY test_table_staging (foo, bar, number)")
+    assert executed[1] == (
+        "INSERT INTO test_table (foo, bar, number) "
+        "SELECT foo, bar, number FROM test_table_staging"
+    )
+    assert executed[2].startswith("INSERT INTO migrator_load_checkpoints")
+    assert conn.execute.call_args.args[1] == (
+        "CopyLoadToo",
+        "test_table",
+        str(fpath.resolve()),
+        1,
+    )
+    conn.commit.assert_called_once()
+
+    # the table is skipped when loading the same file again
+    conn.reset_mock()
+    load._load_table(conn, False, TestModel, checkpoints)
+    conn.execute.assert_not_called()
+    conn.cursor.assert_not_called()
+
+
+###
+# Upsert
+###
+
+
+def test_upsert_merge_sql(tmp_dir):
+    load = CopyLoadToo(db_uri=None, tmp_dir=tmp_dir.name, upsert=True)
+
+    assert load._merge_sql(TestModel, "test_table_staging") == (
+        "INSERT INTO test_table (foo, bar, number) "
+        "SELECT foo, bar, number FROM test_table_staging "
+        "ON CONFLICT (number) DO UPDATE SET foo = EXCLUDED.foo, bar = EXCLUDED.bar"
+    )
+
+
+def test_upsert_staging_table(tmp_dir):
+    load = CopyLoadToo(db_uri=None, tmp_dir=tmp_dir.name, upsert=True)
+    load.tmp_dir.mkdir(parents=True)
+    (load.tmp_dir / "test_table.csv").write_text("some,value,10\n")
+
+    conn = mock_connection()
+    load._load_table(conn, False, TestModel)
+
+    executed = [c.args[0] for c in conn.execute.call_args_list]
+    assert executed[0].startswith("CREATE TEMPORARY TABLE test_table_staging")
+    assert "ON CONFLICT (number)" in executed[1]
+    copy_sql = conn.cursor.return_value.__enter__.return_value.copy.call_args.args[0]
+    assert copy_sql.startswith("COPY test_table_staging ")
+    conn.commit.assert_called_once()
+
+
+class NullableModel(Model):
+    """Dataclass model stricter than its table."""
+
+    __tablename__: InitVar[str] = "copy_nullable_test"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    name: Mapped[str]
+    code: Mapped[str]
+
+
+@pytest.fixture(scope="function")
+def nullable_table(engine):
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "CREATE TABLE copy_nullable_test "
+            "(id integer PRIMARY KEY, name varchar NOT NULL, code varchar)"
+        )
+    yield engine
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP TABLE copy_nullable_test")
+
+
+def test_not_null_columns_db(nullable_table):
+    db_uri = nullable_table.url.set(drivername="postgresql")
+    load = PostgreSQLCopyLoad(
+        db_uri=db_uri.render_as_string(hide_password=False),
+        table_generators=[SingleTableGenerator(table=NullableModel)],
+        validate=True,
+    )
+    # the code column is only non-nullable in the model
+    assert load._not_null_columns() == {"copy_nullable_test": frozenset(["id", "name"])}
+
+
+###
+# Recovery
+###
+
+
+@patch("invenio_rdm_migrator.load.postgresql.bulk.copy.BisectingCopy")
+@patch.object(CopyLoadToo, "_copy_file")
+def test_recover_failed_copy(m_copy_file, m_bisecting, tmp_dir):
+    m_copy_file.side_effect = psycopg.DataError("invalid input")
+    m_bisecting.return_value.run.return_value = 0
+    load = CopyLoadToo(db_uri=None, tmp_dir=tmp_dir.name)
+    load.tmp_dir.mkdir(parents=True)
+    (load.tmp_dir / "test_table.csv").write_text("bad,value,10\n")
+
+    with pytest.raises(psycopg.DataError):
+        load._load_table(mock_connection(), False, TestModel)
+
+    load.recover = True
+    conn = mock_connection()
+    load._load_table(conn, False, TestModel)
+    conn.rollback.assert_called_once()
+    assert m_bisecting.call_args.args[1] == (
+        "COPY test_table (foo, bar, number) FROM STDIN (FORMAT csv)"
+    )
+    conn.commit.assert_called_once()
+
+
+@patch("invenio_rdm_migrator.load.postgresql.bulk.copy.BisectingMerge")
+@patch("invenio_rdm_migrator.load.postgresql.bulk.copy.BisectingCopy")
+def test_recover_failed_merge(m_bisecting, m_merge, tmp_dir):
+    m_bisecting.return_value.run.return_value = 2
+    m_merge.return_value.run.return_value = 1
+    m_merge.return_value.rejected = 1
+    m_merge.ROW_COLUMN = "_bisection_row"
+    load = CopyLoadToo(
+        db_uri=None, tmp_dir=tmp_dir.name, upsert=True, recover=True, verify=True
+    )
+    load.tmp_dir.mkdir(parents=True)
+    (load.tmp_dir / "test_table.csv").write_text("some,value,10\nsome,value,10\n")
+
+    def _execute(sql, *args):
+        # copying into the staging table succeeds, merging it fails
+        if sql.startswith("INSERT INTO"):
+            raise psycopg.IntegrityError("duplicate key")
+        return MagicMock()
+
+    conn = mock_connection(rowcount=2)
+    conn.execute.side_effect = _execute
+    load._load_table(conn, False, TestModel)
+
+    conn.rollback.assert_called_once()
+    executed = [c.args[0] for c in conn.execute.call_args_list]
+    assert "ADD COLUMN _bisection_row bigserial" in executed[-1]
+    merge_sql = m_merge.call_args.args[1]
+    assert "WHERE _bisection_row BETWEEN %(lo)s AND %(hi)s ON CONFLICT" in merge_sql
+    assert load._verification["test_table"]["copied"] == 1
+    conn.commit.assert_called_once()
@@ -4,6 +4,7 @@
 """PostgreSQL transaction load tests."""
 
 from dataclasses import dataclass
+from datetime import datetime
 from typing import Optional
 
 import pytest
@@ -139,3 +140,26 @@ def test_load_transaction_multiple_actions(pg_tx, session, database):
     assert result[0].test == "first instance"
     assert result[1].id == 102
     assert result[1].test == "second instance"
+
+
+class DatedTestModel(Model):
+    """Model with a datetime column."""
+
+    __tablename__ = "transaction-test-dates"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    created: Mapped[datetime]
+
+
+def test_operation_row_dict():
+    op = Operation(
+        OperationType.INSERT,
+        DatedTestModel,
+        {"id": 1, "created": 1_700_000_000_000_000, "ignored": "value"},
+    )
+    assert op.as_row_dict() == {"id": 1, "created": "2023-11-14T22:13:20"}
+    assert op.pk_dict == {"id": 1}
+    # already serialized values are kept
+    op.data["created"] = "2023-11-14T22:13:20"
+    assert op.as_row_dict()["created"] == "2023-11-14T22:13:20"
+    assert not hasattr(op, "__dict__")
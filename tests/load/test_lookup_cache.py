@@ -0,0 +1,117 @@
+# SPDX-FileCopyrightText: 2024 CERN.
+# SPDX-License-Identifier: MIT
+
+"""Transaction load lookup cache tests."""
+
+from dataclasses import dataclass
+
+import pytest
+import sqlalchemy as sa
+from sqlalchemy.orm import Mapped, Session, mapped_column
+
+from invenio_rdm_migrator.actions import LoadAction, LoadData
+from invenio_rdm_migrator.load.postgresql.models import Model
+from invenio_rdm_migrator.load.postgresql.transactions import PostgreSQLTx
+from invenio_rdm_migrator.load.postgresql.transactions.cache import (
+    LookupCache,
+    cached_lookup,
+)
+from invenio_rdm_migrator.load.postgresql.transactions.operations import (
+    Operation,
+    OperationType,
+)
+
+
+class LookupModel(Model):
+    """Dataclass model of the looked up rows."""
+
+    __tablename__ = "lookup_cache_test"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+
+
+@dataclass
+class LookupData(LoadData):
+    """Lookup action data."""
+
+    id: int
+    insert: bool = False
+    count: int = None
+
+
+class LookupAction(LoadAction):
+    """Counts the rows (twice), then optionally inserts one."""
+
+    name = "lookup-action"
+    data_cls = LookupData
+
+    def _generate_rows(self, session, **kwargs):
+        """Yield generated rows."""
+        for _ in range(2):
+            count = cached_lookup(
+                session,
+                (LookupModel,),
+                ("count",),
+                lambda: session.scalar(
+                    sa.select(sa.func.count()).select_from(LookupModel)
+                ),
+            )
+        self.data.count = count
+        if self.data.insert:
+            yield Operation(OperationType.INSERT, LookupModel, {"id": self.data.id})
+
+
+def test_lookup_cache_invalidation():
+    cache = LookupCache()
+    fetched = []
+
+    def fetch():
+        fetched.append(True)
+        return len(fetched)
+
+    assert cache.get(["a", "b"], ("lookup", 1), fetch) == 1
+    assert cache.get(["a", "b"], ("lookup", 1), fetch) == 1
+    cache.invalidate("c")
+    assert cache.get(["a", "b"], ("lookup", 1), fetch) == 1
+    cache.invalidate("b")
+    assert cache.get(["a", "b"], ("lookup", 1), fetch) == 2
+    cache.clear()
+    assert cache.get(["a", "b"], ("lookup", 1), fetch) == 3
+    assert cache.hits == {"lookup": 2}
+    assert cache.misses == {"lookup": 3}
+
+
+@pytest.fixture(scope="function")
+def sqlite_session():
+    engine = sa.create_engine("sqlite://")
+    LookupModel.__table__.create(bind=engine)
+    statements = []
+
+    @sa.event.listens_for(engine, "before_cursor_execute")
+    def _count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    with Session(bind=engine) as session:
+        yield session, statements
+
+
+@pytest.mark.parametrize("lookup_cache,expected_lookups", [(True, 3), (False, 10)])
+def test_load_lookup_cache(sqlite_session, lookup_cache, expected_lookups):
+    session, statements = sqlite_session
+    load = PostgreSQLTx(
+        db_uri=None, _session=session, dry=False, lookup_cache=lookup_cache
+    )
+    actions = [
+        LookupAction({"id": 1}),
+        LookupAction({"id": 2, "insert": True}),
+        LookupAction({"id": 3}),
+        LookupAction({"id": 2, "insert": True}),  # fails, duplicated key
+        LookupAction({"id": 4}),
+    ]
+    load.run(actions)
+
+    # the inserts invalidate the cached count, and so does the rollback
+    assert [action.data.count for action in actions] == [0, 0, 1, 1, 1]
+    lookups = [s for s in statements if s.startswith("SELECT")]
+    assert len(lookups) == expected_lookups
+    assert "lookup_cache" not in session.info
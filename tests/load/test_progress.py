@@ -0,0 +1,55 @@
+# SPDX-FileCopyrightText: 2024 CERN.
+# SPDX-License-Identifier: MIT
+
+"""COPY progress monitor tests."""
+
+import logging
+from unittest.mock import MagicMock
+
+from invenio_rdm_migrator.load.postgresql.bulk.progress import CopyProgressMonitor
+
+
+def test_report_server_progress(caplog):
+    monitor = CopyProgressMonitor(connect=None)
+    monitor.track(42, "test_table", 1000)
+    conn = MagicMock()
+    conn.execute.return_value.fetchall.return_value = [(42, 10, 250)]
+
+    with caplog.at_level(logging.INFO, logger="migrator"):
+        monitor.report(conn)
+
+    assert conn.execute.call_args.args[1] == ([42],)
+    message = caplog.records[-1].getMessage()
+    assert message.startswith("test_table: 10 rows")
+    assert "250/1000 bytes (25.00%)" in message
+    assert "ETA" in message
+
+
+def test_report_client_progress(caplog):
+    monitor = CopyProgressMonitor(connect=None)
+    monitor.track(42, "test_table", 1000)
+    monitor.sent(42, 1000)
+
+    with caplog.at_level(logging.INFO, logger="migrator"):
+        monitor.report()
+        message = caplog.records[-1].getMessage()
+        assert "rows" not in message
+        assert "1000/1000 bytes (100.00%)" in message
+
+        monitor.untrack(42)
+        caplog.clear()
+        monitor.report()
+        assert not caplog.records
+
+
+def test_monitor_thread():
+    conn = MagicMock()
+    conn.info.server_version = 130000  # no pg_stat_progress_copy
+    connect = MagicMock(return_value=conn)
+
+    with CopyProgressMonitor(connect, interval=0.01) as monitor:
+        monitor.track(42, "test_table", 1000)
+
+    connect.assert_called_once_with(autocommit=True)
+    conn.close.assert_called_once()
+    conn.execute.assert_not_called()
@@ -0,0 +1,109 @@
+# SPDX-FileCopyrightText: 2024 CERN.
+# SPDX-License-Identifier: MIT
+
+"""Failed COPY recovery tests."""
+
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import orjson
+import psycopg
+
+from invenio_rdm_migrator.load.postgresql.bulk.recovery import (
+    BisectingCopy,
+    BisectingMerge,
+    record_offsets,
+)
+
+
+def test_record_offsets(tmp_dir):
+    fpath = Path(tmp_dir.name) / "table.csv"
+    fpath.write_bytes(b'1,a\n2,"multi\nline ""quoted"""\n3,c')
+
+    assert record_offsets(fpath).tolist() == [0, 4, 30, 33]
+
+
+def mock_connection():
+    """Mock connection whose COPY fails when the data contains "bad"."""
+    conn = MagicMock()
+    cur = conn.cursor.return_value.__enter__.return_value
+
+    def _write(data):
+        if b"bad" in data:
+            raise psycopg.DataError(f"invalid input: {bytes(data)!r}")
+        cur.rowcount = bytes(data).count(b"\n")
+
+    cur.copy.return_value.__enter__.return_value.write.side_effect = _write
+    return conn
+
+
+def test_bisecting_copy(tmp_dir):
+    fpath = Path(tmp_dir.name) / "table.csv"
+    rows = [b"%d,good\n" % idx for idx in range(10)]
+    rows[3] = b"3,bad\n"
+    rows[8] = b"8,bad\n"
+    fpath.write_bytes(b"".join(rows))
+    rejects_path = Path(tmp_dir.name) / "table.rejects.jsonl"
+
+    conn = mock_connection()
+    copy = BisectingCopy(conn, "COPY table", fpath, rejects_path, chunk_size=4)
+    assert copy.run() == 8
+    assert copy.rejected == 2
+
+    rejects = [orjson.loads(line) for line in rejects_path.read_text().splitlines()]
+    assert [r["record"] for r in rejects] == [4, 9]
+    assert rejects[0]["table"] == "table"
+    assert rejects[0]["stage"] == "copy"
+    assert rejects[0]["data"] == "3,bad\n"
+    assert "invalid input" in rejects[0]["errors"][0]["error"]
+
+    executed = [c.args[0] for c in conn.execute.call_args_list]
+    assert executed.count("SAVEPOINT bisection") == executed.count(
+        "RELEASE SAVEPOINT bisection"
+    )
+
+
+def test_bisecting_merge(tmp_dir):
+    rejects_path = Path(tmp_dir.name) / "table.rejects.jsonl"
+    # row numbers of the staging table, with gaps of rolled back copies
+    rows = [1, 2, 3, 5, 6, 7, 8, 10]
+    bad = {3, 8}
+
+    def _execute(sql, params=None):
+        result = MagicMock()
+        if sql.startswith("INSERT"):
+            merged = [row for row in rows if params["lo"] <= row <= params["hi"]]
+            if bad.intersection(merged):
+                raise psycopg.errors.UniqueViolation("duplicate key")
+            result.rowcount = len(merged)
+        elif sql.startswith("DELETE"):
+            result.fetchone.return_value = (params[0], "bad")
+        return result
+
+    conn = MagicMock()
+    conn.execute.side_effect = _execute
+    cur = conn.cursor.return_value.__enter__.return_value
+    cur.__iter__.return_value = [(row,) for row in rows]
+    merge = BisectingMerge(
+        conn,
+        "INSERT INTO table SELECT id, name FROM staging WHERE ...",
+        "staging",
+        ["id", "name"],
+        "table",
+        rejects_path,
+        chunk_size=4,
+    )
+    assert merge.run() == 6
+    # the row numbers are read with a server side cursor
+    conn.cursor.assert_called_once_with(name="bisection_rows")
+    assert merge.rejected == 2
+
+    rejects = [orjson.loads(line) for line in rejects_path.read_text().splitlines()]
+    assert [r["row"] for r in rejects] == [
+        {"id": 3, "name": "bad"},
+        {"id": 8, "name": "bad"},
+    ]
+    assert {r["stage"] for r in rejects} == {"merge"}
+    assert "duplicate key" in rejects[0]["errors"][0]["error"]
+    deleted = [c.args for c in conn.execute.call_args_list if "DELETE" in c.args[0]]
+    assert [args[1] for args in deleted] == [(3,), (8,)]
@@ -0,0 +1,191 @@
+# SPDX-FileCopyrightText: 2024 CERN.
+# SPDX-License-Identifier: MIT
+
+"""Concurrent transaction load tests."""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+
+import pytest
+import sqlalchemy as sa
+from sqlalchemy.orm import Mapped, Session, mapped_column
+
+from invenio_rdm_migrator.actions import LoadAction, LoadData
+from invenio_rdm_migrator.load.postgresql.models import Model
+from invenio_rdm_migrator.load.postgresql.transactions import PostgreSQLTx
+from invenio_rdm_migrator.load.postgresql.transactions.operations import (
+    Operation,
+    OperationType,
+)
+from invenio_rdm_migrator.load.postgresql.transactions.scheduler import (
+    ConflictScheduler,
+)
+from invenio_rdm_migrator.state import STATE
+
+
+def test_conflicting_actions_run_in_order():
+    applied = []
+    lock = threading.Lock()
+
+    def _apply(name, delay):
+        time.sleep(delay)
+        with lock:
+            applied.append(name)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        scheduler = ConflictScheduler(executor, window=10)
+        scheduler.submit({"a"}, _apply, "a1", 0.05)
+        scheduler.submit({"b"}, _apply, "b1", 0)
+        scheduler.submit({"a", "c"}, _apply, "a2", 0)
+        scheduler.submit({"c"}, _apply, "c1", 0)
+        scheduler.submit(None, _apply, "barrier", 0)
+        scheduler.submit({"d"}, _apply, "d1", 0)
+        scheduler.drain()
+
+    assert applied.index("a1") < applied.index("a2") < applied.index("c1")
+    # b1 did not wait for a1
+    assert applied.index("b1") < applied.index("a1")
+    assert applied[-2:] == ["barrier", "d1"]
+    assert scheduler.submitted == 6
+    assert scheduler.barriers == 1
+
+
+def test_failed_dependency():
+    def _fail():
+        raise ValueError("failed")
+
+    applied = []
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        scheduler = ConflictScheduler(executor)
+        scheduler.submit({"a"}, _fail)
+        scheduler.submit({"a"}, applied.append, "a2")
+        scheduler.submit({"b"}, applied.append, "b1")
+        with pytest.raises(ValueError):
+            scheduler.drain()
+
+    assert applied == ["b1"]
+
+
+class CounterModel(Model):
+    """Dataclass model of the concurrently loaded rows."""
+
+    __tablename__ = "scheduler_test"
+
+    id: Mapped[str] = mapped_column(primary_key=True)
+    value: Mapped[int]
+
+
+@dataclass
+class CounterData(LoadData):
+    """Counter action data."""
+
+    id: Optional[str] = None
+    value: int = 0
+
+
+class CounterAction(LoadAction):
+    """Sets a counter to its next value, or sums them if it has no id."""
+
+    name = "counter-action"
+    data_cls = CounterData
+
+    def conflict_keys(self):
+        """Entities touched by the action."""
+        return {("counter", self.data.id)} if self.data.id else None
+
+    def _generate_rows(self, session, **kwargs):
+        """Yield generated rows."""
+        if self.data.id is None:
+            self.data.value = session.scalar(sa.select(sa.func.sum(CounterModel.value)))
+            return
+        current = session.get(CounterModel, self.data.id)
+        # give the other workers a chance to interleave
+        time.sleep(0.001)
+        # fails if the actions on a counter are not applied in order
+        assert (current.value if current else 0) == self.data.value - 1
+        if current is None:
+            yield Operation(
+                OperationType.INSERT,
+                CounterModel,
+                {"id": self.data.id, "value": self.data.value},
+            )
+        else:
+            yield Operation(
+                OperationType.UPDATE,
+                CounterModel,
+                {"id": self.data.id, "value": self.data.value},
+            )
+
+
+def test_concurrent_load(tmp_path):
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'load.db'}")
+
+    # lock the database on begin, so that concurrent transactions wait for each other
+    # instead of failing when upgrading their locks
+    @sa.event.listens_for(engine, "connect")
+    def _connect(dbapi_conn, _):
+        dbapi_conn.isolation_level = None
+
+    @sa.event.listens_for(engine, "begin")
+    def _begin(conn):
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+    CounterModel.__table__.create(bind=engine)
+    actions = [
+        CounterAction({"id": f"{idx % 3}", "value": idx // 3 + 1}) for idx in range(39)
+    ]
+    actions.insert(30, CounterAction({}))
+
+    with Session(bind=engine) as session:
+        load = PostgreSQLTx(
+            db_uri=None,
+            _session=session,
+            dry=False,
+            raise_on_db_error=True,
+            workers=4,
+            window=8,
+        )
+        load.run(actions)
+
+        rows = session.execute(sa.select(CounterModel.id, CounterModel.value)).all()
+    assert sorted(rows) == [("0", 13), ("1", 13), ("2", 13)]
+    # the barrier saw all the previous actions
+    assert actions[30].data.value == 3 * 10
+
+
+class StateCounterAction(CounterAction):
+    """Counter action keeping track of the counters in the state."""
+
+    name = "state-counter-action"
+
+    def _generate_rows(self, session, **kwargs):
+        """Yield generated rows."""
+        STATE.VALUES.add(f"{self.data.id}-{self.data.value}", {"value": 1})
+        yield from super()._generate_rows(session, **kwargs)
+
+
+def test_concurrent_load_uncached_state(state, tmp_path):
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'load.db'}")
+    CounterModel.__table__.create(bind=engine)
+    actions = [
+        StateCounterAction({"id": f"{idx % 3}", "value": idx // 3 + 1})
+        for idx in range(9)
+    ]
+
+    with Session(bind=engine) as session:
+        load = PostgreSQLTx(
+            db_uri=None,
+            _session=session,
+            dry=False,
+            raise_on_db_error=True,
+            workers=4,
+        )
+        # each thread would see its own (empty) state database
+        load.run(actions)
+
+        rows = session.execute(sa.select(CounterModel.id, CounterModel.value)).all()
+    assert sorted(rows) == [("0", 3), ("1", 3), ("2", 3)]
+    assert len(list(STATE.VALUES.all())) == 9
@@ -0,0 +1,99 @@
+# SPDX-FileCopyrightText: 2024 CERN.
+# SPDX-License-Identifier: MIT
+
+"""PostgreSQL sequences tests."""
+
+from unittest.mock import patch
+
+import pytest
+
+from invenio_rdm_migrator.load.postgresql.bulk.generators import (
+    ExistingDataTableGenerator,
+    SingleTableGenerator,
+)
+from invenio_rdm_migrator.load.postgresql.sequences import (
+    AlterSequencesMixin,
+    max_pk_state_key,
+)
+
+
+class Table:
+    """Table model mock."""
+
+    __tablename__ = "generated"
+
+
+class ExistingTable:
+    """Existing data table model mock."""
+
+    __tablename__ = "existing"
+
+
+class Load(AlterSequencesMixin):
+    """Load mock."""
+
+    db_uri = None
+    existing_data = False
+    table_generators = [
+        SingleTableGenerator(table=Table),
+        ExistingDataTableGenerator(tables=[ExistingTable]),
+    ]
+
+
+def test_max_pk_state_key():
+    assert max_pk_state_key("pidstore_pid") == "max_pid_pk"
+    assert max_pk_state_key("accounts_user") == "max_accounts_user_pk"
+
+
+@patch("invenio_rdm_migrator.load.postgresql.sequences.psycopg")
+def test_alter_sequences_single_round_trip(m_psycopg, state):
+    state.VALUES.add("max_generated_pk", {"value": 1_000_010})
+    state.VALUES.add("max_existing_pk", {"value": 5})  # ignored, existing data
+
+    conn = m_psycopg.connect.return_value.__enter__.return_value
+    conn.execute.return_value.fetchall.return_value = [
+        ("generated", "id", "generated_id_seq"),
+        ("existing", "id", "existing_id_seq"),
+    ]
+    Load().alter_sequences()
+
+    # one query for the catalog, one to set all the sequences
+    assert conn.execute.call_count == 2
+    sql, params = conn.execute.call_args.args
+    assert sql == (
+        "SELECT setval(%s::regclass, GREATEST(%s, (SELECT MAX(id) FROM generated))) "
+        "UNION ALL "
+        "SELECT setval(%s::regclass, (SELECT MAX(id) FROM existing))"
+    )
+    assert params == ["generated_id_seq", 1_000_010, "existing_id_seq"]
+
+
+class SequenceTable:
+    """Table with a sequence model mock."""
+
+    __tablename__ = "sequences_test"
+
+
+@pytest.fixture(scope="function")
+def sequence_table(engine):
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE sequences_test (id serial PRIMARY KEY)")
+        # e.g. rows loaded by a previous run, with ids above the generated ones
+        conn.exec_driver_sql("INSERT INTO sequences_test (id) VALUES (100)")
+    yield engine
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP TABLE sequences_test")
+
+
+def test_alter_sequences_never_go_backwards(sequence_table, state):
+    state.VALUES.add("max_sequences_test_pk", {"value": 10})
+    load = Load()
+    load.db_uri = sequence_table.url.set(drivername="postgresql").render_as_string(
+        hide_password=False
+    )
+    load.table_generators = [SingleTableGenerator(table=SequenceTable)]
+    load.alter_sequences()
+
+    with sequence_table.begin() as conn:
+        next_id = conn.exec_driver_sql("SELECT nextval('sequences_test_id_seq')")
+        assert next_id.scalar() == 101
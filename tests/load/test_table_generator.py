@@ -0,0 +1,83 @@
+# SPDX-FileCopyrightText: 2024 CERN.
+# SPDX-License-Identifier: MIT
+
+"""Table generator serialization tests."""
+
+from dataclasses import InitVar
+from datetime import datetime
+from uuid import UUID
+
+import pytest
+from sqlalchemy.orm import Mapped, mapped_column
+
+from invenio_rdm_migrator.load.postgresql.bulk.writers import (
+    as_csv_row,
+    row_serializer,
+)
+from invenio_rdm_migrator.load.postgresql.models import Model
+
+
+class SerializerModel(Model):
+    """Dataclass model with all converted column types."""
+
+    __tablename__: InitVar[str] = "serializer_table"
+
+    id: Mapped[UUID] = mapped_column(primary_key=True)
+    json: Mapped[dict] = mapped_column(nullable=True)
+    created: Mapped[datetime]
+    updated: Mapped[datetime]
+    flag: Mapped[bool]
+    name: Mapped[str] = mapped_column(nullable=True, default=None)
+
+
+def test_as_csv_row():
+    row = SerializerModel(
+        id=UUID("d94f793c-47d2-48e2-9867-ca597b4ebb41"),
+        json={"key": "value"},
+        created=datetime(2024, 1, 1, 12, 30),
+        updated="2024-01-01T12:30:00",  # already serialized
+        flag=False,
+        name=None,
+    )
+
+    assert as_csv_row(row) == [
+        "d94f793c-47d2-48e2-9867-ca597b4ebb41",
+        '{"key":"value"}',
+        "2024-01-01T12:30:00",
+        "2024-01-01T12:30:00",
+        False,
+        None,
+    ]
+
+
+def test_row_serializer_is_compiled_once():
+    assert row_serializer(SerializerModel) is row_serializer(SerializerModel)
+
+
+def test_model_row():
+    values = dict(
+        id=UUID("d94f793c-47d2-48e2-9867-ca597b4ebb41"),
+        json={"key": "value"},
+        created=datetime(2024, 1, 1, 12, 30),
+        updated=datetime(2024, 1, 1, 12, 30),
+        flag=True,
+    )
+    row = SerializerModel.row(**values)
+
+    assert row.__tablename__ == "serializer_table"
+    assert row.json == {"key": "value"}
+    assert row.name is None  # default value
+    # rows compare to model instances and serialize in the same way
+    assert row == SerializerModel(**values)
+    assert SerializerModel(**values) == row
+    assert row != SerializerModel(**values, name="other")
+    assert as_csv_row(row) == as_csv_row(SerializerModel(**values))
+
+
+def test_model_row_invalid_arguments():
+    with pytest.raises(TypeError):
+        SerializerModel.row(id="missing-columns")
+    with pytest.raises(TypeError):
+        SerializerModel.row(
+            id="1", created=None, updated=None, flag=True, unknown="column"
+        )
@@ -0,0 +1,400 @@
+# SPDX-FileCopyrightText: 2024 CERN.
+# SPDX-License-Identifier: MIT
+
+"""Transaction operations batching tests."""
+
+from dataclasses import dataclass
+from typing import Optional
+
+import pytest
+import sqlalchemy as sa
+from sqlalchemy.orm import Mapped, Session, mapped_column
+
+from invenio_rdm_migrator.actions import LoadAction, LoadData
+from invenio_rdm_migrator.load.postgresql.models import Model
+from invenio_rdm_migrator.load.postgresql.transactions import PostgreSQLTx
+from invenio_rdm_migrator.load.postgresql.transactions.batch import (
+    operation_statement,
+)
+from invenio_rdm_migrator.load.postgresql.transactions.operations import (
+    Operation,
+    OperationType,
+)
+from invenio_rdm_migrator.state import STATE, StateDB
+
+
+class BatchModel(Model):
+    """Dataclass model of the batched operations."""
+
+    __tablename__ = "batch_test"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    name: Mapped[str]
+
+
+@dataclass
+class BatchData(LoadData):
+    """Batch action data."""
+
+    ids: list
+
+
+class BatchAction(LoadAction):
+    """Inserts rows, looks them up, then updates and deletes them."""
+
+    name = "batch-action"
+    data_cls = BatchData
+
+    def _generate_rows(self, session, **kwargs):
+        """Yield generated rows."""
+        for id_ in self.data.ids:
+            yield Operation(OperationType.INSERT, BatchModel, {"id": id_, "name": "a"})
+        # lookups must see the inserted rows
+        count = session.scalar(sa.select(sa.func.count()).select_from(BatchModel))
+        for id_ in self.data.ids:
+            yield Operation(
+                OperationType.UPDATE, BatchModel, {"id": id_, "name": f"{count}"}
+            )
+        yield Operation(OperationType.DELETE, BatchModel, {"id": self.data.ids[0]})
+
+
+class ParentModel(Model):
+    """Dataclass model of the referenced rows."""
+
+    __tablename__ = "reorder_parent_test"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+
+
+class ChildModel(Model):
+    """Dataclass model of the referencing rows."""
+
+    __tablename__ = "reorder_child_test"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    parent_id: Mapped[int] = mapped_column(sa.ForeignKey(ParentModel.id))
+
+
+@dataclass
+class ReorderData(LoadData):
+    """Reorder action data."""
+
+    ids: list
+    delete: bool = False
+
+
+class ReorderAction(LoadAction):
+    """Inserts (or deletes) parents, each followed by its child."""
+
+    name = "reorder-action"
+    data_cls = ReorderData
+
+    def _generate_rows(self, session, **kwargs):
+        """Yield generated rows."""
+        for id_ in self.data.ids:
+            if self.data.delete:
+                yield Operation(OperationType.DELETE, ChildModel, {"id": id_})
+                yield Operation(OperationType.DELETE, ParentModel, {"id": id_})
+            else:
+                yield Operation(OperationType.INSERT, ParentModel, {"id": id_})
+                yield Operation(
+                    OperationType.INSERT, ChildModel, {"id": id_, "parent_id": id_}
+                )
+
+
+@pytest.fixture(scope="function")
+def sqlite_session():
+    engine = sa.create_engine("sqlite://")
+    BatchModel.__table__.create(bind=engine)
+    statements = []
+
+    @sa.event.listens_for(engine, "before_cursor_execute")
+    def _count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    with Session(bind=engine) as session:
+        yield session, statements
+
+
+@pytest.mark.parametrize("batch_size,expected_statements", [(1, 11), (1000, 3)])
+def test_batched_operations(sqlite_session, batch_size, expected_statements):
+    session, statements = sqlite_session
+    load = PostgreSQLTx(
+        db_uri=None,
+        _session=session,
+        dry=False,
+        raise_on_db_error=True,
+        batch_size=batch_size,
+    )
+    load.run([BatchAction({"ids": [1, 2, 3, 4, 5]})])
+
+    rows = session.execute(sa.select(BatchModel.id, BatchModel.name)).all()
+    assert rows == [(2, "5"), (3, "5"), (4, "5"), (5, "5")]
+    data_statements = [
+        s for s in statements if s.split()[0] in ("INSERT", "UPDATE", "DELETE")
+    ]
+    assert len(data_statements) == expected_statements
+
+
+def test_group_commit_bisecting(sqlite_session):
+    session, statements = sqlite_session
+    load = PostgreSQLTx(db_uri=None, _session=session, dry=False, group_size=4)
+    actions = [BatchAction({"ids": [idx * 10, idx * 10 + 1]}) for idx in range(1, 8)]
+    # fails on a duplicated primary key
+    actions[4] = BatchAction({"ids": [11, 51]})
+    load.run(actions)
+
+    rows = session.scalars(sa.select(BatchModel.id)).all()
+    assert sorted(rows) == [11, 21, 31, 41, 61, 71]
+    savepoints = [s for s in statements if s.startswith("SAVEPOINT")]
+    # two groups, the second one (3 actions) fails and is bisected once
+    assert len(savepoints) == 2 + 2
+
+
+class StateBatchAction(BatchAction):
+    """Batch action counting its loads in the state."""
+
+    name = "state-batch-action"
+
+    def _generate_rows(self, session, **kwargs):
+        """Yield generated rows."""
+        key = f"batch-{self.data.ids[0]}"
+        STATE.VALUES.add(key, {"value": 1})
+        loads = STATE.VALUES.get("loads")
+        STATE.VALUES.update("loads", {"value": loads["value"] + 1})
+        yield from super()._generate_rows(session, **kwargs)
+
+
+@pytest.mark.parametrize("cache", [True, False])
+def test_group_commit_bisecting_state(sqlite_session, tmp_dir, cache):
+    session, _ = sqlite_session
+    STATE.initialized_state(StateDB(db_dir=tmp_dir.name), cache=cache)
+    STATE.VALUES.add("loads", {"value": 0})
+    load = PostgreSQLTx(db_uri=None, _session=session, dry=False, group_size=4)
+    actions = [
+        StateBatchAction({"ids": [idx * 10, idx * 10 + 1]}) for idx in range(1, 5)
+    ]
+    # fails on a duplicated primary key
+    actions[3] = BatchAction({"ids": [40, 11]})
+    load.run(actions)
+
+    # the retried actions did not find their own changes to the state
+    assert STATE.VALUES.get("loads")["value"] == 3
+    assert STATE.VALUES.get("batch-30")
+    rows = session.scalars(sa.select(BatchModel.id)).all()
+    assert sorted(rows) == [11, 21, 31]
+
+
+def test_operation_statements_are_reused(sqlite_session):
+    session, statements = sqlite_session
+    operation_statement.cache_clear()
+    load = PostgreSQLTx(db_uri=None, _session=session, dry=False)
+    load.run([BatchAction({"ids": [idx, idx + 100]}) for idx in range(1, 4)])
+
+    # one statement per operation type
+    assert operation_statement.cache_info().currsize == 3
+    assert operation_statement.cache_info().hits > 0
+    assert operation_statement(
+        OperationType.DELETE.value, BatchModel
+    ) is operation_statement(OperationType.DELETE.value, BatchModel)
+    rows = session.scalars(sa.select(BatchModel.id)).all()
+    assert sorted(rows) == [101, 102, 103]
+
+
+def test_pipeline_unsupported_driver(sqlite_session):
+    session, statements = sqlite_session
+    load = PostgreSQLTx(
+        db_uri=None,
+        _session=session,
+        dry=False,
+        raise_on_db_error=True,
+        batch_size=1000,
+        pipeline=True,
+    )
+    load.run([BatchAction({"ids": [1, 2, 3]})])
+
+    # falls back to executing the statements one by one
+    rows = session.execute(sa.select(BatchModel.id, BatchModel.name)).all()
+    assert rows == [(2, "3"), (3, "3")]
+
+
+@pytest.fixture(scope="module")
+def batch_database(engine):
+    BatchModel.__table__.create(bind=engine, checkfirst=True)
+    yield engine
+    BatchModel.__table__.drop(engine)
+
+
+def test_pipeline(batch_database, db_uri, session):
+    load = PostgreSQLTx(
+        db_uri=db_uri,
+        _session=session,
+        dry=False,
+        raise_on_db_error=True,
+        batch_size=1000,
+        pipeline=True,
+    )
+    load.run([BatchAction({"ids": [1, 2, 3]}), BatchAction({"ids": [4, 5]})])
+
+    rows = session.execute(sa.select(BatchModel.id, BatchModel.name)).all()
+    assert sorted(rows) == [(2, "3"), (3, "3"), (5, "4")]
+
+    # failures are raised on the pipeline sync
+    with pytest.raises(Exception):
+        load.run([BatchAction({"ids": [2, 6]})])
+    session.rollback()
+
+
+@pytest.fixture(scope="function")
+def fk_sqlite_session():
+    engine = sa.create_engine("sqlite://")
+
+    @sa.event.listens_for(engine, "connect")
+    def _connect(dbapi_conn, _):
+        dbapi_conn.execute("PRAGMA foreign_keys = ON")
+
+    for model in (BatchModel, ParentModel, ChildModel):
+        model.__table__.create(bind=engine)
+    statements = []
+
+    @sa.event.listens_for(engine, "before_cursor_execute")
+    def _count(conn, cursor, statement, *args):
+        if statement.split()[0] in ("INSERT", "UPDATE", "DELETE"):
+            statements.append(statement)
+
+    with Session(bind=engine) as session:
+        yield session, statements
+
+
+@pytest.mark.parametrize("reorder,expected_statements", [(False, 12), (True, 2 + 6)])
+def test_reordered_operations(fk_sqlite_session, reorder, expected_statements):
+    session, statements = fk_sqlite_session
+    load = PostgreSQLTx(
+        db_uri=None,
+        _session=session,
+        dry=False,
+        raise_on_db_error=True,
+        batch_size=1000,
+        reorder_operations=reorder,
+    )
+    load.run(
+        [
+            ReorderAction({"ids": [1, 2, 3]}),
+            ReorderAction({"ids": [1, 2, 3], "delete": True}),
+        ]
+    )
+
+    assert session.scalar(sa.select(sa.func.count()).select_from(ChildModel)) == 0
+    # parents can be inserted before the children of the previous ones, but not
+    # deleted before them
+    assert len(statements) == expected_statements
+
+
+MODELS = {"batch": BatchModel, "parent": ParentModel, "child": ChildModel}
+
+
+@dataclass
+class CoalesceData(LoadData):
+    """Coalesce action data."""
+
+    ops: list
+    lookup: Optional[str] = None
+
+
+class CoalesceAction(LoadAction):
+    """Looks up a table, then yields the given operations."""
+
+    name = "coalesce-action"
+    data_cls = CoalesceData
+
+    def _generate_rows(self, session, **kwargs):
+        """Yield generated rows."""
+        if self.data.lookup:
+            model = MODELS[self.data.lookup]
+            session.scalar(sa.select(sa.func.count()).select_from(model))
+        for op_type, model, data in self.data.ops:
+            yield Operation(op_type, MODELS[model], data)
+
+
+@pytest.mark.parametrize("coalesce,expected_statements", [(False, 13), (True, 5)])
+def test_coalesced_operations(fk_sqlite_session, coalesce, expected_statements):
+    session, statements = fk_sqlite_session
+    insert, update, delete = (
+        OperationType.INSERT,
+        OperationType.UPDATE,
+        OperationType.DELETE,
+    )
+    actions = [
+        CoalesceAction(
+            {
+                "ops": [
+                    (insert, "batch", {"id": 1, "name": "a"}),
+                    (insert, "batch", {"id": 2, "name": "a"}),
+                    (insert, "parent", {"id": 1}),
+                ]
+            }
+        ),
+        # does not read the pending tables
+        CoalesceAction(
+            {"ops": [(update, "batch", {"id": 1, "name": "b"})], "lookup": "child"}
+        ),
+        CoalesceAction(
+            {
+                "ops": [
+                    (update, "batch", {"id": 1, "name": "c"}),
+                    (delete, "batch", {"id": 2}),
+                    (insert, "child", {"id": 1, "parent_id": 1}),
+                    (insert, "parent", {"id": 2}),
+                    # moved after the insert of its new parent
+                    (update, "child", {"id": 1, "parent_id": 2}),
+                ]
+            }
+        ),
+        CoalesceAction(
+            {
+                "ops": [
+                    (insert, "child", {"id": 2, "parent_id": 1}),
+                    (delete, "child", {"id": 2}),
+                ]
+            }
+        ),
+        CoalesceAction(
+            {
+                "ops": [
+                    (update, "child", {"id": 1, "parent_id": 2}),
+                    # the pending child references it, neither can be dropped
+                    (delete, "parent", {"id": 1}),
+                    (update, "child", {"id": 1, "parent_id": 2}),
+                ]
+            }
+        ),
+    ]
+    load = PostgreSQLTx(
+        db_uri=None,
+        _session=session,
+        dry=False,
+        raise_on_db_error=True,
+        batch_size=1000,
+        group_size=5,
+        coalesce_operations=coalesce,
+    )
+    load.run(actions)
+
+    rows = session.execute(sa.select(BatchModel.id, BatchModel.name)).all()
+    assert rows == [(1, "c")]
+    children = session.execute(sa.select(ChildModel.id, ChildModel.parent_id)).all()
+    assert children == [(1, 2)]
+    assert session.scalars(sa.select(ParentModel.id)).all() == [2]
+    assert len(statements) == expected_statements
+
+
+@pytest.mark.parametrize(
+    "option", ["reorder_operations", "defer_constraints", "coalesce_operations"]
+)
+def test_reordering_requires_batching(option):
+    # with the default batch_size, operations would never be pending
+    with pytest.raises(ValueError):
+        PostgreSQLTx(db_uri=None, dry=False, **{option: True})
+
+    load = PostgreSQLTx(db_uri=None, dry=False, batch_size=2, **{option: True})
+    assert load.reorder_operations
@@ -0,0 +1,167 @@
+# SPDX-FileCopyrightText: 2024 CERN.
+# SPDX-License-Identifier: MIT
+
+"""Row validation tests."""
+
+from dataclasses import InitVar
+from datetime import datetime
+from pathlib import Path
+from uuid import UUID
+
+import orjson
+import pytest
+from sqlalchemy import BigInteger, SmallInteger, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from invenio_rdm_migrator.load.postgresql.bulk.validation import row_validator
+from invenio_rdm_migrator.load.postgresql.bulk.writers import CSVTableWriter
+from invenio_rdm_migrator.load.postgresql.models import Model, row_class
+
+
+class ValidatedModel(Model):
+    """Dataclass model with all validated column types."""
+
+    __tablename__: InitVar[str] = "validated_table"
+
+    id: Mapped[UUID] = mapped_column(primary_key=True)
+    created: Mapped[datetime]
+    version_id: Mapped[int]
+    flag: Mapped[bool]
+    code: Mapped[str] = mapped_column(String(3))
+    json: Mapped[dict] = mapped_column(nullable=True, default=None)
+
+
+VALID = dict(
+    id="d94f793c-47d2-48e2-9867-ca597b4ebb41",
+    created="2024-01-01T12:30:00",
+    version_id=1,
+    flag=True,
+    code="abc",
+)
+
+
+# as introspected from the database
+NOT_NULL = frozenset(["id", "created", "version_id", "flag", "code"])
+
+
+def test_row_validator():
+    validate = row_validator(row_class(ValidatedModel), NOT_NULL)
+
+    assert validate(ValidatedModel.row(**VALID)) == []
+    assert row_validator(ValidatedModel, NOT_NULL)(ValidatedModel(**VALID)) == []
+    assert validate(ValidatedModel.row(**{**VALID, "created": datetime.now()})) == []
+
+    errors = validate(
+        ValidatedModel.row(
+            id="not-a-uuid",
+            created="yesterday",
+            version_id="one",
+            flag="maybe",
+            code=None,
+        )
+    )
+    assert [col for col, _ in errors] == ["id", "created", "version_id", "flag", "code"]
+    assert errors[-1] == ("code", "null value in non-nullable column")
+
+    errors = validate(ValidatedModel.row(**{**VALID, "code": "abcd"}))
+    assert errors == [("code", "string longer than 3 characters")]
+
+
+def test_row_validator_nullability():
+    # only the primary key is checked by default, the models can be stricter than
+    # the database
+    validate = row_validator(ValidatedModel)
+    assert validate(ValidatedModel(**{**VALID, "code": None})) == []
+    errors = validate(ValidatedModel(**{**VALID, "id": None}))
+    assert errors == [("id", "null value in non-nullable column")]
+
+    # the code column is nullable in the database
+    validate = row_validator(ValidatedModel, NOT_NULL - {"code"})
+    assert validate(ValidatedModel(**{**VALID, "code": None})) == []
+    errors = validate(ValidatedModel(**{**VALID, "flag": None}))
+    assert errors == [("flag", "null value in non-nullable column")]
+
+
+class NumericModel(Model):
+    """Dataclass model with integer and boolean columns."""
+
+    __tablename__: InitVar[str] = "validated_numeric_table"
+
+    int4: Mapped[int] = mapped_column(primary_key=True)
+    int8: Mapped[int] = mapped_column(BigInteger, default=0)
+    int2: Mapped[int] = mapped_column(SmallInteger, default=0)
+    flag: Mapped[bool] = mapped_column(default=True)
+
+
+@pytest.mark.parametrize(
+    "column,value",
+    [
+        ("int4", 2**31 - 1),
+        ("int4", -(2**31)),
+        ("int4", " -42\n"),
+        ("int4", "+7"),
+        ("int8", 2**63 - 1),
+        ("int8", "-9223372036854775808"),
+        ("int2", 32767),
+        ("flag", False),
+        ("flag", "t"),
+        ("flag", " FALSE "),
+        ("flag", "yes"),
+        ("flag", "n"),
+        ("flag", "On"),
+        ("flag", "of"),
+        ("flag", 1),
+        ("flag", "0"),
+    ],
+)
+def test_valid_numeric_values(column, value):
+    validate = row_validator(NumericModel)
+    assert validate(NumericModel(**{"int4": 1, column: value})) == []
+
+
+@pytest.mark.parametrize(
+    "column,value",
+    [
+        ("int4", 2**31),
+        ("int4", "-2147483649"),
+        ("int4", True),
+        ("int4", " 1_000 "),
+        ("int4", "0x1F"),
+        ("int4", "1.0"),
+        ("int4", 1.0),
+        ("int4", "١٢"),  # non-ASCII digits
+        ("int4", ""),
+        ("int8", 2**63),
+        ("int2", -32769),
+        ("flag", "o"),
+        ("flag", "maybe"),
+        ("flag", "truee"),
+        ("flag", 2),
+        ("flag", ""),
+    ],
+)
+def test_invalid_numeric_values(column, value):
+    validate = row_validator(NumericModel)
+    errors = validate(NumericModel(**{"int4": 1, column: value}))
+    assert [col for col, _ in errors] == [column]
+
+
+def test_writer_rejects(tmp_dir):
+    fpath = Path(tmp_dir.name) / "validated_table.csv"
+    not_null = {"validated_table": NOT_NULL - {"code"}}
+    with CSVTableWriter(fpath, validate=True, not_null=not_null) as writer:
+        writer.writerow(ValidatedModel.row(**VALID))
+        writer.writerow(ValidatedModel.row(**{**VALID, "id": "not-a-uuid"}))
+        # non-nullable in the model, but not in the database
+        writer.writerow(ValidatedModel.row(**{**VALID, "code": None}))
+        writer.writerow(ValidatedModel.row(**{**VALID, "flag": None}))
+
+    assert writer.rows == 2
+    assert writer.rejected == 2
+    assert len(fpath.read_text().splitlines()) == 2
+    rejects = Path(tmp_dir.name) / "validated_table.rejects.jsonl"
+    reject = orjson.loads(rejects.read_text().splitlines()[0])
+    assert reject["table"] == "validated_table"
+    assert reject["stage"] == "validate"
+    assert reject["row"]["id"] == "not-a-uuid"
+    assert reject["errors"][0]["column"] == "id"
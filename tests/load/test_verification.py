@@ -0,0 +1,81 @@
+# SPDX-FileCopyrightText: 2024 CERN.
+# SPDX-License-Identifier: MIT
+
+"""Bulk load verification tests."""
+
+from dataclasses import InitVar
+from pathlib import Path
+from unittest.mock import MagicMock
+
+from sqlalchemy.orm import Mapped, mapped_column
+
+from invenio_rdm_migrator.load.postgresql.bulk import PostgreSQLCopyLoad
+from invenio_rdm_migrator.load.postgresql.bulk.generators import SingleTableGenerator
+from invenio_rdm_migrator.load.postgresql.bulk.verification import (
+    checksum_sql,
+    pk_hash,
+    row_pk_hash,
+)
+from invenio_rdm_migrator.load.postgresql.bulk.writers import BinaryTableWriter
+from invenio_rdm_migrator.load.postgresql.models import Model, row_class
+
+
+class VerifiedModel(Model):
+    """Dataclass model with an integer primary key."""
+
+    __tablename__: InitVar[str] = "verified_table"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    name: Mapped[str]
+
+
+def test_pk_hash():
+    # ('x' || substr(md5('1'), 1, 16))::bit(64)::bigint in PostgreSQL
+    expected = int.from_bytes(bytes.fromhex("c4ca4238a0b92382"), "big", signed=True)
+    assert pk_hash((1,)) == expected
+    assert row_pk_hash(row_class(VerifiedModel))(VerifiedModel.row(1, "a")) == expected
+    assert row_pk_hash(VerifiedModel)(VerifiedModel(id=1, name="a")) == expected
+
+
+def test_checksum_sql():
+    assert checksum_sql(VerifiedModel, "verified_table_staging") == (
+        "SELECT coalesce(sum(('x' || substr(md5(concat_ws(',', id::text)), 1, 16))"
+        "::bit(64)::bigint), 0) FROM verified_table_staging"
+    )
+
+
+def test_writer_checksum(tmp_dir):
+    fpath = Path(tmp_dir.name) / "verified_table.csv"
+    with BinaryTableWriter(fpath, checksum=True) as writer:
+        for idx in range(1, 4):
+            writer.writerow(VerifiedModel.row(idx, "name"))
+
+    assert writer.rows == 3
+    assert writer.checksum == sum(pk_hash((idx,)) for idx in range(1, 4))
+
+
+def test_verify_table(tmp_dir):
+    load = PostgreSQLCopyLoad(
+        db_uri=None,
+        table_generators=[SingleTableGenerator(table=VerifiedModel)],
+        tmp_dir=tmp_dir.name,
+        checksum=True,
+    )
+    load._save_to_csv([{"id": 1, "name": "a"}, {"id": 2, "name": "b"}])
+    checksum = pk_hash((1,)) + pk_hash((2,))
+    assert load._written == {"verified_table": (2, checksum)}
+
+    conn = MagicMock()
+    conn.execute.return_value.fetchone.return_value = (checksum,)
+    load._verify_table(conn, VerifiedModel, "file.csv", 2, "verified_table")
+    assert load._verification["verified_table"]["status"] == "ok"
+
+    # a row was lost
+    conn.execute.return_value.fetchone.return_value = (pk_hash((1,)),)
+    load._verify_table(conn, VerifiedModel, "file.csv", 1, "verified_table")
+    result = load._verification["verified_table"]
+    assert result["status"] == "mismatch"
+    assert result["written"] == 2 and result["copied"] == 1
+
+    load._save_verification_report()
+    assert (load.tmp_dir / "verification.json").exists()
@@ -0,0 +1,95 @@
+# SPDX-FileCopyrightText: 2024 CERN.
+# SPDX-License-Identifier: MIT
+
+"""Table writers tests."""
+
+import csv
+import json
+from dataclasses import InitVar
+from datetime import datetime
+from pathlib import Path
+from uuid import UUID
+
+from sqlalchemy.orm import Mapped, mapped_column
+
+from invenio_rdm_migrator.load.postgresql.bulk.writers import (
+    BinaryTableWriter,
+    CSVTableWriter,
+    row_encoder,
+)
+from invenio_rdm_migrator.load.postgresql.models import Model, row_class
+
+
+class WriterModel(Model):
+    """Dataclass model with all encoded column types."""
+
+    __tablename__: InitVar[str] = "writer_table"
+
+    id: Mapped[UUID] = mapped_column(primary_key=True)
+    json: Mapped[dict] = mapped_column(nullable=True)
+    created: Mapped[datetime]
+    version_id: Mapped[int]
+    flag: Mapped[bool]
+    name: Mapped[str] = mapped_column(nullable=True, default=None)
+
+
+ROW_VALUES = dict(
+    id=UUID("d94f793c-47d2-48e2-9867-ca597b4ebb41"),
+    json={"title": 'a "quoted", multi\nline title'},
+    created=datetime(2024, 1, 1, 12, 30),
+    version_id=1,
+    flag=False,
+)
+
+
+def test_row_encoder():
+    encode = row_encoder(row_class(WriterModel))
+
+    assert encode(WriterModel.row(**ROW_VALUES)) == (
+        "d94f793c-47d2-48e2-9867-ca597b4ebb41,"
+        '"{""title"":""a \\""quoted\\"", multi\\nline title""}",'
+        "2024-01-01T12:30:00,1,False,"
+    )
+    assert encode(WriterModel.row(**ROW_VALUES, name="a,b")).endswith(',"a,b"')
+    # empty strings are not NULL
+    assert encode(WriterModel.row(**ROW_VALUES, name="")).endswith(',""')
+    assert encode(WriterModel.row(**ROW_VALUES, name="\\.")).endswith(',"\\."')
+
+
+def test_binary_writer_matches_csv_writer(tmp_dir):
+    rows = [
+        WriterModel.row(**ROW_VALUES),
+        WriterModel.row(**ROW_VALUES, name="plain"),
+        WriterModel(**ROW_VALUES, name='with "quotes"\r\nand newlines'),
+    ]
+    text_path = Path(tmp_dir.name) / "text.csv"
+    binary_path = Path(tmp_dir.name) / "binary.csv"
+    with CSVTableWriter(text_path) as text, BinaryTableWriter(
+        binary_path, buffer_size=16
+    ) as binary:
+        for row in rows:
+            text.writerow(row)
+            binary.writerow(row)
+
+    assert text.rows == binary.rows == 3
+    with open(text_path, newline="") as fp:
+        text_rows = list(csv.reader(fp))
+    with open(binary_path, newline="") as fp:
+        binary_rows = list(csv.reader(fp))
+    assert text_rows == binary_rows
+
+
+def test_writers_json_strings(tmp_dir):
+    text_path = Path(tmp_dir.name) / "text.csv"
+    binary_path = Path(tmp_dir.name) / "binary.csv"
+    values = {**ROW_VALUES, "json": 'a "plain", string'}
+    with CSVTableWriter(text_path) as text, BinaryTableWriter(binary_path) as binary:
+        for writer in (text, binary):
+            writer.writerow(WriterModel.row(**values))
+            writer.writerow(WriterModel(**values))
+
+    for path in (text_path, binary_path):
+        with open(path, newline="") as fp:
+            rows = list(csv.reader(fp))
+        # a JSON string, not the raw value
+        assert [json.loads(row[1]) for row in rows] == [values["json"]] * 2
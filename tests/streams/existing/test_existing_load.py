@@ -0,0 +1,60 @@
+# SPDX-FileCopyrightText: 2024 CERN.
+# SPDX-License-Identifier: MIT
+
+"""Combined existing data load tests."""
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from invenio_rdm_migrator.load.postgresql.bulk import PostgreSQLCopyLoad
+from invenio_rdm_migrator.streams.existing import ExistingDataLoad
+
+
+def test_existing_data_load_tables(tmp_dir):
+    load = ExistingDataLoad(db_uri=None, data_dir=tmp_dir.name)
+    assert [table for _, table in load._prepare([])] == ExistingDataLoad.TABLES
+
+    load = ExistingDataLoad(
+        db_uri=None, data_dir=tmp_dir.name, tables=["name_metadata", "award_metadata"]
+    )
+    tables = [(existing, t.__tablename__) for existing, t in load._prepare([])]
+    assert tables == [(True, "name_metadata"), (True, "award_metadata")]
+
+    with pytest.raises(ValueError):
+        ExistingDataLoad(db_uri=None, data_dir=tmp_dir.name, tables=["unknown"])
+
+
+@patch.object(PostgreSQLCopyLoad, "_load_table")
+@patch.object(PostgreSQLCopyLoad, "_connect")
+def test_existing_data_load_concurrently(m_connect, m_load_table, tmp_dir):
+    m_connect.return_value = MagicMock()
+    load = ExistingDataLoad(
+        db_uri=None, data_dir=tmp_dir.name, workers=2, progress_interval=None
+    )
+    load._load(load._prepare([]))
+
+    loaded = {c.args[2] for c in m_load_table.call_args_list}
+    assert loaded == set(ExistingDataLoad.TABLES)
+    assert sorted(load._loaded_tables) == sorted(
+        t.__tablename__ for t in ExistingDataLoad.TABLES
+    )
+    # one connection per table plus the one of the load
+    assert m_connect.call_count == len(ExistingDataLoad.TABLES) + 1
+
+
+@patch.object(PostgreSQLCopyLoad, "_load_table")
+@patch.object(PostgreSQLCopyLoad, "_connect")
+def test_existing_data_load_failure(m_connect, m_load_table, tmp_dir):
+    def _load_table(conn, existing_data, table, checkpoints):
+        if table.__tablename__ == "award_metadata":
+            raise RuntimeError("COPY failed")
+
+    m_load_table.side_effect = _load_table
+    load = ExistingDataLoad(db_uri=None, data_dir=tmp_dir.name)
+    with pytest.raises(RuntimeError):
+        load._load(load._prepare([]))
+
+    # the other tables were loaded anyway
+    assert "award_metadata" not in load._loaded_tables
+    assert len(load._loaded_tables) == len(ExistingDataLoad.TABLES) - 1
@@ -0,0 +1,76 @@
+# SPDX-FileCopyrightText: 2024 CERN.
+# SPDX-License-Identifier: MIT
+
+"""Records post load hooks tests."""
+
+from unittest.mock import MagicMock, patch
+from uuid import UUID
+
+from invenio_rdm_migrator.streams.models.records import (
+    RDMRecordFile,
+    RDMRecordMetadata,
+)
+from invenio_rdm_migrator.streams.records.table_generators.utils import (
+    InsertRecordFiles,
+    uuid_ranges,
+)
+
+
+def test_uuid_ranges():
+    ranges = uuid_ranges(4)
+    assert len(ranges) == 4
+    assert ranges[0][0] == UUID(int=0)
+    assert ranges[1][0] == UUID("40000000-0000-0000-0000-000000000000")
+    # contiguous and unbounded at the end
+    for (_, upper), (lower, _) in zip(ranges, ranges[1:]):
+        assert upper == lower
+    assert ranges[-1][1] is None
+
+
+def test_insert_record_files_chunks():
+    hook = InsertRecordFiles(RDMRecordMetadata, RDMRecordFile, chunks=3)
+    statements = list(hook._statements())
+
+    assert len(statements) == 3
+    name, sql = statements[0]
+    assert name == "rdm_records_files (bucket_id) chunk 0"
+    assert "INSERT INTO rdm_records_files" in sql
+    assert "record.id >= '00000000-0000-0000-0000-000000000000'::uuid" in sql
+    # existing record files are skipped, re-running resumes the insertion
+    assert "NOT EXISTS" in sql
+    _, last_sql = statements[-1]
+    assert "record.id <" not in last_sql
+
+
+@patch(
+    "invenio_rdm_migrator.streams.records.table_generators.utils.execute_in_parallel"
+)
+@patch("invenio_rdm_migrator.streams.records.table_generators.utils.psycopg")
+def test_insert_record_files_resumes(m_psycopg, m_execute):
+    hook = InsertRecordFiles(RDMRecordMetadata, RDMRecordFile, chunks=3)
+    conn = m_psycopg.connect.return_value.__enter__.return_value
+    # the first chunk completed in a previous run
+    conn.execute.return_value.fetchall.return_value = [
+        ("rdm_records_files", "rdm_records_files (bucket_id) chunk 0", 10)
+    ]
+    hook(db_uri="postgresql://")
+
+    statements = m_execute.call_args.args[1]
+    assert [name for name, _ in statements] == [
+        "rdm_records_files (bucket_id) chunk 1",
+        "rdm_records_files (bucket_id) chunk 2",
+    ]
+    # the completion of a chunk is recorded in its transaction
+    chunk_conn = MagicMock()
+    m_execute.call_args.kwargs["on_executed"](chunk_conn, statements[0][0], 5)
+    sql, params = chunk_conn.execute.call_args.args
+    assert "INSERT INTO migrator_load_checkpoints" in sql
+    assert params == (
+        "InsertRecordFiles rdm_records_files (bucket_id) in 3 chunks",
+        "rdm_records_files",
+        "rdm_records_files (bucket_id) chunk 1",
+        5,
+    )
+    # all the chunks completed, their checkpoints are deleted
+    sql, params = conn.execute.call_args.args
+    assert sql.startswith("DELETE FROM migrator_load_checkpoints")